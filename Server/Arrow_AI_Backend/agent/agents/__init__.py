@@ -1,6 +1,13 @@
 """Package initialization for the agents."""
 
-from .supervisor import supervisor_agent
+
+def __getattr__(name: str):
+    # Built on first access, so importing the package stays cheap
+    if name == "supervisor_agent":
+        from .supervisor import get_supervisor_agent
+        return get_supervisor_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "supervisor_agent"
@@ -3,9 +3,9 @@ Query Complexity Analyzer
 Determines if a user request is SIMPLE (single action) or COMPLEX (requires planning)
 """
 
-from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from Arrow_AI_Backend.agent.models import llm
+from Arrow_AI_Backend.agent.models import get_model
+from Arrow_AI_Backend.agent.prompts import cacheable_prompt, usage_callbacks
 
 
 class QueryComplexity(BaseModel):
@@ -19,8 +19,7 @@ class QueryComplexity(BaseModel):
     )
 
 
-complexity_prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are analyzing user requests for a narrative design tool called Arrow.
+COMPLEXITY_PROMPT = """You are analyzing user requests for a narrative design tool called Arrow.
 
 Classify the request as either SIMPLE or COMPLEX:
 
@@ -62,9 +61,12 @@ Reasoning: Single deletion operation
 
 User: "Create a conversation between two characters about their quest, with player choices for how to respond"
 Classification: COMPLEX
-Reasoning: Multiple dialog nodes, character setup, hub nodes, connections - requires planning"""),
-    ("user", "{input}")
-])
+Reasoning: Multiple dialog nodes, character setup, hub nodes, connections - requires planning"""
 
-complexity_analyzer = complexity_prompt | llm.with_structured_output(QueryComplexity)
+complexity_prompt = cacheable_prompt("complexity_analyzer", COMPLEXITY_PROMPT, ("user", "{input}"))
+
+# Routed to the small model: classification needs no large one
+complexity_analyzer = (
+    complexity_prompt | get_model("complexity_analyzer").with_structured_output(QueryComplexity)
+).with_config(callbacks=usage_callbacks("complexity_analyzer"))
 
@@ -0,0 +1,146 @@
+"""
+Rule-based Complexity Classifier
+Answers the SIMPLE/COMPLEX question locally for requests whose shape makes the
+answer obvious ("delete node 12", "rename Marcus to Elena", "create a branching
+conversation with 3 choices ..."), so they skip the complexity_analyzer LLM call.
+Returns None when unsure; the caller then falls back to the LLM analyzer.
+"""
+
+from typing import Dict, Optional
+import os
+import re
+
+from Arrow_AI_Backend.agent.agents.complexity_analyzer import QueryComplexity
+from Arrow_AI_Backend.metrics import counter
+
+
+# Set ARROW_COMPLEXITY_FAST_PATH=0 to always ask the LLM
+FAST_PATH_ENABLED = os.getenv("ARROW_COMPLEXITY_FAST_PATH", "1") != "0"
+
+# Requests longer than this are never classified SIMPLE by rule
+MAX_SIMPLE_WORDS = 16
+
+
+# ========== Features ==========
+
+# Verbs that change the project (one per operation the request asks for)
+_ACTION = re.compile(
+    r"\b(add|create|make|write|insert|delete|remove|erase|rename|change|update|edit|set|"
+    r"connect|link|attach|disconnect|unlink|move|replace|put|give|turn)\b"
+)
+
+# Ways of chaining several operations into one request
+_SEQUENCE = re.compile(r"\b(and then|then|after that|afterwards|followed by|also|as well as|next)\b|;|\n")
+
+# Narrative structures that need several nodes and connections
+_STRUCTURE = re.compile(
+    r"\b(branch\w*|choices|options|paths|conversation|dialogue tree|dialog tree|sequence|"
+    r"system|quest|scene with|story ?line|chapter|flow|loop|tracks?|tracking|outcomes?|"
+    r"endings?|puzzle|battle|combat|shop|merchant|several|multiple|series)\b"
+)
+
+# Open-ended targets ("improve the story", "fix everything") need a look around first
+_BROAD = re.compile(r"\b(story|everything|all|whole|entire|rest|better|improve|rework|redo)\b")
+
+# Creative writing ("write an intro for the game") decides its own nodes and content
+_OPEN_ENDED = re.compile(
+    r"\b(write|compose|draft|invent|design|brainstorm|come up with|flesh out|expand|"
+    r"intro|introduction|opening|prologue|epilogue|backstory|lore|plot|game|world)\b"
+)
+
+# Several objects of one verb: "X and Y", "X, Y and Z", "links to A, B or C"
+_LIST = re.compile(r",|&|\b(and|or|plus|both|each)\b")
+
+# Resource nouns by kind (node types count as nodes)
+_RESOURCE_KINDS = {
+    "node": re.compile(
+        r"\b(nodes?|dialogs?|dialogues?|content|monologs?|monologues?|interactions?|conditions?|"
+        r"hubs?|jumps?|markers?|frames?|randomizers?|sequencers?|generators?|entry)\b"
+    ),
+    "character": re.compile(r"\b(characters?|npcs?)\b"),
+    "variable": re.compile(r"\b(variables?|vars?)\b"),
+    "scene": re.compile(r"\b(scenes?|macros?)\b"),
+}
+
+# "3 choices", "four nodes", ...
+_COUNT = re.compile(
+    r"\b([3-9]|\d{2,}|three|four|five|six|seven|eight|nine|ten)\s+"
+    r"(\w+\s+)?(choices|options|nodes|dialogs?|dialogues|branches|paths|steps|lines|characters|variables|scenes|outcomes|endings)\b"
+)
+
+# Questions about the current state, answered with query tools only
+_QUESTION = re.compile(
+    r"^(what|which|where|who|how many|how much|is there|are there|does|do|did|show|list|find|search|tell me|explain|describe)\b"
+)
+
+
+def _words(text: str) -> int:
+    return len(text.split())
+
+
+def _resource_kinds(text: str) -> int:
+    """Number of different kinds of resources a request mentions"""
+    return sum(1 for pattern in _RESOURCE_KINDS.values() if pattern.search(text))
+
+
+# ========== Counters ==========
+
+# How often the rules answered, and how often they had to ask the LLM
+_stats: Dict[str, int] = {"simple": 0, "complex": 0, "fallback": 0}
+
+
+def fast_path_stats() -> Dict[str, float]:
+    """Hit/fallback counters of the rule classifier (for tuning)"""
+    hits = _stats["simple"] + _stats["complex"]
+    total = hits + _stats["fallback"]
+    return {**_stats, "hit_rate": round(hits / total, 3) if total else 0.0}
+
+
+counter(
+    "arrow_complexity_fast_path", "Requests classified by rule (simple/complex) or left to the LLM (fallback)", ["result"],
+    function=lambda: {(result,): count for result, count in _stats.items()}
+)
+
+
+# ========== Classifier ==========
+
+def _decide(text: str) -> Optional[QueryComplexity]:
+    actions = _ACTION.findall(text)
+    sequence = bool(_SEQUENCE.search(text))
+    structure = _STRUCTURE.findall(text)
+    count = _COUNT.search(text)
+    words = _words(text)
+    sentences = len([part for part in re.split(r"[.!?]+", text) if part.strip()])
+
+    # Obviously COMPLEX: many operations, or a multi-node structure being built
+    if len(actions) >= 3:
+        return QueryComplexity(complexity="COMPLEX", reasoning=f"Rule: {len(actions)} separate operations requested")
+    if count and actions:
+        return QueryComplexity(complexity="COMPLEX", reasoning=f"Rule: asks for {count.group(0)}")
+    if structure and actions and (sequence or len(actions) >= 2 or sentences >= 2):
+        return QueryComplexity(complexity="COMPLEX", reasoning=f"Rule: builds a '{structure[0]}' structure in several steps")
+
+    # Obviously SIMPLE: one short operation on one object, or a question about the project
+    if not actions and _QUESTION.match(text) and not sequence and words <= MAX_SIMPLE_WORDS:
+        return QueryComplexity(complexity="SIMPLE", reasoning="Rule: question about the current project")
+    if (len(actions) == 1 and not sequence and not structure and not _BROAD.search(text)
+            and not _OPEN_ENDED.search(text) and not _LIST.search(text) and _resource_kinds(text) <= 1
+            and sentences == 1 and words <= MAX_SIMPLE_WORDS):
+        return QueryComplexity(complexity="SIMPLE", reasoning=f"Rule: single '{actions[0]}' operation")
+
+    return None
+
+
+def classify_complexity(user_input: str) -> Optional[QueryComplexity]:
+    """
+    Classify a request without an LLM call.
+    Returns None (and counts a fallback) when the rules are not confident.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+    result = _decide(user_input.strip().lower())
+    if result is None:
+        _stats["fallback"] += 1
+    else:
+        _stats[result.complexity.lower()] += 1
+    return result
@@ -2,7 +2,7 @@ from typing import Literal
 
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
-from Arrow_AI_Backend.agent.models import llm
+from Arrow_AI_Backend.agent.models import get_model
 
 
 class Decision(BaseModel):
@@ -48,4 +48,4 @@ When all remaining tasks are complete, provide a final_message summarizing what
 )
 
 
-decider = decider_prompt | llm.with_structured_output(Decision)
\ No newline at end of file
+decider = decider_prompt | get_model("decider").with_structured_output(Decision)
\ No newline at end of file
@@ -1,14 +1,11 @@
 
 
-from langchain_core.prompts import ChatPromptTemplate
-from Arrow_AI_Backend.agent.models import llm
+from Arrow_AI_Backend.agent.models import get_model
+from Arrow_AI_Backend.agent.prompts import cacheable_prompt, usage_callbacks
 from Arrow_AI_Backend.agent.states import Plan
 
-planner_prompt = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """You are a strategic planner for Arrow, a narrative design tool. You are an expert in interactive storytelling and narrative design. Create high-level step-by-step plans that focus on WHAT needs to be done, not HOW to do it.
+# Static system prompt: kept byte-identical so the provider can cache it
+PLANNER_PROMPT = """You are a strategic planner for Arrow, a narrative design tool. You are an expert in interactive storytelling and narrative design. Create high-level step-by-step plans that focus on WHAT needs to be done, not HOW to do it.
 
 ## SELECTED NODES CONTEXT
 
@@ -463,10 +460,9 @@ Ensure all ending paths are properly connected
 
 6. **The executor will figure out which specific tools to use** - you just plan the strategy, the narrative structure, and the connection logic.
 
-7. **Think about player experience.** Does this flow make sense? Are choices meaningful? Do consequences matter?""",
-        ),
-        ("placeholder", "{messages}"),
-    ]
-)
-planner = planner_prompt | llm.with_structured_output(Plan)
+7. **Think about player experience.** Does this flow make sense? Are choices meaningful? Do consequences matter?"""
+
+# Dynamic parts (request, selected nodes, replan reason) only come after the prefix
+planner_prompt = cacheable_prompt("planner", PLANNER_PROMPT, ("placeholder", "{messages}"))
+planner = (planner_prompt | get_model("planner").with_structured_output(Plan)).with_config(callbacks=usage_callbacks("planner"))
 
@@ -1,21 +1,101 @@
 """
 Supervisor Agent - Main workflow orchestrator
 Routes requests through complexity analysis → planning → execution
+
+LangChain/LangGraph, the models, the agents and the compiled graph are only
+loaded by get_supervisor_agent() (on first use, or in the background at server
+startup), so importing this module - and the server - stays fast.
 """
 
-from Arrow_AI_Backend.agent.agents.complexity_analyzer import complexity_analyzer
-from Arrow_AI_Backend.agent.agents.executor import agent_executor
-from Arrow_AI_Backend.agent.agents.planner import planner
-from Arrow_AI_Backend.agent.states import PlanExecute
-from langgraph.graph import StateGraph, START, END
+from Arrow_AI_Backend.agent.response_cache import get_cache, cached_ainvoke, normalize_input
+from Arrow_AI_Backend.agent.states import PlanExecute, Plan
+from Arrow_AI_Backend.agent.streaming import (
+    DeltaStream,
+    streaming_supported,
+    stream_plan,
+    stream_agent,
+    format_plan,
+)
+from Arrow_AI_Backend.agent.tools.context import get_context
 from Arrow_AI_Backend.manager import manager
+from Arrow_AI_Backend.logs import get_logger
+from Arrow_AI_Backend.metrics import histogram
+import asyncio
+import threading
+import time
+
+
+EXECUTION_INSTRUCTION = """Complete the following plan step-by-step.
+
+IMPORTANT: Work through these steps IN ORDER. After completing each step with a tool, verify the result before moving to the next step. Do not skip steps or execute them out of order."""
+
+
+log = get_logger("supervisor")
+
+NODE_SECONDS = histogram("arrow_supervisor_node_seconds", "Duration of each supervisor graph node", ["node"])
+
+
+def _project_fingerprint(state: PlanExecute) -> str:
+    arrow_file = state.get("arrow_file")
+    return arrow_file.fingerprint() if arrow_file is not None else ""
+
+
+def _open_stream(state: PlanExecute):
+    """A delta stream for the session's next message, if its client can take one"""
+    if streaming_supported(get_context().capabilities):
+        return DeltaStream(state["session_id"])
+    return None
+
+
+async def _send_response(state: PlanExecute, stream, message: str):
+    """Send a complete chat message (closing its stream, if any)"""
+    if stream is not None:
+        await stream.finish(message)
+    else:
+        await manager.send(state["session_id"], {
+            "type": "chat_response",
+            "message": message
+        })
+
+
+async def _run_planner(state: PlanExecute, inputs: dict, header: str, key_parts: list = None):
+    """Run the planner and show the plan to the user, streamed as it is written"""
+    from Arrow_AI_Backend.agent.agents.planner import planner
+    
+    # Repeated requests (e.g. re-sent after a stop or reconnect) skip the LLM call
+    planner_cache = get_cache("planner", Plan)
+    stream = _open_stream(state)
+    invoke = planner.ainvoke
+    if stream is not None:
+        invoke = lambda inputs: stream_plan(planner, inputs, stream, header)
+    try:
+        if key_parts is None:
+            plan = await invoke(inputs)
+        else:
+            plan = await cached_ainvoke(planner_cache, planner, inputs, key_parts, invoke=invoke)
+    finally:
+        if stream is not None:
+            stream.abort()
+    
+    await _send_response(state, stream, format_plan(header, plan.steps))
+    return plan.steps
 
 
 # ========== Step 1: Analyze Complexity ==========
 async def analyze_complexity(state: PlanExecute):
-    """Determine if the query is SIMPLE or COMPLEX"""
-    result = await complexity_analyzer.ainvoke({"input": state["input"]})
-    print(f"[Complexity] {result.complexity} - {result.reasoning}")
+    """Determine if the query is SIMPLE or COMPLEX (by rule when obvious, else by LLM)"""
+    from Arrow_AI_Backend.agent.agents.complexity_analyzer import complexity_analyzer, QueryComplexity
+    from Arrow_AI_Backend.agent.agents.complexity_rules import classify_complexity, fast_path_stats
+    
+    result = classify_complexity(state["input"])
+    if result is None:
+        # The classification depends on the wording only
+        result = await cached_ainvoke(
+            get_cache("complexity_analyzer", QueryComplexity), complexity_analyzer, {"input": state["input"]},
+            [normalize_input(state["input"])]
+        )
+    log.info("Complexity", complexity=result.complexity, reasoning=result.reasoning)
+    log.debug("Complexity fast path", **fast_path_stats())
     return {"complexity": result.complexity}
 
 
@@ -45,28 +125,15 @@ async def plan_step(state: PlanExecute):
     if state.get("replan_reason"):
         # Replanning requested by decider
         replan_context = f"{state['input']}{selected_context}\n\nReplanning because: {state['replan_reason']}\n\nCompleted steps: {state.get('past_steps', [])}"
-        plan = await planner.ainvoke({"messages": [("user", replan_context)]})
-        steps = plan.steps
-        
-        # Send new plan to user
-        plan_text = "\n".join(f"{i+1}. {step}" for i, step in enumerate(steps))
-        await manager.send(state["session_id"], {
-            "type": "chat_response",
-            "message": f"I've updated the plan:\n{plan_text}"
-        })
+        steps = await _run_planner(state, {"messages": [("user", replan_context)]}, "I've updated the plan:")
         return {"plan": steps, "replan_reason": ""}  # Reset completed tasks and clear replan_reason
     
     elif state["complexity"] == "COMPLEX":
         # Initial planning for complex queries
-        plan = await planner.ainvoke({"messages": [("user", f"{state['input']}{selected_context}")]})
-        steps = plan.steps
-        
-        # Send plan to user
-        plan_text = "\n".join(f"{i+1}. {step}" for i, step in enumerate(steps))
-        await manager.send(state["session_id"], {
-            "type": "chat_response",
-            "message": f"Here's my plan:\n{plan_text}"
-        })
+        steps = await _run_planner(
+            state, {"messages": [("user", f"{state['input']}{selected_context}")]}, "Here's my plan:",
+            [normalize_input(state["input"]), sorted(selected_nodes or []), _project_fingerprint(state)]
+        )
     else:
         # Simple query: create a single-task plan
         steps = [state["input"]]
@@ -77,7 +144,14 @@ async def plan_step(state: PlanExecute):
 # ========== Step 4: Execute Task ==========
 async def execute_step(state: PlanExecute):
     """Execute the current task using the executor agent with tools"""
-    from Arrow_AI_Backend.agent.tools.arrow_tools import set_context
+    from Arrow_AI_Backend.agent.agents.executor import get_executor
+    from Arrow_AI_Backend.agent.prompts import dynamic_message
+    from Arrow_AI_Backend.agent.tools.arrow_tools import (
+        set_context,
+        start_shadow_run,
+        commit_shadow_run,
+        discard_shadow_run,
+    )
     
     plan = state["plan"]
     
@@ -88,41 +162,49 @@ async def execute_step(state: PlanExecute):
         arrow_file=state.get("arrow_file")
     )
     
+    # Clients that accept a project_commit get the whole run as one diff
+    if start_shadow_run():
+        log.info("Executing against a shadow copy of the project")
+    
     # Give the executor ALL remaining tasks
     # The executor agent has its own internal loop and will work through them
     plan_text = "\n".join(f"{i+1}. {step}" for i, step in enumerate(plan))
     
-    # Add selected nodes context if available
+    # Static instruction first, then the plan and selection, so the start of the
+    # message is the same on every run (see agent/prompts.py)
     selected_nodes = state.get("selected_node_ids", [])
-    selected_context = f"\n\nSELECTED NODES: {selected_nodes}" if selected_nodes else ""
+    execution_prompt = dynamic_message(EXECUTION_INSTRUCTION, [
+        ("PLAN", plan_text),
+        ("SELECTED NODES", str(selected_nodes) if selected_nodes else None),
+    ])
     
-    execution_prompt = f"""Complete the following plan step-by-step:
-
-{plan_text}{selected_context}
-
-IMPORTANT: Work through these steps IN ORDER. After completing each step with a tool, verify the result before moving to the next step. Do not skip steps or execute them out of order."""
-    
-    print(f"[Supervisor] Sending {len(plan)} tasks to executor")
-    print(f"[Supervisor] Plan:\n{plan_text}")
+    log.info("Sending tasks to executor", tasks=len(plan))
+    log.debug("Plan", plan=plan)
     
     # Invoke the executor agent
     # The agent has its own internal loop and will work through all tasks
+    # Capable clients see its text as it is generated
+    stream = _open_stream(state)
+    agent_executor = get_executor(state.get("complexity"))
+    inputs = {"messages": [{"role": "user", "content": execution_prompt}]}
+    config = {"recursion_limit": 100}
     try:
-        result = await agent_executor.ainvoke(
-            {"messages": [{"role": "user", "content": execution_prompt}]},
-            config={"recursion_limit": 100}
-        )
+        if stream is not None:
+            result = await stream_agent(agent_executor, inputs, stream, config=config) or {}
+        else:
+            result = await agent_executor.ainvoke(inputs, config=config)
         
         # Extract the final response from the agent
         messages = result.get("messages", [])
         final_message = messages[-1] if messages else None
         response_text = final_message.content if final_message else "Tasks executed"
         
+        commit_error = await commit_shadow_run()
+        if commit_error:
+            response_text = f"{response_text}\n\n{commit_error}"
+        
         # Notify user
-        await manager.send(state["session_id"], {
-            "type": "chat_response",
-            "message": response_text
-        })
+        await _send_response(state, stream, response_text)
         
         # Mark the first task as complete
         task = plan[0]
@@ -130,29 +212,81 @@ IMPORTANT: Work through these steps IN ORDER. After completing each step with a
             "past_steps": [(task, response_text)],
         }
         
+    except asyncio.CancelledError:
+        # Stopped: nothing has reached the editor yet, so just drop the changes
+        discard_shadow_run()
+        if stream is not None:
+            stream.abort()
+        raise
     except Exception as e:
         error_msg = f"Error executing tasks: {str(e)}"
-        await manager.send(state["session_id"], {
-            "type": "chat_response",
-            "message": error_msg
-        })
+        # Keep what was done before the failure, as per-call execution would
+        commit_error = await commit_shadow_run()
+        if commit_error:
+            error_msg = f"{error_msg}\n\n{commit_error}"
+        await _send_response(state, stream, error_msg)
         return {
             "past_steps": [(plan[0], error_msg)],
         }
 
 
 # ========== Build Workflow ==========
-workflow = StateGraph(PlanExecute)
+def _timed(node: str, function):
+    """A graph node that records its duration in NODE_SECONDS"""
+    async def timed_node(state: PlanExecute):
+        with NODE_SECONDS.time(node=node):
+            return await function(state)
+    return timed_node
+
+
+def _build_workflow():
+    from langgraph.graph import StateGraph, START, END
+    # Build the models and agents now rather than on the first request
+    from Arrow_AI_Backend.agent.agents import complexity_analyzer, planner
+    from Arrow_AI_Backend.agent.agents.executor import get_executor
+    get_executor("SIMPLE")
+    
+    workflow = StateGraph(PlanExecute)
+    
+    workflow.add_node("analyze", _timed("analyze", analyze_complexity))
+    workflow.add_node("notify_user", _timed("notify_user", notify_user))
+    workflow.add_node("plan", _timed("plan", plan_step))
+    workflow.add_node("execute", _timed("execute", execute_step))
+    
+    workflow.add_edge(START, "analyze")
+    workflow.add_edge("analyze", "notify_user")
+    workflow.add_edge("notify_user", "plan")
+    workflow.add_edge("plan", "execute")
+    workflow.add_edge("execute", END)
+    
+    return workflow.compile()
+
+
+_supervisor_agent = None
+_build_lock = threading.Lock()
+
+
+def get_supervisor_agent():
+    """The compiled supervisor graph, built on first use"""
+    global _supervisor_agent
+    if _supervisor_agent is None:
+        with _build_lock:
+            if _supervisor_agent is None:
+                started = time.perf_counter()
+                _supervisor_agent = _build_workflow()
+                log.info("Graph built", ms=round((time.perf_counter() - started) * 1000))
+    return _supervisor_agent
+
 
-workflow.add_node("analyze", analyze_complexity)
-workflow.add_node("notify_user", notify_user)
-workflow.add_node("plan", plan_step)
-workflow.add_node("execute", execute_step)
+async def load_supervisor_agent():
+    """get_supervisor_agent() without blocking the event loop while it builds"""
+    if _supervisor_agent is not None:
+        return _supervisor_agent
+    return await asyncio.to_thread(get_supervisor_agent)
 
-workflow.add_edge(START, "analyze")
-workflow.add_edge("analyze", "notify_user")
-workflow.add_edge("notify_user", "plan")
-workflow.add_edge("plan", "execute")
-workflow.add_edge("execute", END)
 
-supervisor_agent = workflow.compile()
+def __getattr__(name: str):
+    # `supervisor_agent` keeps working as a (lazily built) module attribute
+    if name == "supervisor_agent":
+        return get_supervisor_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,206 @@
+"""
+Deterministic local stand-in for the chat models
+Selected with ARROW_LLM_PROVIDER=fake. Needs no network or API key, so the whole
+supervisor graph can be load-tested and benchmarked offline.
+
+The fake behaves like a function-calling model:
+- Structured output (with_structured_output -> a forced tool call) answers
+  QueryComplexity and Plan from simple rules over the request text; any other
+  schema gets its field defaults.
+- With Arrow tools bound (the executor), it works through a fixed script of
+  tool calls (ARROW_FAKE_TOOL_SCRIPT, JSON list of turns) and then answers with
+  a short summary.
+- Every call takes ARROW_FAKE_LATENCY_MS; streamed calls spread it over chunks.
+"""
+
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+import asyncio
+import json
+import os
+import re
+import time
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+# Simulated time per model call
+FAKE_LATENCY = int(os.getenv("ARROW_FAKE_LATENCY_MS", "0")) / 1000
+
+# Tool call turns of the executor; "{input}" in string arguments is replaced by the request
+DEFAULT_TOOL_SCRIPT = [
+    [{"name": "search_nodes", "args": {"query": "{keyword}"}}, {"name": "get_scene", "args": {}}],
+    [{"name": "create_content_node", "args": {"title": "{keyword}", "content": "{input}"}}],
+]
+
+
+def _load_script() -> List[List[Dict[str, Any]]]:
+    script = os.getenv("ARROW_FAKE_TOOL_SCRIPT")
+    return json.loads(script) if script else DEFAULT_TOOL_SCRIPT
+
+
+def _tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+class FakeChatModel(BaseChatModel):
+    """Scripted, deterministic chat model with tool calling and structured output"""
+
+    model_name: str = "fake"
+    latency: float = FAKE_LATENCY
+    chunk_size: int = 16  # Characters per streamed chunk
+    tool_script: List[List[Dict[str, Any]]] = []
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("tool_script", _load_script())
+        super().__init__(**kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "arrow-fake"
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Any = None, **kwargs: Any):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    # ========== Answers ==========
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]], tool_choice: Any) -> AIMessage:
+        request = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        request = request if isinstance(request, str) else str(request)
+        names = [t["function"]["name"] for t in tools or []]
+
+        # Structured output: one forced tool
+        if len(names) == 1 and tool_choice:
+            return self._tool_message([{"name": names[0], "args": self._structured(tools[0]["function"], request)}])
+
+        if names:
+            # Executor: next scripted turn whose tools are all bound
+            last_request = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+            since_request = messages[last_request:]
+            turn = sum(1 for m in since_request if isinstance(m, AIMessage) and m.tool_calls)
+            if turn < len(self.tool_script):
+                calls = [self._fill(call, request) for call in self.tool_script[turn] if call["name"] in names]
+                if calls:
+                    return self._tool_message(calls, turn)
+            results = sum(1 for m in since_request if isinstance(m, ToolMessage))
+            return AIMessage(content=f"Done. Completed the request with {results} tool call(s): {request[:80]}")
+
+        return AIMessage(content=f"OK: {request[:80]}")
+
+    def _tool_message(self, calls: List[Dict[str, Any]], turn: int = 0) -> AIMessage:
+        return AIMessage(content="", tool_calls=[
+            {"name": call["name"], "args": call["args"], "id": f"call_{turn}_{i}", "type": "tool_call"}
+            for i, call in enumerate(calls)
+        ])
+
+    def _fill(self, call: Dict[str, Any], request: str) -> Dict[str, Any]:
+        words = re.findall(r"\w{4,}", request)
+        keyword = words[-1] if words else "story"
+        args = {
+            key: value.replace("{input}", request[:200]).replace("{keyword}", keyword) if isinstance(value, str) else value
+            for key, value in call.get("args", {}).items()
+        }
+        return {"name": call["name"], "args": args}
+
+    def _structured(self, function: Dict[str, Any], request: str) -> Dict[str, Any]:
+        name = function["name"]
+        text = request.lower()
+        if name == "QueryComplexity":
+            complex_ = len(text.split()) > 14 or bool(re.search(r"\b(then|and|choices|branch\w*|system|conversation)\b", text))
+            return {
+                "complexity": "COMPLEX" if complex_ else "SIMPLE",
+                "reasoning": "Several operations" if complex_ else "Single operation",
+            }
+        if name == "Plan":
+            first_line = request.strip().splitlines()[0] if request.strip() else request
+            parts = [p.strip(" .") for p in re.split(r",\s*then\s+|\s+then\s+|;\s*|\.\s+", first_line) if p.strip(" .")]
+            return {"steps": ["Check which characters, variables and nodes already exist"] + (parts or [first_line])}
+        # Any other schema: its defaults
+        properties = (function.get("parameters") or {}).get("properties", {})
+        defaults = {"string": "", "integer": 0, "number": 0, "boolean": False, "array": [], "object": {}}
+        return {key: spec.get("default", defaults.get(spec.get("type"), None)) for key, spec in properties.items()}
+
+    def _usage(self, messages: List[BaseMessage], message: AIMessage) -> Dict[str, Any]:
+        input_tokens = sum(_tokens(str(m.content)) for m in messages)
+        output_tokens = _tokens(str(message.content) + json.dumps([c["args"] for c in message.tool_calls]))
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    # ========== BaseChatModel ==========
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        message.usage_metadata = self._usage(messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        message.usage_metadata = self._usage(messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, messages: List[BaseMessage], message: AIMessage) -> List[AIMessageChunk]:
+        """The message cut into streaming chunks (text, or tool call arguments)"""
+        chunks = []
+        text = message.content if isinstance(message.content, str) else ""
+        for start in range(0, len(text), self.chunk_size):
+            chunks.append(AIMessageChunk(content=text[start:start + self.chunk_size]))
+        for index, call in enumerate(message.tool_calls):
+            args = json.dumps(call["args"])
+            chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": "", "id": call["id"], "index": index, "type": "tool_call_chunk"}
+            ]))
+            for start in range(0, len(args), self.chunk_size):
+                chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+                    {"name": None, "args": args[start:start + self.chunk_size], "id": None, "index": index, "type": "tool_call_chunk"}
+                ]))
+        chunks.append(AIMessageChunk(content="", usage_metadata=self._usage(messages, message), chunk_position="last"))
+        return chunks
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        chunks = self._chunks(messages, self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice")))
+        for chunk in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            if run_manager and isinstance(chunk.content, str) and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self._chunks(messages, self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice")))
+        for chunk in chunks:
+            if self.latency:
+                await asyncio.sleep(self.latency / len(chunks))
+            if run_manager and isinstance(chunk.content, str) and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
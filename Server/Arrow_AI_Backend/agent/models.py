@@ -1,22 +1,186 @@
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+"""
+LLM model configuration and routing
+Each pipeline stage (and, for the executor, each request complexity) is a route
+with its own model. SIMPLE requests go to a small fast model; only COMPLEX
+planning and execution use the large ones. Every route records call latency
+and success so the table can be tuned from data.
+
+Override the model of a route with ARROW_MODEL_<ROUTE>, e.g.
+ARROW_MODEL_EXECUTOR_SIMPLE=gpt-4.1
+
+Models come from a pluggable provider (ARROW_LLM_PROVIDER): "openai" (default)
+or "fake", a deterministic offline stand-in (agent/fake_llm.py) for load tests
+and benchmarks. More can be added with register_provider().
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import UUID
 import os
+import time
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+
+from Arrow_AI_Backend.agent.prompts import usage_of
+from Arrow_AI_Backend.logs import get_logger
+from Arrow_AI_Backend.metrics import TOKEN_BUCKETS, counter, histogram
+
+log = get_logger("models")
 
 # Load environment variables
 load_dotenv()
 
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError(
-        "OPENAI_API_KEY not found in environment variables. "
-        "Please create a .env file with OPENAI_API_KEY=your_key_here"
+
+# ========== Providers ==========
+
+# Provider used for every route
+PROVIDER = os.getenv("ARROW_LLM_PROVIDER", "openai")
+
+
+def _openai_model(model: str, temperature: float) -> BaseChatModel:
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError(
+            "OPENAI_API_KEY not found in environment variables. "
+            "Please create a .env file with OPENAI_API_KEY=your_key_here "
+            "(or set ARROW_LLM_PROVIDER=fake to run without one)"
+        )
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        stream_usage=True,  # Token (and cached-token) usage also for streamed calls
     )
 
-llm = ChatOpenAI(
-    model="gpt-4o",
-    temperature=0.7,
-)
 
-llm_smart = ChatOpenAI(
-    model="gpt-4.1",
-    temperature=0.5,
-)
+def _fake_model(model: str, temperature: float) -> BaseChatModel:
+    from Arrow_AI_Backend.agent.fake_llm import FakeChatModel
+    return FakeChatModel(model_name=f"fake:{model}")
+
+
+# provider name -> builder(model, temperature)
+PROVIDERS: Dict[str, Callable[[str, float], BaseChatModel]] = {
+    "openai": _openai_model,
+    "fake": _fake_model,
+}
+
+
+def register_provider(name: str, builder: Callable[[str, float], BaseChatModel]):
+    """Make another chat model provider selectable with ARROW_LLM_PROVIDER"""
+    PROVIDERS[name] = builder
+
+
+# ========== Routes ==========
+
+SMALL_MODEL = os.getenv("ARROW_MODEL_SMALL", "gpt-4o-mini")
+
+# route -> (default model, temperature)
+ROUTES: Dict[str, Tuple[str, float]] = {
+    "complexity_analyzer": (SMALL_MODEL, 0.0),
+    "planner": ("gpt-4o", 0.7),  # Only runs for COMPLEX requests (and replans)
+    "decider": ("gpt-4o", 0.7),
+    "executor_simple": (SMALL_MODEL, 0.5),
+    "executor_complex": ("gpt-4.1", 0.5),  # Lower temperature for consistent execution
+}
+
+
+def route_name(stage: str, complexity: Optional[str] = None) -> str:
+    """Route of a stage, e.g. ("executor", "SIMPLE") -> "executor_simple" """
+    if complexity and f"{stage}_{complexity.lower()}" in ROUTES:
+        return f"{stage}_{complexity.lower()}"
+    if stage in ROUTES:
+        return stage
+    # Stages without per-complexity routes default to their large tier
+    return f"{stage}_complex"
+
+
+def route_model(route: str) -> str:
+    return os.getenv(f"ARROW_MODEL_{route.upper()}", ROUTES[route][0])
+
+
+# ========== Route Stats ==========
+
+# route -> calls, errors, total/max latency
+_route_stats: Dict[str, Dict[str, float]] = {}
+
+LLM_CALL_SECONDS = histogram("arrow_llm_call_seconds", "Latency of LLM calls, per route and model", ["route", "model"])
+LLM_INPUT_TOKENS = histogram("arrow_llm_input_tokens", "Input tokens per LLM call", ["route"], buckets=TOKEN_BUCKETS)
+LLM_OUTPUT_TOKENS = histogram("arrow_llm_output_tokens", "Output tokens per LLM call", ["route"], buckets=TOKEN_BUCKETS)
+LLM_ERRORS = counter("arrow_llm_errors", "Failed LLM calls, per route", ["route"])
+
+
+class RouteRecorder(BaseCallbackHandler):
+    """Records latency, tokens and outcome of every call made through a route's model"""
+
+    run_inline = True
+
+    def __init__(self, route: str):
+        self.route = route
+        self._started: Dict[UUID, float] = {}
+
+    def _start(self, run_id: UUID):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id)
+
+    def _finish(self, run_id: UUID, success: bool):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        latency = time.perf_counter() - started
+        LLM_CALL_SECONDS.observe(latency, route=self.route, model=route_model(self.route))
+        if not success:
+            LLM_ERRORS.inc(route=self.route)
+        stats = _route_stats.setdefault(self.route, {"calls": 0, "errors": 0, "latency_total": 0.0, "latency_max": 0.0})
+        stats["calls"] += 1
+        stats["errors"] += 0 if success else 1
+        stats["latency_total"] += latency
+        stats["latency_max"] = max(stats["latency_max"], latency)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        input_tokens, _, output_tokens = usage_of(response)
+        LLM_INPUT_TOKENS.observe(input_tokens, route=self.route)
+        LLM_OUTPUT_TOKENS.observe(output_tokens, route=self.route)
+        self._finish(run_id, True)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, False)
+
+
+def route_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-route model, call count, success rate and latency"""
+    return {
+        route: {
+            "model": route_model(route),
+            "calls": int(stats["calls"]),
+            "success_rate": round(1 - stats["errors"] / stats["calls"], 3) if stats["calls"] else 1.0,
+            "latency_avg": round(stats["latency_total"] / stats["calls"], 3) if stats["calls"] else 0.0,
+            "latency_max": round(stats["latency_max"], 3),
+        }
+        for route, stats in _route_stats.items()
+    }
+
+
+# ========== Models ==========
+
+# One model instance per route, so its stats stay separate
+_models: Dict[str, BaseChatModel] = {}
+
+
+def get_model(stage: str, complexity: Optional[str] = None) -> BaseChatModel:
+    """Chat model of a pipeline stage, routed by request complexity"""
+    route = route_name(stage, complexity)
+    model = _models.get(route)
+    if model is None:
+        builder = PROVIDERS.get(PROVIDER)
+        if builder is None:
+            raise ValueError(f"Unknown ARROW_LLM_PROVIDER {PROVIDER!r} (known: {', '.join(PROVIDERS)})")
+        model = builder(route_model(route), ROUTES[route][1])
+        model.callbacks = [RouteRecorder(route)]
+        _models[route] = model
+        log.info("Route", route=route, provider=PROVIDER, model=route_model(route))
+    return model
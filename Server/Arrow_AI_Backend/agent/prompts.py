@@ -0,0 +1,142 @@
+"""
+Prompt assembly for provider prefix caching
+Providers (OpenAI included) reuse the computation of a prompt prefix they have
+seen before, which cuts latency and cost, but only if that prefix is byte-for-byte
+identical. Prompts are therefore built as:
+
+    [static system prompt (+ tool schemas)] + [dynamic parts, always last]
+
+The system prompt is a literal message (never formatted), dynamic parts are
+rendered in a fixed order, and every model call records how many of its input
+tokens the provider served from its cache.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import SystemMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from Arrow_AI_Backend.logs import get_logger
+from Arrow_AI_Backend.metrics import counter
+
+log = get_logger("prompt")
+
+
+# ========== Static Prefixes ==========
+
+# Fingerprint of every registered static prefix, by stage
+prefixes: Dict[str, Dict[str, Any]] = {}
+
+
+def register_prefix(stage: str, *parts: str) -> str:
+    """
+    Record the static prefix of a stage; returns its hash.
+    A stage whose prefix changes at runtime would never hit the provider cache,
+    so a second, different registration is reported.
+    """
+    content = "\n".join(parts)
+    digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+    previous = prefixes.get(stage)
+    if previous and previous["hash"] != digest:
+        log.warning("Static prefix changed", stage=stage, previous=previous["hash"], current=digest)
+    prefixes[stage] = {"hash": digest, "chars": len(content)}
+    return digest
+
+
+def cacheable_prompt(stage: str, system: str, *dynamic: Tuple[str, str]) -> ChatPromptTemplate:
+    """
+    Chat prompt with a byte-stable system prefix followed by the dynamic messages,
+    e.g. cacheable_prompt("planner", PLANNER_PROMPT, ("placeholder", "{messages}")).
+    """
+    register_prefix(stage, system)
+    # A literal SystemMessage is never run through the template formatter
+    return ChatPromptTemplate.from_messages([SystemMessage(content=system), *dynamic])
+
+
+def register_agent_prefix(stage: str, system: str, tools: Sequence[Any]) -> str:
+    """Register an agent's prefix: its system prompt plus the schemas of its tools, in order"""
+    schemas = [json.dumps(convert_to_openai_tool(t), sort_keys=True) for t in tools]
+    return register_prefix(stage, system, *schemas)
+
+
+def dynamic_message(instruction: str, sections: Sequence[Tuple[str, Optional[str]]]) -> str:
+    """
+    User message with the static instruction first and the dynamic sections after
+    it, in the given order; empty sections are left out.
+    """
+    parts = [instruction.strip()]
+    for title, value in sections:
+        if value:
+            parts.append(f"{title}:\n{value}")
+    return "\n\n".join(parts)
+
+
+# ========== Cache Usage ==========
+
+# Per-stage totals of model calls and (cached) tokens
+usage_stats: Dict[str, Dict[str, int]] = {}
+
+
+def usage_of(response: LLMResult) -> Tuple[int, int, int]:
+    """(input_tokens, cached_input_tokens, output_tokens) of a model response"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                details = usage.get("input_token_details") or {}
+                return usage.get("input_tokens", 0), details.get("cache_read", 0) or 0, usage.get("output_tokens", 0)
+    # Providers that only report raw token_usage
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return token_usage.get("prompt_tokens", 0), details.get("cached_tokens", 0) or 0, token_usage.get("completion_tokens", 0)
+
+
+class UsageRecorder(BaseCallbackHandler):
+    """Callback that adds every model call of a stage to usage_stats"""
+
+    run_inline = True
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        input_tokens, cached_tokens, output_tokens = usage_of(response)
+        stats = usage_stats.setdefault(self.stage, {
+            "calls": 0, "cache_hits": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0
+        })
+        stats["calls"] += 1
+        stats["cache_hits"] += 1 if cached_tokens else 0
+        stats["input_tokens"] += input_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["output_tokens"] += output_tokens
+        if input_tokens:
+            log.debug("Prompt usage", stage=self.stage, input_tokens=input_tokens, cached_tokens=cached_tokens)
+
+
+counter(
+    "arrow_prompt_cached_tokens", "Input tokens served from the provider's prompt cache, per stage", ["stage"],
+    function=lambda: {(stage,): stats["cached_tokens"] for stage, stats in usage_stats.items()}
+)
+
+
+def usage_callbacks(stage: str) -> List[BaseCallbackHandler]:
+    """Callbacks to attach to a stage's chain, e.g. chain.with_config(callbacks=usage_callbacks("planner"))"""
+    return [UsageRecorder(stage)]
+
+
+def prompt_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-stage cache-hit rates and cached-token shares"""
+    return {
+        stage: {
+            **stats,
+            "hit_rate": round(stats["cache_hits"] / stats["calls"], 3) if stats["calls"] else 0.0,
+            "cached_share": round(stats["cached_tokens"] / stats["input_tokens"], 3) if stats["input_tokens"] else 0.0,
+            "prefix": prefixes.get(stage, {}).get("hash"),
+        }
+        for stage, stats in usage_stats.items()
+    }
@@ -0,0 +1,243 @@
+"""
+LRU/TTL cache of LLM chain responses
+Wraps the complexity analyzer and the planner so a repeated request (e.g. re-sent
+after a stop or a reconnect) skips their LLM calls. Entries are keyed by the
+normalized input, the selected nodes and the project's structural fingerprint,
+evicted least-recently-used beyond a size bound, expire after a TTL, and can be
+persisted to a JSON file so they survive a restart. The file is written off the
+event loop, at most once per ARROW_LLM_CACHE_SAVE_DELAY seconds, and at shutdown
+(flush_caches()).
+"""
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from pydantic import BaseModel
+
+from Arrow_AI_Backend.logs import get_logger
+from Arrow_AI_Backend.metrics import counter, gauge
+
+log = get_logger("cache")
+
+
+# Set ARROW_LLM_CACHE=0 to disable the cache
+CACHE_ENABLED = os.getenv("ARROW_LLM_CACHE", "1") != "0"
+
+# Maximum number of entries per cache
+CACHE_SIZE = int(os.getenv("ARROW_LLM_CACHE_SIZE", "256"))
+
+# Seconds an entry stays valid
+CACHE_TTL = float(os.getenv("ARROW_LLM_CACHE_TTL", "3600"))
+
+# Directory to persist the caches in (one JSON file per cache); empty = memory only
+CACHE_DIR = os.getenv("ARROW_LLM_CACHE_DIR", "")
+
+# Seconds a change waits before the cache file is rewritten (changes meanwhile join it)
+CACHE_SAVE_DELAY = float(os.getenv("ARROW_LLM_CACHE_SAVE_DELAY", "5"))
+
+
+def normalize_input(text: str) -> str:
+    """Case, whitespace and trailing punctuation do not change what was asked"""
+    return re.sub(r"\s+", " ", text).strip().rstrip(".!?").lower()
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable hash of the parts a response depends on"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of pydantic responses with a TTL and optional persistence"""
+
+    def __init__(
+        self,
+        name: str,
+        model: Type[BaseModel],
+        max_entries: int = CACHE_SIZE,
+        ttl: float = CACHE_TTL,
+        directory: str = CACHE_DIR
+    ):
+        self.name = name
+        self.model = model
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.path = os.path.join(directory, f"{name}.json") if directory else None
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()  # key -> (stored_at, response)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        # Persistence: pending debounced save, and versions of the entries snapshotted/written
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._version = 0
+        self._saved_version = 0
+        self._written_version = 0
+        self._write_lock = threading.Lock()
+        self._load()
+
+    def get(self, key: str) -> Optional[BaseModel]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, response = entry
+        if time.time() - stored_at > self.ttl:
+            del self._entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self.model.model_validate(response)
+
+    def put(self, key: str, response: BaseModel):
+        self._entries[key] = (time.time(), response.model_dump())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._schedule_save()
+
+    def clear(self):
+        self._entries.clear()
+        self._schedule_save()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+    # ========== Persistence ==========
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            now = time.time()
+            for key, stored_at, response in entries[-self.max_entries:]:
+                if now - stored_at <= self.ttl:
+                    self._entries[key] = (stored_at, response)
+            log.info("Loaded cache", cache=self.name, entries=len(self._entries), path=self.path)
+        except (OSError, ValueError) as e:
+            log.warning("Could not load cache", path=self.path, error=e)
+
+    def _schedule_save(self):
+        """Save after CACHE_SAVE_DELAY, in a worker thread (right away without an event loop)"""
+        if not self.path:
+            return
+        self._version += 1
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        self._save_handle = loop.call_later(CACHE_SAVE_DELAY, self._save_in_background)
+
+    def _save_in_background(self):
+        self._save_handle = None
+        version, entries = self._snapshot()
+        asyncio.ensure_future(asyncio.to_thread(self._write, version, entries))
+
+    def save(self):
+        """Write pending changes now (blocking)"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self.path and self._version != self._saved_version:
+            self._write(*self._snapshot())
+
+    def _snapshot(self) -> Tuple[int, List[List[Any]]]:
+        # Taken on the event loop; the responses themselves are never mutated
+        self._saved_version = self._version
+        return self._version, [[key, stored_at, response] for key, (stored_at, response) in self._entries.items()]
+
+    def _write(self, version: int, entries: List[List[Any]]):
+        with self._write_lock:
+            if version <= self._written_version:
+                return  # A newer snapshot is already on disk
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                temp_path = self.path + ".tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(temp_path, self.path)  # Atomic, so a crash never leaves half a file
+                self._written_version = version
+            except OSError as e:
+                log.warning("Could not save cache", path=self.path, error=e)
+
+
+# Caches by name, for metrics
+caches: Dict[str, ResponseCache] = {}
+
+
+def get_cache(name: str, model: Type[BaseModel]) -> ResponseCache:
+    cache = caches.get(name)
+    if cache is None:
+        cache = caches[name] = ResponseCache(name, model)
+    return cache
+
+
+async def cached_ainvoke(
+    cache: ResponseCache,
+    chain: Any,
+    inputs: Dict[str, Any],
+    key_parts: Iterable[Any],
+    invoke: Optional[Callable[[Dict[str, Any]], Awaitable[BaseModel]]] = None
+) -> BaseModel:
+    """
+    chain.ainvoke(inputs), answered from the cache when the same key was seen before.
+    invoke replaces chain.ainvoke on a miss (e.g. to stream the response).
+    """
+    invoke = invoke or chain.ainvoke
+    if not CACHE_ENABLED:
+        return await invoke(inputs)
+    key = cache_key(cache.name, *key_parts)
+    response = cache.get(key)
+    if response is not None:
+        log.debug("Cache hit", cache=cache.name, hit_rate=cache.stats()["hit_rate"])
+        return response
+    response = await invoke(inputs)
+    cache.put(key, response)
+    return response
+
+
+def flush_caches():
+    """Write every cache's pending changes (at shutdown)"""
+    for cache in caches.values():
+        cache.save()
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit-rate metrics of every cache"""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+counter(
+    "arrow_response_cache_lookups", "Response cache lookups, by cache and result", ["cache", "result"],
+    function=lambda: {
+        (name, result): getattr(cache, attribute)
+        for name, cache in caches.items()
+        for result, attribute in (("hit", "hits"), ("miss", "misses"))
+    }
+)
+gauge(
+    "arrow_response_cache_entries", "Entries held by each response cache", ["cache"],
+    function=lambda: {(name,): len(cache._entries) for name, cache in caches.items()}
+)
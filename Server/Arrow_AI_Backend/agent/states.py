@@ -6,6 +6,7 @@ import operator
 from typing import Annotated, List, Tuple, Dict, Any, Optional
 from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
+from Arrow_AI_Backend.lib.arrow_document import ArrowDocument
 
 
 class Plan(BaseModel):
@@ -30,5 +31,5 @@ class PlanExecute(TypedDict):
     pending_request_id: Optional[str]  # ID of function call waiting for result
     function_result: Optional[Dict[str, Any]]  # Result from client
     current_scene_id: Optional[int]  # Current scene context
-    arrow_file: Optional[str]  # Current arrow file data as JSON string
+    arrow_file: Optional[ArrowDocument]  # Indexed arrow document held by the session's ProjectSync
     selected_node_ids: Optional[List[int]]  # IDs of nodes selected in the editor
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Incremental chat output
+Streams planner and executor output to the client as `chat_response_delta`
+messages while the LLM is still generating, fed from LangChain `astream_events`.
+Deltas are coalesced to at most one message per ARROW_STREAM_INTERVAL_MS, and the
+final `chat_response` carries the same stream_id so the client can replace the
+streamed text with it. Only clients that advertise the "chat_response_delta"
+capability get deltas.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from Arrow_AI_Backend.logs import get_logger
+from Arrow_AI_Backend.manager import manager
+
+log = get_logger("stream")
+
+# Set ARROW_STREAMING=0 to only send complete chat_response messages
+STREAMING_ENABLED = os.getenv("ARROW_STREAMING", "1") != "0"
+
+# Minimum time between two delta messages of one stream
+STREAM_INTERVAL = int(os.getenv("ARROW_STREAM_INTERVAL_MS", "100")) / 1000
+
+
+def streaming_supported(capabilities) -> bool:
+    return STREAMING_ENABLED and "chat_response_delta" in (capabilities or ())
+
+
+class DeltaStream:
+    """
+    One streamed chat message.
+    Producers update the text as often as they like; the text added since the
+    last send goes out at most once per interval.
+    """
+
+    def __init__(self, session_id: str, interval: float = STREAM_INTERVAL):
+        self.session_id = session_id
+        self.stream_id = str(uuid.uuid4())
+        self.interval = interval
+        self.text = ""
+        self._sent = 0  # Length of the text the client already has
+        self._started = time.monotonic()
+        self._last_send = 0.0
+        self._timer: Optional[asyncio.Task] = None
+
+    async def append(self, delta: str):
+        if delta:
+            self.text += delta
+            await self._schedule()
+
+    async def update(self, text: str):
+        """Replace the text; only append-only growth of what was already sent is streamed"""
+        if text != self.text and text.startswith(self.text[:self._sent]):
+            self.text = text
+            await self._schedule()
+
+    async def _schedule(self):
+        wait = self._last_send + self.interval - time.monotonic()
+        if wait <= 0:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later(wait))
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Send whatever the client does not have yet"""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        delta = self.text[self._sent:]
+        if not delta:
+            return
+        if self._sent == 0:
+            log.debug("First delta", ms=round((time.monotonic() - self._started) * 1000))
+        self._sent = len(self.text)
+        self._last_send = time.monotonic()
+        await manager.send(self.session_id, {
+            "type": "chat_response_delta",
+            "stream_id": self.stream_id,
+            "delta": delta
+        })
+
+    def abort(self):
+        """Drop pending output (the run was stopped)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def finish(self, message: str):
+        """Send the complete message, tagged with the stream it replaces"""
+        self.abort()
+        await manager.send(self.session_id, {
+            "type": "chat_response",
+            "message": message,
+            "stream_id": self.stream_id
+        })
+
+
+# ========== Event Sources ==========
+
+def _chunk_text(chunk: Any, tool_args: bool) -> str:
+    """Text of a chat model chunk; with tool_args, also the JSON of a structured-output tool call"""
+    content = getattr(chunk, "content", "")
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    if content or not tool_args:
+        return content
+    return "".join(call.get("args") or "" for call in getattr(chunk, "tool_call_chunks", None) or [])
+
+
+async def stream_events(
+    runnable: Any,
+    inputs: Dict[str, Any],
+    on_text: Callable[[str, bool], Awaitable[None]],
+    config: Optional[Dict[str, Any]] = None,
+    tool_args: bool = False
+) -> Any:
+    """
+    Run a chain/agent with astream_events, passing each generated text chunk to
+    on_text(text, new_message) and returning the run's final output.
+    new_message is True on the first chunk of each chat model call. With
+    tool_args, tool call arguments count as text (structured output).
+    """
+    output = None
+    new_message = False
+    root_run = None  # The first event is the start of the run itself
+    async for event in runnable.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        if root_run is None:
+            root_run = event["run_id"]
+        if kind == "on_chat_model_start":
+            new_message = True
+        elif kind == "on_chat_model_stream":
+            text = _chunk_text(event["data"].get("chunk"), tool_args)
+            if text:
+                await on_text(text, new_message)
+                new_message = False
+        elif kind.endswith("_end") and event["run_id"] == root_run:
+            output = event["data"].get("output")
+    return output
+
+
+def partial_steps(raw: str) -> List[str]:
+    """
+    Steps of a Plan from its partially generated JSON ('{"steps": ["Check if..., "Cre'),
+    including the step still being written.
+    """
+    start = raw.find('"steps"')
+    start = raw.find("[", start) if start >= 0 else -1
+    if start < 0:
+        return []
+    steps = []
+    i = start + 1
+    while i < len(raw):
+        if raw[i] != '"':
+            if raw[i] == "]":
+                break
+            i += 1
+            continue
+        # Find the end of this string literal, honouring escapes
+        j = i + 1
+        while j < len(raw) and raw[j] != '"':
+            j += 2 if raw[j] == "\\" else 1
+        literal = raw[i:j + 1] if j < len(raw) else raw[i:] + '"'
+        try:
+            steps.append(json.loads(literal))
+        except ValueError:
+            # Cut inside an escape sequence: keep what decodes
+            try:
+                steps.append(json.loads(literal[:literal.rfind("\\")] + '"'))
+            except ValueError:
+                pass
+        i = j + 1
+    return steps
+
+
+def format_plan(header: str, steps: List[str]) -> str:
+    plan_text = "\n".join(f"{i+1}. {step}" for i, step in enumerate(steps))
+    return f"{header}\n{plan_text}"
+
+
+async def stream_plan(planner: Any, inputs: Dict[str, Any], stream: DeltaStream, header: str) -> Any:
+    """Run the planner, streaming its steps as they are written"""
+    raw: List[str] = []
+
+    async def on_text(text: str, new_message: bool):
+        raw.append(text)
+        steps = partial_steps("".join(raw))
+        if steps:
+            await stream.update(format_plan(header, steps))
+
+    return await stream_events(planner, inputs, on_text, tool_args=True)
+
+
+async def stream_agent(agent: Any, inputs: Dict[str, Any], stream: DeltaStream, config: Optional[Dict[str, Any]] = None) -> Any:
+    """Run the executor agent, streaming the text of each model turn"""
+    async def on_text(text: str, new_message: bool):
+        if new_message and stream.text:
+            text = "\n\n" + text
+        await stream.append(text)
+
+    return await stream_events(agent, inputs, on_text, config=config)
@@ -145,45 +145,57 @@ END OF TECHNICAL REFERENCE
 """
 
 from langchain_core.tools import tool
-from typing import Dict, Any, Literal
+from typing import Dict, Any, List, Literal, Optional, Tuple
+from contextvars import ContextVar
+from itertools import islice
 import asyncio
+import os
 import uuid
 from Arrow_AI_Backend.manager import manager
+from Arrow_AI_Backend.lib.arrow_document import ArrowDocument, snippet
+from Arrow_AI_Backend.lib.arrow_shadow import ShadowProject, ShadowError
+from Arrow_AI_Backend.agent.tools.context import ToolContext, set_context, get_context, clear_context
+from Arrow_AI_Backend.agent.tools.output import compact_result, page_window, project, render, render_page
+from Arrow_AI_Backend.logs import get_logger
+from Arrow_AI_Backend.metrics import counter, gauge, histogram
 import json
+import time
 
 
-# Store current session context (will be set by the agent)
-current_context: Dict[str, Any] = {}
-
 # Store pending function calls waiting for results
 # Maps request_id -> asyncio.Future
 pending_calls: Dict[str, asyncio.Future] = {}
 
+# Message of every pending call, replayed when its session resumes on a new socket
+# Maps request_id -> (session_id, message)
+sent_calls: Dict[str, Tuple[str, Dict[str, Any]]] = {}
 
-def set_context(session_id: str, scene_id: int = None, arrow_file: str = None):
-    """Set the current execution context for tools"""
-    current_context["session_id"] = session_id
-    current_context["scene_id"] = scene_id
-    if arrow_file:
-        try:
-            if isinstance(arrow_file, str):
-                current_context["arrow_file"] = json.loads(arrow_file)
-            else:
-                current_context["arrow_file"] = arrow_file
-        except json.JSONDecodeError as e:
-            print(f"[Tools] Error parsing arrow_file JSON: {e}")
-            print(f"[Tools] Arrow file content (first 200 chars): {arrow_file[:200] if isinstance(arrow_file, str) else 'Not a string'}")
-            current_context["arrow_file"] = {}
+log = get_logger("tools")
+
+FUNCTION_CALL_SECONDS = histogram(
+    "arrow_function_call_seconds",
+    "Client round-trip of function_call (by function), function_call_batch and project_commit",
+    ["function", "outcome"]
+)
+FUNCTION_CALLS = counter("arrow_function_calls", "Editor function calls, by function and where they ran", ["function", "via"])
+gauge("arrow_pending_calls", "Function calls waiting for the client's result", function=lambda: len(pending_calls))
 
+# Seconds to wait for the client to answer a function call (or a whole batch)
+FUNCTION_CALL_TIMEOUT = 30.0
 
-def get_arrow_file() -> str:
-    """Get the current arrow file from context as JSON string"""
-    return current_context.get("arrow_file", "")
+# Run plans against a server-side shadow of the project and send the changes
+# as one project_commit, for clients advertising the "project_commit" capability
+SHADOW_EXECUTION = os.getenv("ARROW_SHADOW_EXECUTION", "1") != "0"
+
+
+def get_arrow_file() -> ArrowDocument | None:
+    """Get the current session's indexed arrow document"""
+    return get_context().arrow_file
 
 
 def get_context_value(key: str) -> Any:
-    """Get a specific value from the current context"""
-    return current_context.get(key)
+    """Get a specific value from the current session's context"""
+    return get_context().get(key)
 
 
 def set_function_result(request_id: str, success: bool, result: Any = None, error: str = None):
@@ -197,50 +209,387 @@ def set_function_result(request_id: str, success: bool, result: Any = None, erro
             future.set_result(result)
         else:
             future.set_exception(Exception(error or "Function call failed"))
-        pending_calls.pop(request_id, None)
+        _forget_call(request_id)
+
+
+def set_batch_result(request_id: str, results: List[Dict[str, Any]]):
+    """
+    Called when a function_result_batch arrives from the client.
+    Resolves the pending Future of the batch with the per-call results.
+    """
+    future = pending_calls.get(request_id)
+    if future and not future.done():
+        future.set_result(results)
+        _forget_call(request_id)
+
+
+async def _send_call(session_id: str, message: Dict[str, Any]) -> asyncio.Future:
+    """Send a message expecting a result (function_call, batch, commit); returns its Future"""
+    request_id = message["request_id"]
+    future = asyncio.get_event_loop().create_future()
+    pending_calls[request_id] = future
+    sent_calls[request_id] = (session_id, message)
+    await manager.send(session_id, message)
+    return future
+
+
+def _forget_call(request_id: str):
+    pending_calls.pop(request_id, None)
+    sent_calls.pop(request_id, None)
+
+
+async def _wait_result(session_id: str, future: asyncio.Future) -> Any:
+    """
+    The result of a sent call, or asyncio.TimeoutError after FUNCTION_CALL_TIMEOUT.
+    The timeout does not run out while the session waits for its client to
+    reconnect (the call is replayed then).
+    """
+    while True:
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=FUNCTION_CALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            if not manager.is_detached(session_id):
+                raise
+
+
+async def replay_pending_calls(session_id: str) -> int:
+    """Send the session's unanswered calls again, in issue order (after a resume)"""
+    messages = [message for owner, message in list(sent_calls.values()) if owner == session_id]
+    for message in messages:
+        await manager.send(session_id, {**message, "replay": True})
+    return len(messages)
+
+
+def drop_pending_calls(session_id: str):
+    """Forget the unanswered calls of a session that ended"""
+    for request_id, (owner, _) in list(sent_calls.items()):
+        if owner == session_id:
+            future = pending_calls.get(request_id)
+            if future is not None and not future.done():
+                future.cancel()
+            _forget_call(request_id)
+
+
+def _format_result(function_name: str, arguments: Dict[str, Any], item: Dict[str, Any]) -> str:
+    """Render a function result the way the agent sees it (compact, see tools/output.py)"""
+    if item["success"]:
+        return compact_result(function_name, arguments, item.get("result"))
+    error = item.get("error", "")
+    # Return error as string so agent can analyze and fix the issue
+    return f"ERROR executing {function_name}: {error or 'Function call failed'}. Analyze the error and use tools to fix it."
 
 
 async def send_function_call(function_name: str, arguments: Dict[str, Any]) -> str:
     """
     Send a function call to the client via WebSocket and wait for the result.
     This function will block until the client sends back a function_result message.
+    Inside run_batched(), the call joins the current batch instead.
+    While a shadow run is active, the call is executed on the shadow project.
+    
+    Several calls may be outstanding per session (see ToolContext.call_slot);
+    calls touching the same node/character/variable keep their issue order.
     
     Returns error messages as strings instead of raising exceptions, so the agent
     can see errors and use tools to fix them autonomously.
     """
-    session_id = current_context.get("session_id")
+    session_id = get_context().session_id
     if not session_id:
         return "ERROR: No session context set. Cannot execute function call."
     
-    # Generate request ID
+    shadow = get_context().shadow
+    if shadow is not None:
+        item = _run_shadow(shadow, function_name, arguments)
+        return _format_result(function_name, arguments, item)
+    
+    collector = _batch_collector.get()
+    if collector is not None and collector.accepts(asyncio.current_task()):
+        item = await collector.enqueue(function_name, arguments)
+        return _format_result(function_name, arguments, item)
+    
+    item = await _send_single(get_context(), function_name, arguments)
+    if item.get("timeout"):
+        # Return error as string so agent can see it and potentially retry
+        return f"ERROR: Timeout waiting for function result: {function_name}. The client may be unresponsive."
+    return _format_result(function_name, arguments, item)
+
+
+async def send_function_call_batch(
+    calls: List[Tuple[str, Dict[str, Any]]],
+    stop_on_error: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Send an ordered list of function calls in a single function_call_batch message
+    and wait for the single function_result_batch that answers it.
+    
+    The client executes the calls in order and saves once. With stop_on_error,
+    calls after the first failure are skipped (reported as failed).
+    Clients that did not advertise the "function_call_batch" capability get the
+    calls one by one instead.
+    
+    Returns one {"success", "result", "error"} dict per call, in order.
+    """
+    if not calls:
+        return []
+    
+    context = get_context()
+    if not context.session_id:
+        return [{"success": False, "result": None, "error": "No session context set"} for _ in calls]
+    
+    if context.shadow is not None:
+        results = []
+        for function_name, arguments in calls:
+            if stop_on_error and results and not results[-1]["success"]:
+                results.append({"success": False, "result": None, "error": "Skipped after earlier failure"})
+                continue
+            results.append(_run_shadow(context.shadow, function_name, arguments))
+        return results
+    
+    if "function_call_batch" not in context.capabilities:
+        results = []
+        for function_name, arguments in calls:
+            if stop_on_error and results and not results[-1]["success"]:
+                results.append({"success": False, "result": None, "error": "Skipped after earlier failure"})
+                continue
+            results.append(await _send_single(context, function_name, arguments))
+        return results
+    
     request_id = str(uuid.uuid4())
+    keys = set()
+    for function_name, arguments in calls:
+        keys.update(_ordering_keys(function_name, arguments))
+    
+    async with context.call_slot(keys):
+        for function_name, _ in calls:
+            FUNCTION_CALLS.inc(function=function_name, via="batch")
+        started = time.perf_counter()
+        
+        future = await _send_call(context.session_id, {
+            "type": "function_call_batch",
+            "request_id": request_id,
+            "calls": [{"function": name, "arguments": arguments} for name, arguments in calls],
+            "stop_on_error": stop_on_error
+        })
+        
+        try:
+            results = await _wait_result(context.session_id, future)
+            FUNCTION_CALL_SECONDS.observe(time.perf_counter() - started, function="function_call_batch", outcome="ok")
+        except asyncio.TimeoutError:
+            FUNCTION_CALL_SECONDS.observe(time.perf_counter() - started, function="function_call_batch", outcome="timeout")
+            error = "Timeout waiting for batch result. The client may be unresponsive."
+            return [{"success": False, "result": None, "error": error} for _ in calls]
+        finally:
+            _forget_call(request_id)
+    
+    # Pad a short answer so every call gets a result
+    results = list(results)[:len(calls)]
+    while len(results) < len(calls):
+        results.append({"success": False, "result": None, "error": "No result returned for this call"})
+    return results
+
+
+def _ordering_keys(function_name: str, arguments: Dict[str, Any]) -> List[str]:
+    """
+    Resources a client call reads or changes. Calls sharing a key keep their
+    issue order; calls with disjoint keys may run concurrently.
+    """
+    keys = []
+    for argument, kind in (("node_id", "node"), ("character_id", "character"), ("variable_id", "variable")):
+        if arguments.get(argument) is not None:
+            keys.append(f"{kind}:{arguments[argument]}")
+    
+    # Node creation only names its scene as a target; scene edits own it
+    if function_name in ("update_scene", "delete_scene") and arguments.get("scene_id") is not None:
+        keys.append(f"scene:{arguments['scene_id']}")
+    
+    # Connections also depend on the nodes they point to
+    io = (arguments.get("modifications") or {}).get("io") or {}
+    for connection in (io.get("push") or []) + (io.get("pop") or []):
+        if len(connection) >= 3:
+            keys.append(f"node:{connection[2]}")
+    
+    # New nodes depend on the character/variable they use
+    data = (arguments.get("preset") or {}).get("data") or {}
+    if data.get("character") is not None:
+        keys.append(f"character:{data['character']}")
+    if data.get("variable") is not None:
+        keys.append(f"variable:{data['variable']}")
+    
+    if function_name in ("set_scene_entry", "set_project_entry"):
+        keys.append(function_name)
+    return keys
+
+
+async def _send_single(context: ToolContext, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """One function_call round-trip, reported in the batch item format"""
+    async with context.call_slot(_ordering_keys(function_name, arguments)):
+        request_id = str(uuid.uuid4())
+        FUNCTION_CALLS.inc(function=function_name, via="client")
+        started = time.perf_counter()
+        future = await _send_call(context.session_id, {
+            "type": "function_call",
+            "request_id": request_id,
+            "function": function_name,
+            "arguments": arguments
+        })
+        try:
+            result = await _wait_result(context.session_id, future)
+            FUNCTION_CALL_SECONDS.observe(time.perf_counter() - started, function=function_name, outcome="ok")
+            return {"success": True, "result": result, "error": ""}
+        except asyncio.TimeoutError:
+            FUNCTION_CALL_SECONDS.observe(time.perf_counter() - started, function=function_name, outcome="timeout")
+            return {"success": False, "result": None, "error": "Timeout waiting for function result", "timeout": True}
+        except Exception as e:
+            FUNCTION_CALL_SECONDS.observe(time.perf_counter() - started, function=function_name, outcome="error")
+            return {"success": False, "result": None, "error": str(e)}
+        finally:
+            _forget_call(request_id)
+
+
+# ========== Shadow Execution ==========
+
+def _run_shadow(shadow: ShadowProject, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """One function call executed on the shadow project, in the batch item format"""
+    FUNCTION_CALLS.inc(function=function_name, via="shadow")
+    try:
+        return {"success": True, "result": shadow.execute(function_name, arguments), "error": ""}
+    except ShadowError as e:
+        return {"success": False, "result": None, "error": str(e)}
+
+
+def start_shadow_run() -> Optional[ShadowProject]:
+    """
+    Route the current session's function calls to a shadow copy of its project,
+    if enabled and supported by the client. Returns the shadow (or None).
+    """
+    context = get_context()
+    if not SHADOW_EXECUTION or "project_commit" not in context.capabilities or context.arrow_file is None:
+        return None
+    context.shadow = ShadowProject(context.arrow_file, scene_id=context.scene_id, base_revision=context.revision)
+    return context.shadow
+
+
+def discard_shadow_run():
+    """Drop the current shadow run without sending anything (e.g. on stop)"""
+    get_context().shadow = None
+
+
+async def commit_shadow_run() -> Optional[str]:
+    """
+    End the current shadow run: send everything it changed to the client as one
+    project_commit (a JSON-Patch against base_revision) and wait for the answer.
+    The client replies with a regular function_result carrying its delta.
     
-    # Create a Future to wait for the result
-    future = asyncio.get_event_loop().create_future()
-    pending_calls[request_id] = future
+    Returns an error message, or None if the commit was applied (or empty).
+    """
+    context = get_context()
+    shadow, context.shadow = context.shadow, None
+    if shadow is None:
+        return None
+    patch = shadow.diff()
+    if not patch:
+        return None
     
-    # Send function call to client
-    await manager.send(session_id, {
-        "type": "function_call",
+    request_id = str(uuid.uuid4())
+    log.info("Committing shadow run", changes=len(patch), calls=shadow.calls)
+    started = time.perf_counter()
+    future = await _send_call(context.session_id, {
+        "type": "project_commit",
         "request_id": request_id,
-        "function": function_name,
-        "arguments": arguments
+        "base_revision": shadow.base_revision,
+        "patch": patch,
+        "calls": shadow.calls
     })
-    
-    
-    # Wait for the result (with timeout)
     try:
-        result = await asyncio.wait_for(future, timeout=30.0)
-        return str(result)
+        await _wait_result(context.session_id, future)
+        FUNCTION_CALL_SECONDS.observe(time.perf_counter() - started, function="project_commit", outcome="ok")
+        return None
     except asyncio.TimeoutError:
-        pending_calls.pop(request_id, None)
-        # Return error as string so agent can see it and potentially retry
-        return f"ERROR: Timeout waiting for function result: {function_name}. The client may be unresponsive."
+        FUNCTION_CALL_SECONDS.observe(time.perf_counter() - started, function="project_commit", outcome="timeout")
+        return "ERROR: Timeout waiting for the editor to apply the changes. The client may be unresponsive."
     except Exception as e:
-        pending_calls.pop(request_id, None)
-        # Return error as string so agent can analyze and fix the issue
-        error_msg = str(e)
-        return f"ERROR executing {function_name}: {error_msg}. Analyze the error and use tools to fix it."
+        FUNCTION_CALL_SECONDS.observe(time.perf_counter() - started, function="project_commit", outcome="error")
+        return f"ERROR: The editor could not apply the changes: {e}"
+    finally:
+        _forget_call(request_id)
+
+
+# ========== Batching ==========
+
+class _BatchCollector:
+    """
+    Gathers the function calls made by a group of concurrently running tool
+    invocations and sends them as one batch once every invocation has either
+    made its call or finished without one (query tools, validation errors).
+    Each invocation contributes at most one call; any further call it makes is
+    sent on its own (the batch has been flushed by then).
+    """
+
+    def __init__(self, expected: int):
+        self.remaining = expected
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+        self.futures: List[asyncio.Future] = []
+        self.enqueued_tasks = set()
+
+    def accepts(self, task: Optional[asyncio.Task]) -> bool:
+        """Whether a call of this task can still join the batch"""
+        return task not in self.enqueued_tasks
+
+    async def enqueue(self, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        task = asyncio.current_task()
+        if not self.accepts(task):
+            raise RuntimeError("A batched invocation can add only one call to the batch")
+        future = asyncio.get_event_loop().create_future()
+        self.calls.append((function_name, arguments))
+        self.futures.append(future)
+        self.enqueued_tasks.add(task)
+        self._settle()
+        return await future
+
+    def task_done(self, task: asyncio.Task):
+        if task not in self.enqueued_tasks:
+            self._settle()
+
+    def _settle(self):
+        self.remaining -= 1
+        if self.remaining == 0 and self.calls:
+            asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        try:
+            results = await send_function_call_batch(self.calls)
+        except Exception as e:
+            results = [{"success": False, "result": None, "error": str(e)} for _ in self.calls]
+        for future, item in zip(self.futures, results):
+            if not future.done():
+                future.set_result(item)
+
+
+# Collector of the run_batched() call the current task belongs to
+_batch_collector: ContextVar[Optional[_BatchCollector]] = ContextVar("arrow_batch_collector", default=None)
+
+
+async def run_batched(invocations: List[Tuple[Any, Dict[str, Any]]]) -> List[Any]:
+    """
+    Invoke several tools concurrently and send every client call they make in
+    one function_call_batch round-trip (in the order the tools issue them).
+    
+    Args:
+        invocations: (tool, arguments) pairs
+    
+    Returns:
+        Each tool's output (or the exception it raised), in order.
+    """
+    collector = _BatchCollector(expected=len(invocations))
+    token = _batch_collector.set(collector)
+    try:
+        tasks = []
+        for tool_, arguments in invocations:
+            task = asyncio.ensure_future(tool_.ainvoke(arguments))
+            task.add_done_callback(collector.task_done)
+            tasks.append(task)
+    finally:
+        _batch_collector.reset(token)
+    return await asyncio.gather(*tasks, return_exceptions=True)
 
 
 # ========== Node Creation Tools ==========
@@ -276,7 +625,7 @@ async def create_dialog_node(
     return await send_function_call("create_insert_node", {
         "type": "dialog",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "character": character_id,
@@ -315,7 +664,7 @@ async def create_content_node(
     return await send_function_call("create_insert_node", {
         "type": "content",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "title": title,
@@ -361,7 +710,7 @@ async def create_condition_node(
     return await send_function_call("create_insert_node", {
         "type": "condition",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "variable": variable_id,
@@ -403,7 +752,7 @@ async def create_variable_update_node(
     return await send_function_call("create_insert_node", {
         "type": "variable_update",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "variable": variable_id,
@@ -480,7 +829,7 @@ async def create_user_input_node(
     return await send_function_call("create_insert_node", {
         "type": "user_input",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "prompt": prompt,
@@ -519,7 +868,7 @@ async def create_monolog_node(
     return await send_function_call("create_insert_node", {
         "type": "monolog",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "character": character_id,
@@ -555,7 +904,7 @@ async def create_interaction_node(
     return await send_function_call("create_insert_node", {
         "type": "interaction",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "actions": actions
@@ -590,7 +939,7 @@ async def create_marker_node(
     return await send_function_call("create_insert_node", {
         "type": "marker",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "label": label,
@@ -624,7 +973,7 @@ async def create_jump_node(
     return await send_function_call("create_insert_node", {
         "type": "jump",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "target": target_node_id,
@@ -669,7 +1018,7 @@ async def create_tag_edit_node(
     return await send_function_call("create_insert_node", {
         "type": "tag_edit",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "character": character_id,
@@ -712,7 +1061,7 @@ async def create_randomizer_node(
     return await send_function_call("create_insert_node", {
         "type": "randomizer",
         "name": name,
-        "scene_id": scene_id or current_context.get("scene_id"),
+        "scene_id": scene_id or get_context().scene_id,
         "preset": {
             "data": {
                 "slots": num_paths
@@ -822,7 +1171,7 @@ async def create_connection(
     # Use update_node_map to add connection (it handles both data and visual drawing)
     return await send_function_call("update_node_map", {
         "node_id": from_node_id,
-        "scene_id": current_context.get("scene_id"),
+        "scene_id": get_context().scene_id,
         "modifications": {
             "io": {
                 "push": [[from_node_id, from_slot, to_node_id, to_slot]]
@@ -856,7 +1205,7 @@ async def delete_connection(
     """
     return await send_function_call("update_node_map", {
         "node_id": from_node_id,
-        "scene_id": current_context.get("scene_id"),
+        "scene_id": get_context().scene_id,
         "modifications": {
             "io": {
                 "pop": [[from_node_id, from_slot, to_node_id, to_slot]]
@@ -865,6 +1214,196 @@ async def delete_connection(
     })
 
 
+# ========== Subgraph Tool ==========
+
+# Node types create_subgraph can build (same as the create_*_node tools)
+SUBGRAPH_NODE_TYPES = {
+    "dialog", "content", "monolog", "interaction", "condition", "randomizer",
+    "variable_update", "user_input", "tag_edit", "jump", "marker",
+}
+
+
+def _output_slot_count(node_type: str, data: Dict[str, Any]) -> Optional[int]:
+    """Number of outgoing slots a node of this type/data will have (None if unknown)"""
+    if node_type == "dialog":
+        return len(data.get("lines", [])) if data.get("playable", True) else 1
+    if node_type == "interaction":
+        return len(data.get("actions", []))
+    if node_type == "condition":
+        return 2
+    if node_type == "randomizer":
+        return data.get("slots") if isinstance(data.get("slots"), int) else None
+    if node_type == "jump":
+        return 0
+    return 1
+
+
+def _validate_subgraph(nodes: list, edges: list, attach: Optional[dict]) -> List[str]:
+    """Check a subgraph spec before anything is sent; returns a list of problems"""
+    problems = []
+    document = get_context().arrow_file
+    aliases: Dict[str, Dict[str, Any]] = {}
+    
+    for index, node in enumerate(nodes):
+        alias = node.get("alias")
+        if not isinstance(alias, str) or not alias:
+            problems.append(f"nodes[{index}]: missing alias")
+            continue
+        if alias in aliases:
+            problems.append(f"nodes[{index}]: duplicate alias {alias!r}")
+        if node.get("type") not in SUBGRAPH_NODE_TYPES:
+            problems.append(f"nodes[{index}] ({alias}): unsupported type {node.get('type')!r}")
+        if not isinstance(node.get("data", {}), dict):
+            problems.append(f"nodes[{index}] ({alias}): data must be an object")
+        aliases[alias] = node
+    
+    def check_endpoint(where: str, ref: Any, outgoing: bool, slot: Any):
+        if not isinstance(slot, int) or slot < 0:
+            problems.append(f"{where}: slot must be a non-negative integer")
+        if isinstance(ref, str) and ref in aliases:
+            if outgoing and isinstance(slot, int):
+                node = aliases[ref]
+                slots = _output_slot_count(node.get("type"), node.get("data") or {})
+                if slots is not None and slot >= slots:
+                    problems.append(f"{where}: {ref!r} ({node.get('type')}) has {slots} output slot(s), got from_slot={slot}")
+        elif isinstance(ref, int) and not isinstance(ref, bool):
+            if document and document.get_node(ref) is None:
+                problems.append(f"{where}: node {ref} does not exist")
+        else:
+            problems.append(f"{where}: {ref!r} is neither an alias nor an existing node ID")
+    
+    for index, edge in enumerate(edges):
+        check_endpoint(f"edges[{index}]", edge.get("from"), True, edge.get("from_slot", 0))
+        check_endpoint(f"edges[{index}]", edge.get("to"), False, edge.get("to_slot", 0))
+    
+    if attach:
+        check_endpoint("attach", attach.get("node_id"), True, attach.get("slot", 0))
+        check_endpoint("attach", attach.get("to"), False, 0)
+    
+    return problems
+
+
+@tool
+async def create_subgraph(
+    nodes: list[dict],
+    edges: list[dict] = None,
+    attach: dict = None,
+    scene_id: int = None
+) -> str:
+    """
+    Create a whole connected structure (several nodes + their connections) as one unit.
+    PREFER THIS over many create_*_node + create_connection calls for any branching
+    or multi-node structure: it takes 2 round-trips instead of dozens of steps.
+    
+    Nodes get local aliases; edges refer to aliases (or to existing node IDs, e.g.
+    to merge branches back into the story). Everything is validated first; if
+    anything fails, the nodes created so far are removed again.
+    
+    Args:
+        nodes: List of {"alias": str, "type": str, "name": str (optional), "data": {...}}
+            type is one of: dialog, content, monolog, interaction, condition, randomizer,
+            variable_update, user_input, tag_edit, jump, marker
+            data uses the same shape the create_*_node tools send, e.g.
+            - dialog: {"character": 10, "lines": ["Yes", "No"], "playable": true}
+            - content: {"title": "Camp", "content": "Night falls."}
+            - monolog: {"character": 10, "monolog": "..."}
+            - interaction: {"actions": ["Attack", "Flee"]}
+            - condition: {"variable": 50, "operator": ">=", "compare_to": {"type": "value", "value": 3}}
+            - variable_update: {"variable": 50, "operation": "add", "value": {"type": "value", "value": 1}}
+            - randomizer: {"slots": 3}
+            - jump: {"target": 8933531975690, "reason": ""}
+        edges: List of {"from": alias|node_id, "to": alias|node_id, "from_slot": 0, "to_slot": 0}
+        attach: Optional entry point from the existing graph:
+            {"node_id": <existing node ID>, "slot": 0, "to": <alias>}
+        scene_id: Scene to create in (defaults to current scene)
+    
+    Returns:
+        JSON with the alias → node ID map and the number of connections made.
+    
+    Example (a choice that branches and merges back into node 57):
+        create_subgraph(
+            nodes=[
+                {"alias": "offer", "type": "dialog", "data": {"character": 11, "lines": ["Help me?"], "playable": false}},
+                {"alias": "choice", "type": "interaction", "data": {"actions": ["Accept", "Refuse"]}},
+                {"alias": "yes", "type": "content", "data": {"title": "", "content": "You agree."}},
+                {"alias": "no", "type": "content", "data": {"title": "", "content": "You walk away."}}
+            ],
+            edges=[
+                {"from": "offer", "to": "choice"},
+                {"from": "choice", "from_slot": 0, "to": "yes"},
+                {"from": "choice", "from_slot": 1, "to": "no"},
+                {"from": "yes", "to": 57},
+                {"from": "no", "to": 57}
+            ],
+            attach={"node_id": 42, "slot": 0, "to": "offer"}
+        )
+    """
+    edges = edges or []
+    problems = _validate_subgraph(nodes, edges, attach)
+    if problems:
+        return "ERROR: Invalid subgraph, nothing was created:\n- " + "\n- ".join(problems)
+    
+    scene_id = scene_id or get_context().scene_id
+    
+    # Round-trip 1: create every node
+    created = await send_function_call_batch([
+        ("create_insert_node", {
+            "type": node["type"],
+            "name": node.get("name", ""),
+            "scene_id": scene_id,
+            "preset": {"data": node.get("data") or {}}
+        })
+        for node in nodes
+    ], stop_on_error=True)
+    
+    ids: Dict[str, int] = {}
+    failures = []
+    for node, item in zip(nodes, created):
+        if item["success"] and isinstance(item.get("result"), int):
+            ids[node["alias"]] = item["result"]
+        elif item["success"]:
+            failures.append(f"{node['alias']}: unexpected result {item.get('result')!r}")
+        else:
+            failures.append(f"{node['alias']}: {item.get('error')}")
+    
+    # Round-trip 2: all connections, one map update per source node
+    connection_errors = []
+    connection_count = 0
+    if not failures:
+        resolve = lambda ref: ids[ref] if isinstance(ref, str) else ref
+        pushes: Dict[int, List[List[int]]] = {}
+        wiring = [(edge.get("from"), edge.get("from_slot", 0), edge.get("to"), edge.get("to_slot", 0)) for edge in edges]
+        if attach:
+            wiring.insert(0, (attach["node_id"], attach.get("slot", 0), attach["to"], 0))
+        for from_ref, from_slot, to_ref, to_slot in wiring:
+            from_id = resolve(from_ref)
+            pushes.setdefault(from_id, []).append([from_id, from_slot, resolve(to_ref), to_slot])
+            connection_count += 1
+        
+        connected = await send_function_call_batch([
+            ("update_node_map", {
+                "node_id": from_id,
+                "scene_id": scene_id,
+                "modifications": {"io": {"push": connections}}
+            })
+            for from_id, connections in pushes.items()
+        ])
+        connection_errors = [
+            f"connections from {from_id}: {item.get('error')}"
+            for from_id, item in zip(pushes, connected) if not item["success"]
+        ]
+    
+    if failures or connection_errors:
+        # Undo: removing the new nodes also drops their connections
+        if ids:
+            await send_function_call_batch([
+                ("delete_node", {"node_id": node_id, "force": True}) for node_id in ids.values()
+            ])
+        return "ERROR: Subgraph failed and was rolled back:\n- " + "\n- ".join(failures + connection_errors)
+    
+    return render({"nodes": ids, "connections": connection_count})
+
+
 # ========== Variable Tools ==========
 
 @tool
@@ -1115,192 +1654,319 @@ async def set_project_entry(
     })
 
 
+# ========== Batch Tool ==========
+
+@tool
+async def run_batch(operations: list[dict]) -> str:
+    """
+    Run several INDEPENDENT tool calls in one round-trip to the editor.
+    
+    Use this to create many things at once when none of them needs an ID
+    returned by another one in the same batch, e.g. several characters and
+    variables, or all nodes of a branch (then connect them in a second batch).
+    
+    Args:
+        operations: List of {"tool": <tool name>, "args": {<tool arguments>}}
+    
+    Returns:
+        JSON list with one {"tool", "output"} entry per operation, in order.
+    
+    Example:
+        run_batch([
+            {"tool": "create_character", "args": {"name": "Elena"}},
+            {"tool": "create_variable", "args": {"name": "trust", "var_type": "num", "initial_value": 0}},
+            {"tool": "create_content_node", "args": {"title": "Camp", "content": "Night falls."}}
+        ])
+    """
+    tools_by_name = {t.name: t for t in ARROW_TOOLS if t.name != "run_batch"}
+    invocations = []
+    for operation in operations:
+        tool_ = tools_by_name.get(operation.get("tool"))
+        if tool_ is None:
+            return f"ERROR: Unknown tool in batch: {operation.get('tool')!r}. Nothing was executed."
+        invocations.append((tool_, operation.get("args") or {}))
+    
+    outputs = await run_batched(invocations)
+    return render([
+        {
+            "tool": operation.get("tool"),
+            "output": f"ERROR: {output}" if isinstance(output, Exception) else _embed(output)
+        }
+        for operation, output in zip(operations, outputs)
+    ])
+
+
+def _embed(output: Any) -> Any:
+    """Nest a tool's JSON output as JSON rather than as an escaped string"""
+    if isinstance(output, str) and output[:1] in ("{", "["):
+        try:
+            return json.loads(output)
+        except ValueError:
+            pass
+    return output
+
+
 # ========== Context Query Tools ==========
 
 @tool
-async def get_nodes(node_type: str = None, character_id: int = None, scene_id: int = None) -> str:
+async def get_nodes(
+    node_type: str = None,
+    character_id: int = None,
+    scene_id: int = None,
+    fields: list[str] = None,
+    limit: int = None,
+    cursor: str = None
+) -> str:
     """
-    Get nodes from the current Arrow file based on filters.
+    Get nodes from the current Arrow file based on filters, one page at a time.
     
     Args:
         node_type: Optional type of node to filter by (dialog, content, condition, etc.)
         character_id: Optional character ID to filter dialog/monolog nodes by character
         scene_id: Optional scene ID to filter nodes from
+        fields: Optional fields to return per node, e.g. ["name", "data.lines"] (id is always included)
+        limit: Page size (default: 25)
+        cursor: next_cursor of the previous page, to get the following page
         
     Returns:
-        List of matching nodes with their data
+        {"items": [...], "total": n, "next_cursor": "..."} - next_cursor is missing on the last page
         
     Examples:
         - get_nodes(node_type="dialog") - Get all dialog nodes
         - get_nodes(node_type="dialog", character_id=11) - Get dialog nodes for character ID 11
-        - get_nodes(character_id=11) - Get all nodes (any type) for character ID 11
+        - get_nodes(character_id=11, fields=["type", "name"]) - Just type and name of every node of character 11
     """
-    arrow_file = current_context.get("arrow_file")
+    arrow_file = get_context().arrow_file
     if not arrow_file:
         return "No Arrow file loaded in context"
         
     try:
-        nodes = arrow_file.get("resources", {}).get("nodes", {})
+        node_ids = arrow_file.node_ids(node_type=node_type, character_id=character_id, scene_id=scene_id)
+        start, stop = page_window(cursor, limit)
         results = []
-        
-        for node_id, node_data in nodes.items():
-            # Filter by node type
-            if node_type and node_data.get("type") != node_type:
-                continue
-                
-            # Filter by character if specified
-            if character_id is not None:
-                node_character = node_data.get("data", {}).get("character")
-                if node_character != character_id:
-                    continue
-                    
-            # Filter by scene if specified
-            if scene_id is not None:
-                # Find node in scene map
-                scene_found = False
-                for scene in arrow_file.get("resources", {}).get("scenes", {}).values():
-                    if str(scene_id) == str(scene.get("id")) and str(node_id) in scene.get("map", {}):
-                        scene_found = True
-                        break
-                if not scene_found:
-                    continue
-                    
-            results.append({
-                "id": node_id,
+        for node_id, node_data in arrow_file.iter_nodes(node_ids[start:stop]):
+            record = {
                 "type": node_data.get("type"),
                 "name": node_data.get("name"),
-                "data": node_data.get("data", {}),
-                "notes": node_data.get("notes", "")
-            })
-            
+                "data": node_data.get("data", {})
+            }
+            if node_data.get("notes"):
+                record["notes"] = node_data["notes"]
+            results.append({"id": int(node_id), **project(record, fields)})
         
-        return json.dumps(results, indent=2)
+        return render_page(results, start, len(node_ids))
         
     except Exception as e:
         return f"Error retrieving nodes: {str(e)}"
 
 
 @tool
-async def get_character(character_id: int = None, character_name: str = None) -> str:
+async def search_nodes(query: str, node_type: str = None, scene_id: int = None, limit: int = 10) -> str:
+    """
+    Full-text search over node content: names, notes, dialog lines, content titles
+    and bodies, monologs, interaction actions, prompts and labels.
+    PREFER THIS over get_nodes() to find where something is said or happens.
+    
+    Args:
+        query: Words to look for (e.g. "artifact temple"); word prefixes also match
+        node_type: Optional node type to restrict to (dialog, content, monolog, ...)
+        scene_id: Optional scene ID to restrict to
+        limit: Maximum number of results (default: 10)
+        
+    Returns:
+        Best matches first: node ID, type, name, matching field and a short snippet
+        
+    Examples:
+        - search_nodes("artifact", node_type="dialog") - Dialogs mentioning the artifact
+        - search_nodes("tavern keeper") - Any node about the tavern keeper
+    """
+    arrow_file = get_context().arrow_file
+    if not arrow_file:
+        return "No Arrow file loaded in context"
+    
+    try:
+        ranked = arrow_file.search(query, node_type=node_type, scene_id=scene_id, limit=max(1, limit))
+        if not ranked:
+            return f"No nodes match {query!r}"
+        results = []
+        for node_id, score in ranked:
+            node = arrow_file.get_node(node_id)
+            field, excerpt = snippet(node, query)
+            result = {"id": int(node_id), "type": node.get("type"), "name": node.get("name"), "field": field, "snippet": excerpt}
+            character = (node.get("data") or {}).get("character")
+            if character is not None:
+                result["character"] = character
+            results.append(result)
+        return render(results)
+    
+    except Exception as e:
+        return f"Error searching nodes: {str(e)}"
+
+
+def _resource_page(resources: Dict[str, Any], fields: Optional[List[str]], limit: Optional[int], cursor: Optional[str]) -> str:
+    """Page of all characters/variables, each with its ID"""
+    start, stop = page_window(cursor, limit)
+    return render_page(
+        [{"id": int(resource_id), **project(resource, fields)} for resource_id, resource in islice(resources.items(), start, stop)],
+        start, len(resources)
+    )
+
+
+@tool
+async def get_character(
+    character_id: int = None,
+    character_name: str = None,
+    fields: list[str] = None,
+    limit: int = None,
+    cursor: str = None
+) -> str:
     """
-    Get character information by ID or name.
+    Get character information by ID or name (or a page of all characters).
     
     Args:
         character_id: ID of the character to retrieve
-        character_name: Name of the character to retrieve
+        character_name: Name of the character to retrieve (case-insensitive)
+        fields: Optional fields to return, e.g. ["name", "color"]
+        limit: Page size when listing all characters (default: 25)
+        cursor: next_cursor of the previous page when listing all characters
         
     Returns:
         Character data if found
     """
-    arrow_file = current_context.get("arrow_file")
+    arrow_file = get_context().arrow_file
     if not arrow_file:
         return "No Arrow file loaded in context"
         
     try:
-        characters = arrow_file.get("resources", {}).get("characters", {})
-        
         # Search by ID
         if character_id is not None:
-            char = characters.get(str(character_id))
+            char = arrow_file.get_character(character_id)
             if char:
-                return json.dumps(char, indent=2)
+                return render({"id": character_id, **project(char, fields)})
             return f"Character with ID {character_id} not found"
             
         # Search by name
         if character_name:
-            for char in characters.values():
-                if char.get("name") == character_name:
-                    return json.dumps(char, indent=2)
+            matches = arrow_file.find_by_name("characters", character_name)
+            if matches:
+                return render({"id": int(matches[0]), **project(arrow_file.get_character(matches[0]), fields)})
             return f"Character named '{character_name}' not found"
             
         # Return all characters if no filters
-        return json.dumps(characters, indent=2)
+        return _resource_page(arrow_file.characters, fields, limit, cursor)
         
     except Exception as e:
         return f"Error retrieving character: {str(e)}"
 
 
 @tool
-async def get_variable(variable_id: int = None, variable_name: str = None) -> str:
+async def get_variable(
+    variable_id: int = None,
+    variable_name: str = None,
+    fields: list[str] = None,
+    limit: int = None,
+    cursor: str = None
+) -> str:
     """
-    Get variable information by ID or name.
+    Get variable information by ID or name (or a page of all variables).
     
     Args:
         variable_id: ID of the variable to retrieve
-        variable_name: Name of the variable to retrieve
+        variable_name: Name of the variable to retrieve (case-insensitive)
+        fields: Optional fields to return, e.g. ["name", "type", "init"]
+        limit: Page size when listing all variables (default: 25)
+        cursor: next_cursor of the previous page when listing all variables
         
     Returns:
         Variable data if found
     """
-    arrow_file = current_context.get("arrow_file")
+    arrow_file = get_context().arrow_file
     if not arrow_file:
         return "No Arrow file loaded in context"
         
     try:
-        variables = arrow_file.get("resources", {}).get("variables", {})
-        
         # Search by ID
         if variable_id is not None:
-            var = variables.get(str(variable_id))
+            var = arrow_file.get_variable(variable_id)
             if var:
-                
-                return json.dumps(var, indent=2)
+                return render({"id": variable_id, **project(var, fields)})
             return f"Variable with ID {variable_id} not found"
             
         # Search by name
         if variable_name:
-            for var in variables.values():
-                if var.get("name") == variable_name:
-                    
-                    return json.dumps(var, indent=2)
+            matches = arrow_file.find_by_name("variables", variable_name)
+            if matches:
+                return render({"id": int(matches[0]), **project(arrow_file.get_variable(matches[0]), fields)})
             return f"Variable named '{variable_name}' not found"
             
         # Return all variables if no filters
-        
-        return json.dumps(variables, indent=2)
+        return _resource_page(arrow_file.variables, fields, limit, cursor)
         
     except Exception as e:
         return f"Error retrieving variable: {str(e)}"
 
 
+def _scene_summary(scene_id: Any, scene: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Compact view of a scene: the node map is reduced to the list of node IDs
+    (offsets are layout noise for the agent) unless "map" is asked for in fields.
+    """
+    summary = {key: value for key, value in scene.items() if key != "map"}
+    summary["nodes"] = [int(node_id) for node_id in (scene.get("map") or {})]
+    if fields and any(field == "map" or field.startswith("map.") for field in fields):
+        summary["map"] = scene.get("map") or {}
+    return {"id": int(scene_id), **project(summary, fields)}
+
+
 @tool
-async def get_scene(scene_id: int = None, scene_name: str = None) -> str:
+async def get_scene(
+    scene_id: int = None,
+    scene_name: str = None,
+    fields: list[str] = None,
+    limit: int = None,
+    cursor: str = None
+) -> str:
     """
-    Get scene information by ID or name.
+    Get scene information by ID or name (or a page of all scenes).
+    
+    By default a scene comes back with its name, entry and the IDs of its nodes;
+    pass fields=["map"] to also get node positions and connections.
     
     Args:
         scene_id: ID of the scene to retrieve
-        scene_name: Name of the scene to retrieve
+        scene_name: Name of the scene to retrieve (case-insensitive)
+        fields: Optional fields to return, e.g. ["name", "entry"] or ["map"]
+        limit: Page size when listing all scenes (default: 25)
+        cursor: next_cursor of the previous page when listing all scenes
         
     Returns:
         Scene data if found
     """
-    arrow_file = current_context.get("arrow_file")
+    arrow_file = get_context().arrow_file
     if not arrow_file:
         return "No Arrow file loaded in context"
         
     try:
-        scenes = arrow_file.get("resources", {}).get("scenes", {})
-        
         # Search by ID
         if scene_id is not None:
-            scene = scenes.get(str(scene_id))
+            scene = arrow_file.get_scene(scene_id)
             if scene:
-                
-                return json.dumps(scene, indent=2)
+                return render(_scene_summary(scene_id, scene, fields))
             return f"Scene with ID {scene_id} not found"
             
         # Search by name
         if scene_name:
-            for scene in scenes.values():
-                if scene.get("name") == scene_name:
-                    
-                    return json.dumps(scene, indent=2)
+            matches = arrow_file.find_by_name("scenes", scene_name)
+            if matches:
+                return render(_scene_summary(matches[0], arrow_file.get_scene(matches[0]), fields))
             return f"Scene named '{scene_name}' not found"
             
         # Return all scenes if no filters
-        
-        return json.dumps(scenes, indent=2)
+        start, stop = page_window(cursor, limit)
+        return render_page(
+            [_scene_summary(scene_id, scene, fields) for scene_id, scene in islice(arrow_file.scenes.items(), start, stop)],
+            start, len(arrow_file.scenes)
+        )
         
     except Exception as e:
         return f"Error retrieving scene: {str(e)}"
@@ -1315,47 +1981,20 @@ async def get_node_connections(node_id: int) -> str:
         node_id: ID of the node to get connections for
         
     Returns:
-        List of connections with source and target nodes
+        {"outgoing": [[from_slot, to_node, to_slot], ...], "incoming": [[from_node, from_slot, to_slot], ...]}
     """
-    arrow_file = current_context.get("arrow_file")
+    arrow_file = get_context().arrow_file
     if not arrow_file:
         return "No Arrow file loaded in context"
         
     try:
-        connections = []
+        outgoing = [[conn[1], conn[2], conn[3]] for conn in arrow_file.outgoing(node_id)]
+        incoming = [[conn[0], conn[1], conn[3]] for conn in arrow_file.incoming(node_id)]
         
-        # Search all scenes for connections involving this node
-        for scene in arrow_file.get("resources", {}).get("scenes", {}).values():
-            scene_map = scene.get("map", {})
-            
-            # Look for the node in this scene
-            node_data = scene_map.get(str(node_id))
-            if node_data:
-                # Get outgoing connections
-                for conn in node_data.get("io", []):
-                    connections.append({
-                        "from_node": conn[0],
-                        "from_slot": conn[1],
-                        "to_node": conn[2],
-                        "to_slot": conn[3]
-                    })
-                    
-                # Get incoming connections
-                for other_node in scene_map.values():
-                    for conn in other_node.get("io", []):
-                        if conn[2] == node_id:
-                            connections.append({
-                                "from_node": conn[0],
-                                "from_slot": conn[1],
-                                "to_node": conn[2],
-                                "to_slot": conn[3]
-                            })
-                            
-        if not connections:
+        if not outgoing and not incoming:
             return f"No connections found for node {node_id}"
-            
         
-        return json.dumps(connections, indent=2)
+        return render({"node": node_id, "outgoing": outgoing, "incoming": incoming})
         
     except Exception as e:
         return f"Error retrieving connections: {str(e)}"
@@ -1390,6 +2029,9 @@ ARROW_TOOLS = [
     create_connection,
     delete_connection,
     
+    # Whole structures (nodes + connections) in one unit
+    create_subgraph,
+    
     # Variables
     create_variable,
     update_variable,
@@ -1407,7 +2049,11 @@ ARROW_TOOLS = [
     set_scene_entry,
     set_project_entry,
     
+    # Batching (many independent operations in one round-trip)
+    run_batch,
+    
     # Context queries
+    search_nodes,
     get_nodes,
     get_character,
     get_variable,
@@ -0,0 +1,141 @@
+"""
+Per-session execution context for the Arrow tools
+Each session gets its own ToolContext (session_id, scene_id, indexed document).
+The context of the session an agent works for is bound to the agent's task via
+a ContextVar, so concurrent sessions in one process never see each other's state.
+"""
+
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional, Set
+import asyncio
+import json
+import os
+
+from Arrow_AI_Backend.lib.arrow_document import ArrowDocument
+from Arrow_AI_Backend.lib.arrow_shadow import ShadowProject
+from Arrow_AI_Backend.logs import get_logger
+
+log = get_logger("tools")
+
+
+# Maximum number of function calls (or batches) a session may have outstanding
+# at the client at once; independent tool calls beyond this wait for a free slot
+MAX_IN_FLIGHT = int(os.getenv("ARROW_MAX_IN_FLIGHT", "8"))
+
+
+class ToolContext:
+    """Execution context of one session"""
+
+    def __init__(self, session_id: str, max_in_flight: int = MAX_IN_FLIGHT):
+        self.session_id = session_id
+        self.scene_id: Optional[int] = None
+        self.revision: Optional[int] = None  # Client revision of the session's document
+        self._arrow_file: Optional[ArrowDocument] = None
+        self.shadow: Optional[ShadowProject] = None  # Set while a plan runs against a shadow copy
+        self.capabilities: Set[str] = set()  # Protocol extensions the client supports
+        self.max_in_flight = max(1, max_in_flight)
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        # Per-resource locks (and how many calls hold or wait for each)
+        self._resource_locks: Dict[str, asyncio.Lock] = {}
+        self._resource_users: Dict[str, int] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    @property
+    def arrow_file(self) -> Optional[ArrowDocument]:
+        """The document tools read: the shadow copy while one is active"""
+        if self.shadow is not None:
+            return self.shadow.document
+        return self._arrow_file
+
+    @arrow_file.setter
+    def arrow_file(self, document: Optional[ArrowDocument]):
+        self._arrow_file = document
+
+    @asynccontextmanager
+    async def call_slot(self, resource_keys: Iterable[str] = ()):
+        """
+        Admit one outstanding client call.
+        Calls sharing a resource key (e.g. "node:12") run one after another in the
+        order they were issued; unrelated calls run concurrently up to max_in_flight.
+        """
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        keys = sorted(set(resource_keys))  # Fixed order, so two calls never deadlock
+        locks = []
+        for key in keys:
+            self._resource_users[key] = self._resource_users.get(key, 0) + 1
+            locks.append(self._resource_locks.setdefault(key, asyncio.Lock()))
+        acquired = []
+        try:
+            for lock in locks:
+                await lock.acquire()
+                acquired.append(lock)
+            async with self._in_flight:
+                yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for key in keys:
+                self._resource_users[key] -= 1
+                if self._resource_users[key] == 0:
+                    del self._resource_users[key]
+                    del self._resource_locks[key]
+
+
+# Context of every live session, keyed by session_id
+session_contexts: Dict[str, ToolContext] = {}
+
+# Context of the session the current task works for
+# asyncio tasks copy the ContextVar on creation, so the agent task started by a
+# session (and every LangGraph node / tool call below it) sees that session only
+_current_context: ContextVar[Optional[ToolContext]] = ContextVar("arrow_tool_context", default=None)
+
+_EMPTY_CONTEXT = ToolContext(session_id="")
+
+
+def set_context(
+    session_id: str,
+    scene_id: int = None,
+    arrow_file: ArrowDocument | dict | str = None,
+    capabilities: Iterable[str] = None,
+    revision: Optional[int] = None
+) -> ToolContext:
+    """
+    Set the execution context of a session and bind it to the current task.
+    arrow_file is normally the session's indexed ArrowDocument; raw dicts and
+    JSON strings are wrapped (and indexed) here.
+    """
+    context = session_contexts.get(session_id)
+    if context is None:
+        context = session_contexts[session_id] = ToolContext(session_id)
+    context.scene_id = scene_id
+    if capabilities is not None:
+        context.capabilities = set(capabilities)
+    if revision is not None:
+        context.revision = revision
+    if arrow_file:
+        try:
+            if isinstance(arrow_file, ArrowDocument):
+                context.arrow_file = arrow_file
+            elif isinstance(arrow_file, str):
+                context.arrow_file = ArrowDocument.from_json(arrow_file)
+            else:
+                context.arrow_file = ArrowDocument(arrow_file)
+        except json.JSONDecodeError as e:
+            log.error("Error parsing arrow_file JSON", error=e, content=arrow_file[:200] if isinstance(arrow_file, str) else type(arrow_file).__name__)
+            context.arrow_file = ArrowDocument({})
+    _current_context.set(context)
+    return context
+
+
+def get_context() -> ToolContext:
+    """Context of the session the current task works for (empty if none is bound)"""
+    return _current_context.get() or _EMPTY_CONTEXT
+
+
+def clear_context(session_id: str):
+    """Forget a session's context (on disconnect)"""
+    session_contexts.pop(session_id, None)
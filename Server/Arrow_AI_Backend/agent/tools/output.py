@@ -0,0 +1,194 @@
+"""
+Compact, budgeted rendering of tool outputs
+Everything a tool returns ends up in the executor's context window, so query
+results are serialized without whitespace, can be projected to a few fields,
+are paginated with an opaque cursor, and are cut to a hard token budget with
+a notice telling the agent how to get the rest.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import os
+
+
+# Hard cap on the size of one tool output, in (estimated) tokens
+MAX_OUTPUT_TOKENS = int(os.getenv("ARROW_TOOL_OUTPUT_TOKENS", "4000"))
+
+# Page size of list queries when the agent does not pass a limit
+DEFAULT_PAGE_SIZE = 25
+
+
+def dumps(value: Any) -> str:
+    """Compact JSON (no indentation, no spaces, unicode kept as is)"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for JSON and English text)"""
+    return (len(text) + 3) // 4
+
+
+def project(record: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """
+    Keep only the requested fields of a record. Dotted names reach into nested
+    objects, e.g. "data.lines" keeps just the lines of a node's data.
+    """
+    if not fields:
+        return record
+    projected: Dict[str, Any] = {}
+    for field in fields:
+        parts = field.split(".")
+        source: Any = record
+        for part in parts:
+            if not isinstance(source, dict) or part not in source:
+                break
+            source = source[part]
+        else:
+            target = projected
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = source
+    return projected
+
+
+def _offset(cursor: Optional[str]) -> int:
+    try:
+        return max(0, int(cursor)) if cursor else 0
+    except ValueError:
+        return 0
+
+
+def page_window(cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[int, int]:
+    """
+    (start, stop) of the page a cursor and limit ask for, so a tool builds only
+    the items of that page
+    """
+    start = _offset(cursor)
+    return start, start + (limit if limit and limit > 0 else DEFAULT_PAGE_SIZE)
+
+
+def render_page(page: List[Any], start: int, total: int, budget: int = MAX_OUTPUT_TOKENS) -> str:
+    """
+    One page of a list result as compact JSON:
+    {"items": [...], "total": n, "next_cursor": "..."}.
+    page holds the items from index start (see page_window) of total in all.
+    The page is shortened further if it would exceed the token budget; an item
+    too large on its own is cut down (see _clip_item), never the page itself.
+    """
+
+    # Grow the page item by item while it fits (leaving room for the notices)
+    rendered: List[str] = []
+    clipped = False
+    used = estimate_tokens('{"items":[],"total":,"next_cursor":"","truncated":""}') + _NOTICE_TOKENS
+    for item in page:
+        text = dumps(item)
+        cost = estimate_tokens(text) + 1
+        if used + cost > budget:
+            if rendered:
+                break
+            # The first item alone is over budget: send what fits of it
+            text = _clip_item(item, (budget - used) * 4)
+            clipped = True
+        rendered.append(text)
+        used += cost
+        if clipped:
+            break
+
+    end = start + len(rendered)
+    output = '{"items":[' + ",".join(rendered) + '],"total":' + str(total)
+    if end < total:
+        output += ',"next_cursor":"' + str(end) + '"'
+    if clipped:
+        output += ',"truncated":' + dumps(
+            f"Item {start} alone exceeds the output budget and was cut; pass fields=[...] to get the parts you need"
+            + (", or cursor=next_cursor for the next items" if end < total else "")
+        )
+    elif len(rendered) < len(page):
+        output += ',"truncated":' + dumps(
+            f"Output budget reached after {len(rendered)} of {len(page)} items; "
+            "pass cursor=next_cursor for more, or fields=[...] for smaller items"
+        )
+    return output + "}"
+
+
+# Tokens kept free on a page for its truncated notice
+_NOTICE_TOKENS = 40
+
+
+def _clip_item(item: Any, max_chars: int) -> str:
+    """
+    Stand-in for an item too large for the page, as valid JSON of about
+    max_chars: its id (to query it with fields) and the start of its JSON text.
+    """
+    stand_in: Dict[str, Any] = {"id": item["id"]} if isinstance(item, dict) and "id" in item else {}
+    text = dumps(item)
+    keep = max(0, max_chars - len(dumps(stand_in)) - 16)
+    while True:
+        stand_in["clipped"] = text[:keep] + "…"
+        clipped = dumps(stand_in)
+        excess = len(clipped) - max_chars
+        if excess <= 0 or keep == 0:
+            return clipped
+        keep = max(0, keep - excess)
+
+
+def render(value: Any, budget: int = MAX_OUTPUT_TOKENS) -> str:
+    """A single result as compact JSON, clipped to the token budget"""
+    return clip(value if isinstance(value, str) else dumps(value), budget)
+
+
+def clip(text: str, budget: int = MAX_OUTPUT_TOKENS) -> str:
+    """Cut a text to the token budget, with a notice saying so"""
+    if estimate_tokens(text) <= budget:
+        return text
+    keep = max(0, budget * 4 - 120)
+    return text[:keep] + f"\n...[TRUNCATED: output was ~{estimate_tokens(text)} tokens, budget is {budget}. Narrow the query or select fields.]"
+
+
+def compact_result(function_name: str, arguments: Dict[str, Any], result: Any) -> str:
+    """
+    Normalized form of a successful client call: new IDs, the previous value
+    for entry changes, and the nodes the call affected.
+    """
+    output: Dict[str, Any] = {"ok": True}
+    if function_name.startswith("create_") and isinstance(result, int) and not isinstance(result, bool):
+        output["id"] = result
+    elif function_name.startswith("delete_") and isinstance(result, bool):
+        output["ok"] = result
+        if not result:
+            output["error"] = "Not removed: still used by other resources (or an entry point); pass force=true to remove anyway"
+    elif function_name in ("set_scene_entry", "set_project_entry") and isinstance(result, int):
+        output["previous_entry"] = result if result >= 0 else None
+    elif isinstance(result, str):
+        if result and not result.endswith("successfully"):
+            output["message"] = result  # Anything beyond the stock "... successfully" text
+    elif result not in (None, True):
+        output["result"] = result
+
+    affected = _affected_nodes(function_name, arguments)
+    if affected:
+        output["affected_nodes"] = affected
+    return dumps(output)
+
+
+def _affected_nodes(function_name: str, arguments: Dict[str, Any]) -> List[int]:
+    nodes: List[int] = []
+
+    def add(node_id: Any):
+        if isinstance(node_id, int) and not isinstance(node_id, bool) and node_id not in nodes:
+            nodes.append(node_id)
+
+    if function_name in ("update_node", "delete_node", "update_node_map", "set_scene_entry", "set_project_entry"):
+        add(arguments.get("node_id"))
+    io = (arguments.get("modifications") or {}).get("io") or {}
+    for connection in _connections(io.get("push"), io.get("pop")):
+        add(connection[0])
+        add(connection[2])
+    return nodes
+
+
+def _connections(*groups: Optional[Iterable[Any]]) -> Iterable[List[Any]]:
+    for group in groups:
+        for connection in group or []:
+            if isinstance(connection, list) and len(connection) >= 3:
+                yield connection
@@ -0,0 +1,256 @@
+"""
+Session broker for multi-worker deployments
+A session lives on the worker that created it: its project, agent run and the
+Futures of its pending function calls are plain objects of that process. The
+broker lets the other workers find and reach it:
+
+- Resume tokens are registered with the broker, so a client that reconnects to
+  any worker (uvicorn --workers N, several processes behind a proxy) learns which
+  worker owns its session.
+- Workers exchange envelopes: the worker holding the client's socket relays its
+  messages (function_result, user_message, ...) to the owner ("inbound"), and
+  the owner's messages go back the same way ("deliver").
+
+Backends (ARROW_BROKER):
+- local (default): a single process; every session is owned locally.
+- socket: workers on one host, sharing ARROW_BROKER_DIR. Tokens are small files
+  in <dir>/tokens, each worker listens on a Unix socket <dir>/workers/<id>.sock.
+
+Another backend (e.g. for several hosts) implements Broker's methods.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import struct
+import tempfile
+
+from starlette.websockets import WebSocketState
+
+from Arrow_AI_Backend.lib import fast_json
+from Arrow_AI_Backend.logs import get_logger
+
+log = get_logger("broker")
+
+# "local" or "socket"
+BROKER_BACKEND = os.getenv("ARROW_BROKER", "local")
+
+# Directory the workers of the socket backend share
+BROKER_DIR = os.getenv("ARROW_BROKER_DIR", os.path.join(tempfile.gettempdir(), "arrow-broker"))
+
+# Envelope handler of a worker
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class Broker:
+    """Session directory and envelope transport between workers"""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        """Start receiving envelopes addressed to this worker"""
+        self.handler = handler
+
+    async def stop(self):
+        pass
+
+    def register_token(self, token: str, session_id: str):
+        """Make a resume token of a session owned by this worker known to every worker"""
+        raise NotImplementedError
+
+    def forget_token(self, token: str):
+        raise NotImplementedError
+
+    def lookup_token(self, token: str) -> Optional[Tuple[str, str]]:
+        """(session_id, owner worker) of a live resume token"""
+        raise NotImplementedError
+
+    async def send(self, worker_id: str, envelope: Dict[str, Any]) -> bool:
+        """Deliver an envelope to a worker's handler, in order; False if unreachable"""
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    """A single worker: the directory is a dict, envelopes never leave the process"""
+
+    def __init__(self):
+        super().__init__()
+        self._tokens: Dict[str, str] = {}
+
+    def register_token(self, token: str, session_id: str):
+        self._tokens[token] = session_id
+
+    def forget_token(self, token: str):
+        self._tokens.pop(token, None)
+
+    def lookup_token(self, token: str) -> Optional[Tuple[str, str]]:
+        session_id = self._tokens.get(token)
+        return (session_id, self.worker_id) if session_id else None
+
+    async def send(self, worker_id: str, envelope: Dict[str, Any]) -> bool:
+        if worker_id != self.worker_id or self.handler is None:
+            return False
+        await self.handler(envelope)
+        return True
+
+
+class SocketBroker(Broker):
+    """
+    Workers on one host. Envelopes are length-prefixed JSON frames over one Unix
+    socket connection per target worker, so they arrive in the order sent.
+    """
+
+    def __init__(self, directory: str = BROKER_DIR):
+        super().__init__()
+        self.directory = directory
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Dict[str, asyncio.StreamWriter] = {}
+        self._connecting: Dict[str, asyncio.Lock] = {}
+        self._own_tokens: Set[str] = set()
+        os.makedirs(os.path.join(directory, "tokens"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "workers"), exist_ok=True)
+
+    def _socket_path(self, worker_id: str) -> str:
+        return os.path.join(self.directory, "workers", f"{worker_id}.sock")
+
+    def _token_path(self, token: str) -> str:
+        # Files are named by hash, so listing the directory reveals no tokens
+        return os.path.join(self.directory, "tokens", hashlib.sha256(token.encode()).hexdigest())
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        path = self._socket_path(self.worker_id)
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._serve, path=path)
+        log.info("Broker listening", worker=self.worker_id, path=path)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        for token in list(self._own_tokens):
+            self.forget_token(token)
+        try:
+            os.unlink(self._socket_path(self.worker_id))
+        except FileNotFoundError:
+            pass
+
+    # ========== Directory ==========
+
+    def register_token(self, token: str, session_id: str):
+        path = self._token_path(token)
+        temporary = f"{path}.{self.worker_id}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"session": session_id, "worker": self.worker_id}, f)
+        os.replace(temporary, path)
+        self._own_tokens.add(token)
+
+    def forget_token(self, token: str):
+        self._own_tokens.discard(token)
+        try:
+            os.unlink(self._token_path(token))
+        except FileNotFoundError:
+            pass
+
+    def lookup_token(self, token: str) -> Optional[Tuple[str, str]]:
+        try:
+            with open(self._token_path(token), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        # Sessions of a worker that is gone cannot be resumed
+        if entry["worker"] != self.worker_id and not os.path.exists(self._socket_path(entry["worker"])):
+            return None
+        return entry["session"], entry["worker"]
+
+    # ========== Transport ==========
+
+    async def send(self, worker_id: str, envelope: Dict[str, Any]) -> bool:
+        if worker_id == self.worker_id:
+            await self.handler(envelope)
+            return True
+        frame = fast_json.dumps(envelope)
+        try:
+            writer = await self._writer(worker_id)
+            writer.write(struct.pack(">I", len(frame)) + frame)
+            await writer.drain()
+            return True
+        except (OSError, ConnectionError) as e:
+            log.warning("Worker unreachable", worker=worker_id, error=e)
+            stale = self._writers.pop(worker_id, None)
+            if stale is not None:
+                stale.close()
+            return False
+
+    async def _writer(self, worker_id: str) -> asyncio.StreamWriter:
+        writer = self._writers.get(worker_id)
+        if writer is not None and not writer.is_closing():
+            return writer
+        async with self._connecting.setdefault(worker_id, asyncio.Lock()):
+            writer = self._writers.get(worker_id)
+            if writer is None or writer.is_closing():
+                _, writer = await asyncio.open_unix_connection(self._socket_path(worker_id))
+                self._writers[worker_id] = writer
+            return writer
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Handle the envelopes of one peer, one after another"""
+        try:
+            while True:
+                size = struct.unpack(">I", await reader.readexactly(4))[0]
+                envelope = fast_json.loads(await reader.readexactly(size))
+                try:
+                    await self.handler(envelope)
+                except Exception as e:
+                    log.error("Error handling envelope", exc_info=True, op=envelope.get("op"), error=e)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class RemoteConnection:
+    """
+    Stand-in for the WebSocket of a session whose client is connected to another
+    worker: the owner's ConnectionManager sends through it like through a socket.
+    """
+
+    def __init__(self, broker: Broker, worker_id: str, session_id: str, on_lost: Callable[["RemoteConnection"], None]):
+        self.broker = broker
+        self.worker_id = worker_id
+        self.session_id = session_id
+        self.on_lost = on_lost
+        self.client_state = WebSocketState.CONNECTED
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message: Dict[str, Any]):
+        if not await self.broker.send(self.worker_id, {"op": "deliver", "session": self.session_id, "message": message}):
+            self.client_state = WebSocketState.DISCONNECTED
+            self.on_lost(self)
+            raise RuntimeError(f"Worker {self.worker_id} is unreachable")
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.client_state = WebSocketState.DISCONNECTED
+        await self.broker.send(self.worker_id, {"op": "close", "session": self.session_id, "code": code, "reason": reason})
+
+
+def create_broker(backend: str = BROKER_BACKEND) -> Broker:
+    if backend == "socket":
+        return SocketBroker()
+    if backend != "local":
+        raise ValueError(f"Unknown ARROW_BROKER backend: {backend}")
+    return LocalBroker()
+
+
+broker = create_broker()
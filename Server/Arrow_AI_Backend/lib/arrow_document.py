@@ -0,0 +1,455 @@
+"""
+Indexed in-memory model of an .arrow project
+Wraps the parsed `resources` (nodes, scenes, variables, characters) and keeps
+lookup indexes so the query tools answer in O(1)/O(k) instead of scanning
+every node and scene.
+
+Indexes are maintained incrementally when the document is patched: only the
+resources touched by a JSON-Patch are re-indexed. `fork()` starts a working copy
+(the shadow project) from these indexes without rebuilding them: the copy
+shares every index bucket with the original until it changes that bucket.
+
+A full-text inverted index over node text (names, notes, dialog lines, content
+titles/bodies, monologs, interaction actions, ...) backs ranked `search()`.
+
+`fingerprint()` is a cheap structural hash (which resources exist, their names,
+node types and entry points) used to key cached planner responses.
+"""
+
+import hashlib
+import math
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from Arrow_AI_Backend.lib import fast_json
+from Arrow_AI_Backend.lib.json_patch import apply_json_patch, split_pointer
+
+
+RESOURCE_KINDS = ("nodes", "scenes", "variables", "characters")
+
+# A connection as stored in a scene map: (from_node, from_slot, to_node, to_slot)
+Connection = Tuple[int, int, int, int]
+
+# Node data fields holding searchable text (str or list of str)
+TEXT_FIELDS = ("lines", "title", "content", "monolog", "actions", "prompt", "label", "reason", "plaque")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens of a text"""
+    return _TOKEN.findall(text.lower())
+
+
+def node_texts(node: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(field, text) pairs of a node's searchable text"""
+    texts = []
+    for field in ("name", "notes"):
+        if isinstance(node.get(field), str) and node[field]:
+            texts.append((field, node[field]))
+    data = node.get("data") or {}
+    for field in TEXT_FIELDS:
+        value = data.get(field)
+        if isinstance(value, str) and value:
+            texts.append((field, value))
+        elif isinstance(value, list):
+            texts.extend((f"{field}[{i}]", item) for i, item in enumerate(value) if isinstance(item, str) and item)
+    return texts
+
+
+def snippet(node: Dict[str, Any], query: str, width: int = 80) -> Tuple[str, str]:
+    """
+    (field, excerpt) of the node text that matches most query words,
+    cut to about `width` characters around the first match.
+    """
+    words = set(tokenize(query))
+    best, best_hits = ("", ""), -1
+    for field, text in node_texts(node):
+        tokens = tokenize(text)
+        hits = sum(1 for token in tokens if token in words or any(token.startswith(word) for word in words))
+        if hits > best_hits:
+            best, best_hits = (field, text), hits
+    field, text = best
+    if len(text) <= width:
+        return field, text
+    lowered = text.lower()
+    positions = [lowered.find(word) for word in words if lowered.find(word) >= 0]
+    start = max(0, min(positions) - width // 4) if positions else 0
+    excerpt = text[start:start + width]
+    return field, ("…" if start > 0 else "") + excerpt + ("…" if start + width < len(text) else "")
+
+
+def _key(resource_id: Any) -> str:
+    """Resource IDs are string keys in the .arrow JSON, but ints everywhere else"""
+    return str(resource_id)
+
+
+def _id_order(resource_id: str):
+    """Sort key that orders numeric IDs by value (i.e. by creation)"""
+    try:
+        return (0, int(resource_id))
+    except ValueError:
+        return (1, resource_id)
+
+
+class ArrowDocument:
+    """Parsed .arrow project with id, type, character, name, scene and adjacency indexes"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.reindex()
+
+    @classmethod
+    def from_json(cls, content: str) -> "ArrowDocument":
+        return cls(fast_json.loads(content))
+
+    def fork(self, data: Dict[str, Any]) -> "ArrowDocument":
+        """
+        Document over `data`, a copy of this document's data (same resources),
+        reusing this document's indexes copy-on-write instead of re-indexing.
+        Both documents copy a shared bucket before changing it, so patching one
+        never affects the other's indexes.
+        """
+        fork = ArrowDocument.__new__(ArrowDocument)
+        fork.data = data
+        fork._by_type = dict(self._by_type)
+        fork._by_character = dict(self._by_character)
+        fork._names = {kind: dict(names) for kind, names in self._names.items()}
+        fork._node_scene = dict(self._node_scene)
+        fork._scene_nodes = dict(self._scene_nodes)
+        fork._outgoing = dict(self._outgoing)
+        fork._incoming = dict(self._incoming)
+        fork._postings = dict(self._postings)
+        fork._node_lengths = dict(self._node_lengths)
+        fork._total_length = self._total_length
+        fork._fingerprint = self._fingerprint
+        fork._owned = {}
+        self._owned = {}
+        return fork
+
+    # ========== Raw Resources ==========
+
+    def _resources(self, kind: str) -> Dict[str, Any]:
+        return self.data.get("resources", {}).get(kind, {})
+
+    @property
+    def nodes(self) -> Dict[str, Any]:
+        return self._resources("nodes")
+
+    @property
+    def scenes(self) -> Dict[str, Any]:
+        return self._resources("scenes")
+
+    @property
+    def variables(self) -> Dict[str, Any]:
+        return self._resources("variables")
+
+    @property
+    def characters(self) -> Dict[str, Any]:
+        return self._resources("characters")
+
+    # ========== Indexing ==========
+
+    def reindex(self):
+        """Rebuild every index from scratch"""
+        self._by_type: Dict[str, Set[str]] = {}
+        self._by_character: Dict[str, Set[str]] = {}
+        self._names: Dict[str, Dict[str, Set[str]]] = {kind: {} for kind in RESOURCE_KINDS}
+        self._node_scene: Dict[str, str] = {}
+        self._scene_nodes: Dict[str, Set[str]] = {}
+        self._outgoing: Dict[str, List[Connection]] = {}
+        self._incoming: Dict[str, Set[Connection]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}  # term -> node_id -> term frequency
+        self._node_lengths: Dict[str, int] = {}  # node_id -> number of tokens
+        self._total_length = 0
+        self._fingerprint: Optional[str] = None
+        # Buckets this document may change in place, per index (None: all of them,
+        # until it is forked or is a fork)
+        self._owned: Optional[Dict[int, Set[Any]]] = None
+
+        for node_id in self.nodes:
+            self._index_node(node_id)
+        for scene_id in self.scenes:
+            self._index_scene(scene_id)
+        for kind in ("variables", "characters"):
+            for resource_id in self._resources(kind):
+                self._index_name(kind, resource_id)
+
+    def _bucket(self, index: Dict[Any, Any], key: Any, factory: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        index[key] to change in place: created by factory if missing (else None),
+        and copied first while it may be shared with a fork (or the original)
+        """
+        bucket = index.get(key)
+        if bucket is None:
+            if factory is None:
+                return None
+            bucket = index[key] = factory()
+        elif self._owned is None or key in self._owned.get(id(index), ()):
+            return bucket
+        else:
+            bucket = index[key] = bucket.copy()
+        if self._owned is not None:
+            self._owned.setdefault(id(index), set()).add(key)
+        return bucket
+
+    def _index_name(self, kind: str, resource_id: str):
+        name = self._resources(kind).get(resource_id, {}).get("name")
+        if isinstance(name, str):
+            self._bucket(self._names[kind], name.lower(), set).add(resource_id)
+
+    def _unindex_name(self, kind: str, resource_id: str):
+        name = self._resources(kind).get(resource_id, {}).get("name")
+        if isinstance(name, str):
+            ids = self._bucket(self._names[kind], name.lower())
+            if ids:
+                ids.discard(resource_id)
+                if not ids:
+                    del self._names[kind][name.lower()]
+
+    def _index_node(self, node_id: str):
+        node = self.nodes.get(node_id)
+        if not isinstance(node, dict):
+            return
+        self._bucket(self._by_type, node.get("type"), set).add(node_id)
+        character = (node.get("data") or {}).get("character")
+        if character is not None:
+            self._bucket(self._by_character, _key(character), set).add(node_id)
+        self._index_name("nodes", node_id)
+        self._index_text(node_id, node)
+
+    def _unindex_node(self, node_id: str):
+        node = self.nodes.get(node_id)
+        if not isinstance(node, dict):
+            return
+        (self._bucket(self._by_type, node.get("type")) or set()).discard(node_id)
+        character = (node.get("data") or {}).get("character")
+        if character is not None:
+            (self._bucket(self._by_character, _key(character)) or set()).discard(node_id)
+        self._unindex_name("nodes", node_id)
+        self._unindex_text(node_id, node)
+
+    def _index_text(self, node_id: str, node: Dict[str, Any]):
+        length = 0
+        for _, text in node_texts(node):
+            for term in tokenize(text):
+                # (per token: skip the copy-on-write check unless buckets are shared)
+                postings = self._postings.setdefault(term, {}) if self._owned is None else self._bucket(self._postings, term, dict)
+                postings[node_id] = postings.get(node_id, 0) + 1
+                length += 1
+        self._node_lengths[node_id] = length
+        self._total_length += length
+
+    def _unindex_text(self, node_id: str, node: Dict[str, Any]):
+        for _, text in node_texts(node):
+            for term in set(tokenize(text)):
+                postings = self._bucket(self._postings, term)
+                if postings is not None:
+                    postings.pop(node_id, None)
+                    if not postings:
+                        del self._postings[term]
+        self._total_length -= self._node_lengths.pop(node_id, 0)
+
+    def _index_scene(self, scene_id: str):
+        scene = self.scenes.get(scene_id)
+        if not isinstance(scene, dict):
+            return
+        members = self._bucket(self._scene_nodes, scene_id, set)
+        for node_id, map_entry in (scene.get("map") or {}).items():
+            members.add(node_id)
+            self._node_scene[node_id] = scene_id
+            for conn in (map_entry or {}).get("io", []) or []:
+                if len(conn) < 4:
+                    continue
+                conn = tuple(conn[:4])
+                self._bucket(self._outgoing, node_id, list).append(conn)
+                self._bucket(self._incoming, _key(conn[2]), set).add(conn)
+        self._index_name("scenes", scene_id)
+
+    def _unindex_scene(self, scene_id: str):
+        scene = self.scenes.get(scene_id)
+        if not isinstance(scene, dict):
+            return
+        for node_id in self._scene_nodes.pop(scene_id, set()):
+            if self._node_scene.get(node_id) == scene_id:
+                del self._node_scene[node_id]
+            for conn in self._outgoing.pop(node_id, []):
+                incoming = self._bucket(self._incoming, _key(conn[2]))
+                if incoming:
+                    incoming.discard(conn)
+        self._unindex_name("scenes", scene_id)
+
+    def _touched(self, operations: List[Dict[str, Any]]) -> Optional[Dict[str, Set[str]]]:
+        """
+        Resources touched by a patch, per kind.
+        Returns None if the patch reaches above a single resource (full reindex).
+        """
+        touched: Dict[str, Set[str]] = {kind: set() for kind in RESOURCE_KINDS}
+        for operation in operations:
+            for path in (operation.get("path"), operation.get("from")):
+                if path is None:
+                    continue
+                tokens = split_pointer(path)
+                if not tokens or tokens[0] != "resources":
+                    # Top-level metadata (title, entry, meta) is not indexed
+                    if tokens and tokens[0] in ("title", "entry", "meta"):
+                        continue
+                    return None
+                if len(tokens) < 3 or tokens[1] not in touched:
+                    return None
+                touched[tokens[1]].add(tokens[2])
+        return touched
+
+    def apply_patch(self, operations: List[Dict[str, Any]]) -> Optional[Dict[str, Set[str]]]:
+        """
+        Apply JSON-Patch operations and re-index only what they touched.
+        Returns the touched resource IDs per kind, or None if everything was re-indexed.
+        """
+        self._fingerprint = None
+        touched = self._touched(operations)
+        if touched is None:
+            self.data = apply_json_patch(self.data, operations)
+            self.reindex()
+            return touched
+
+        for node_id in touched["nodes"]:
+            self._unindex_node(node_id)
+        for scene_id in touched["scenes"]:
+            self._unindex_scene(scene_id)
+        for kind in ("variables", "characters"):
+            for resource_id in touched[kind]:
+                self._unindex_name(kind, resource_id)
+
+        self.data = apply_json_patch(self.data, operations)
+
+        for node_id in touched["nodes"]:
+            self._index_node(node_id)
+        for scene_id in touched["scenes"]:
+            self._index_scene(scene_id)
+        for kind in ("variables", "characters"):
+            for resource_id in touched[kind]:
+                self._index_name(kind, resource_id)
+        return touched
+
+    def fingerprint(self) -> str:
+        """
+        Structural hash of the project: resource IDs, names, node types and entry
+        points. Edits of node text do not change it. Cached until the next patch.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=8)
+            digest.update(f"entry:{self.data.get('entry')}\n".encode())
+            for kind in RESOURCE_KINDS:
+                resources = self._resources(kind)
+                for resource_id in sorted(resources, key=_id_order):
+                    resource = resources[resource_id]
+                    digest.update(
+                        f"{kind}:{resource_id}:{resource.get('name')}:{resource.get('type')}:{resource.get('entry')}\n".encode()
+                    )
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    # ========== Lookups ==========
+
+    def get_node(self, node_id: Any) -> Optional[Dict[str, Any]]:
+        return self.nodes.get(_key(node_id))
+
+    def get_scene(self, scene_id: Any) -> Optional[Dict[str, Any]]:
+        return self.scenes.get(_key(scene_id))
+
+    def get_variable(self, variable_id: Any) -> Optional[Dict[str, Any]]:
+        return self.variables.get(_key(variable_id))
+
+    def get_character(self, character_id: Any) -> Optional[Dict[str, Any]]:
+        return self.characters.get(_key(character_id))
+
+    def find_by_name(self, kind: str, name: str) -> List[str]:
+        """
+        IDs of resources of a kind whose name matches case-insensitively.
+        Exact-case matches come first.
+        """
+        ids = self._names[kind].get(name.lower(), set())
+        resources = self._resources(kind)
+        return sorted(ids, key=lambda rid: (resources.get(rid, {}).get("name") != name, _id_order(rid)))
+
+    def scene_of(self, node_id: Any) -> Optional[str]:
+        """ID of the scene (or macro) whose map holds the node"""
+        return self._node_scene.get(_key(node_id))
+
+    def node_ids(
+        self,
+        node_type: Optional[str] = None,
+        character_id: Optional[int] = None,
+        scene_id: Optional[int] = None
+    ) -> List[str]:
+        """Node IDs matching all given filters, ordered by ID"""
+        candidates: List[Set[str]] = []
+        if node_type:
+            candidates.append(self._by_type.get(node_type, set()))
+        if character_id is not None:
+            candidates.append(self._by_character.get(_key(character_id), set()))
+        if scene_id is not None:
+            candidates.append(self._scene_nodes.get(_key(scene_id), set()))
+        if not candidates:
+            return list(self.nodes.keys())
+
+        candidates.sort(key=len)
+        smallest, rest = candidates[0], candidates[1:]
+        matches = [node_id for node_id in smallest if all(node_id in other for other in rest)]
+        return sorted((node_id for node_id in matches if node_id in self.nodes), key=_id_order)
+
+    def outgoing(self, node_id: Any) -> List[Connection]:
+        """Connections leaving a node, in slot order as stored in its map entry"""
+        return list(self._outgoing.get(_key(node_id), []))
+
+    def incoming(self, node_id: Any) -> List[Connection]:
+        """Connections arriving at a node"""
+        return sorted(self._incoming.get(_key(node_id), set()))
+
+    def search(
+        self,
+        query: str,
+        node_type: Optional[str] = None,
+        scene_id: Optional[int] = None,
+        limit: int = 10
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank nodes by BM25 relevance to a free-text query.
+        A query word with no exact match also matches words it is a prefix of.
+        Returns (node_id, score) pairs, best first.
+        """
+        terms = []
+        for word in dict.fromkeys(tokenize(query)):
+            if word in self._postings:
+                terms.append(word)
+            else:
+                terms.extend(term for term in self._postings if term.startswith(word))
+        if not terms:
+            return []
+
+        allowed = set(self.node_ids(node_type=node_type, scene_id=scene_id)) if (node_type or scene_id is not None) else None
+        count = max(len(self._node_lengths), 1)
+        average = (self._total_length / count) or 1.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            postings = self._postings[term]
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for node_id, tf in postings.items():
+                if allowed is not None and node_id not in allowed:
+                    continue
+                norm = _K1 * (1 - _B + _B * self._node_lengths.get(node_id, 0) / average)
+                scores[node_id] = scores.get(node_id, 0.0) + idf * tf * (_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], _id_order(item[0])))
+        return ranked[:limit]
+
+    def iter_nodes(self, node_ids: Iterable[str]):
+        """(id, node) pairs for existing nodes among the given IDs"""
+        nodes = self.nodes
+        for node_id in node_ids:
+            node = nodes.get(node_id)
+            if node is not None:
+                yield node_id, node
@@ -0,0 +1,799 @@
+"""
+Shadow project: server-side dry-run of the editor's mutation functions
+Mirrors what the Arrow client does for each function_call (see the Godot
+`ai_command_dispatcher.gd`, `resource_wrappers.gd` and `central_mind.gd`) on a
+copy-on-write view of the session's document, so a whole plan can be executed
+without a WebSocket round-trip per tool call.
+
+Every change is applied to the shadow as a JSON-Patch operation (which keeps
+the ArrowDocument indexes current for the query tools), and `diff()` folds
+them into one minimal patch against the original document, to be sent to the
+client as a single commit.
+
+Covered semantics: resource ID allocation (native flake IDs from `meta.authors`
+seeds, or time-based IDs for projects with an epoch), default node data and
+names, `ref`/`use` bookkeeping, scene/project entries, node maps (io/offset/
+skip), safe vs forced removal, and name-exposure revision on renames.
+"""
+
+import copy
+import random
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from Arrow_AI_Backend.lib.arrow_document import ArrowDocument, RESOURCE_KINDS
+
+
+class ShadowError(Exception):
+    """Raised when a function call is invalid for the shadow project"""
+
+
+# ========== Editor Settings (mirrors Arrow's settings.gd) ==========
+
+# Bit sizes of native flake IDs: chapter, author, per-author seed
+UID_BIT_SIZES = (10, 6, 37)
+CHAPTER_SHIFT = UID_BIT_SIZES[1] + UID_BIT_SIZES[2]
+AUTHOR_SHIFT = UID_BIT_SIZES[2]
+
+ANONYMOUS_AUTHOR_INFO = "Anonymous"
+
+VARIABLE_NAMES_PREFIX = "var_"
+CHARACTER_NAMES_PREFIX = "char_"
+SCENE_NAME_PREFIX = "scene_"
+MACRO_NAME_PREFIX = "macro_"
+REUSED_NAME_POSTFIX = "_"
+
+NEW_SCENE_ENTRY_NODE_TYPE = "entry"
+NEW_SCENE_ENTRY_NODE_OFFSET = [100, 100]
+
+# Spacing used to place new nodes when no offset is given
+AUTO_LAYOUT_STEP = [300, 0]
+
+VARIABLE_DEFAULTS = {"num": 0, "str": "", "bool": False}
+
+# Data of a freshly created node, per type (each inspector's DEFAULT_NODE_DATA)
+DEFAULT_NODE_DATA: Dict[str, Dict[str, Any]] = {
+    "entry": {"plaque": ""},
+    "content": {"title": "", "content": "", "brief": 0, "auto": False, "clear": False},
+    "dialog": {"character": -1, "lines": ["Hey there!"], "playable": False},
+    "monolog": {"character": -1, "monolog": "", "brief": 0, "auto": False, "clear": False},
+    "interaction": {"actions": ["Go ahead!"]},
+    "condition": {"variable": -1, "operator": "eq", "with": [0, None]},
+    "variable_update": {"variable": -1, "operator": "set", "with": [0, None]},
+    "user_input": {"prompt": "", "variable": -1, "custom": []},
+    "generator": {"variable": -1, "method": "rnd"},
+    "randomizer": {"slots": 2},
+    "sequencer": {"slots": 2},
+    "hub": {"slots": 2},
+    "jump": {"target": -1, "reason": ""},
+    "marker": {"label": "", "color": None},
+    "frame": {"label": "", "color": None, "rect": [128, 128]},
+    "macro_use": {"macro": -1},
+    "tag_edit": {"character": -1, "edit": [1, "", ""]},
+    "tag_match": {"character": -1, "tag_key": "", "patterns": [""], "regex": False},
+    "tag_pass": {"character": -1, "pass": [0, [["", None]]]},
+}
+
+# Node types whose data fields expose resource names without braces
+NODE_TYPES_WITH_DIRECT_EXPOSURES = {"condition", "variable_update", "user_input", "generator"}
+
+_MISSING = object()
+
+
+def int_to_base36(value: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    if value == 0:
+        return "0"
+    result = ""
+    while value > 0:
+        value, remainder = divmod(value, 36)
+        result = digits[remainder] + result
+    return result
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _as_int(value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _update_dictionary(original: Dict[str, Any], modification: Dict[str, Any]):
+    """
+    Helpers.Utils.recursively_update_dictionary(original, modification, false, true):
+    nested dicts are merged, None erases a key, anything else is set.
+    """
+    for key, value in modification.items():
+        current = original.get(key, _MISSING)
+        if isinstance(current, dict) and isinstance(value, dict):
+            _update_dictionary(current, value)
+        elif value is None:
+            original.pop(key, None)
+        else:
+            original[key] = copy.deepcopy(value)
+
+
+def _replace_strings(value: Any, old: str, new: str) -> Any:
+    """Helpers.Utils.recursively_replace_string"""
+    if isinstance(value, str):
+        return value.replace(old, new)
+    if isinstance(value, list):
+        return [_replace_strings(item, old, new) for item in value]
+    if isinstance(value, dict):
+        return {key: _replace_strings(item, old, new) for key, item in value.items()}
+    return value
+
+
+class ShadowProject:
+    """
+    Copy-on-write working copy of a session's project that executes editor
+    functions locally and records the resulting changes.
+    """
+
+    def __init__(self, document: ArrowDocument, scene_id: Optional[int] = None, base_revision: Optional[int] = None):
+        base = document.data
+        resources = base.get("resources", {})
+        # Share every resource with the original; a resource is replaced (never
+        # mutated) when it changes, so the session's document is left untouched.
+        data = dict(base)
+        data["resources"] = {kind: dict(resources.get(kind, {})) for kind in RESOURCE_KINDS}
+        data["meta"] = copy.deepcopy(base.get("meta", {}))
+        # Same resources, so the session document's indexes serve (copy-on-write)
+        self.document = document.fork(data)
+        self.base_revision = base_revision
+        self.scene_id = scene_id
+        self.calls = 0
+        # Original value of every path changed so far, in first-touch order
+        self._originals: Dict[str, Any] = {}
+        self._base_meta = base.get("meta", {})
+        self._author = self._active_author()
+        self._snow_sequence = (0, -1)  # (millisecond, last index) for time-based IDs
+
+    # ========== Commit ==========
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self.document.data
+
+    def diff(self) -> List[Dict[str, Any]]:
+        """One JSON-Patch from the original document to the shadow's current state"""
+        operations = []
+        for path, original in self._originals.items():
+            current = self._lookup(path)
+            if current is _MISSING and original is not _MISSING:
+                operations.append({"op": "remove", "path": path})
+            elif current is not _MISSING and original is _MISSING:
+                operations.append({"op": "add", "path": path, "value": current})
+            elif current is not _MISSING and current != original:
+                operations.append({"op": "replace", "path": path, "value": current})
+        return operations
+
+    def _lookup(self, path: str) -> Any:
+        tokens = path[1:].split("/")
+        target = self.data
+        for token in tokens:
+            if not isinstance(target, dict) or token not in target:
+                return _MISSING
+            target = target[token]
+        return target
+
+    # ========== Writes ==========
+
+    def _path(self, kind: str, resource_id: Any) -> str:
+        return f"/resources/{kind}/{_escape(str(resource_id))}"
+
+    def _remember(self, path: str, original: Any):
+        if path not in self._originals:
+            self._originals[path] = copy.deepcopy(original) if path.startswith("/meta") else original
+
+    def _write(self, kind: str, resource_id: Any, value: Dict[str, Any]):
+        """Add or replace a whole resource"""
+        key = str(resource_id)
+        existing = self.document._resources(kind).get(key, _MISSING)
+        path = self._path(kind, key)
+        self._remember(path, existing)
+        self.document.apply_patch([{"op": "replace" if existing is not _MISSING else "add", "path": path, "value": value}])
+
+    def _erase(self, kind: str, resource_id: Any):
+        key = str(resource_id)
+        existing = self.document._resources(kind).get(key, _MISSING)
+        if existing is _MISSING:
+            return
+        path = self._path(kind, key)
+        self._remember(path, existing)
+        self.document.apply_patch([{"op": "remove", "path": path}])
+
+    def _copy(self, kind: str, resource_id: Any) -> Dict[str, Any]:
+        resource = self.document._resources(kind).get(str(resource_id))
+        if not isinstance(resource, dict):
+            raise ShadowError(f"{kind[:-1].capitalize()} {resource_id} does not exist")
+        return copy.deepcopy(resource)
+
+    def _set_entry(self, node_id: int):
+        self._remember("/entry", self.data.get("entry", _MISSING))
+        self.document.apply_patch([{"op": "add", "path": "/entry", "value": node_id}])
+
+    # ========== ID Allocation ==========
+
+    def _active_author(self) -> int:
+        """
+        The server does not know which author the editor is set to, so the
+        author with the most advanced seed (the one writing most) is used.
+        """
+        meta = self.data["meta"]
+        authors = meta.get("authors")
+        if not isinstance(authors, dict) or not authors:
+            meta["authors"] = {"0": [ANONYMOUS_AUTHOR_INFO, -1 if self._uses_epoch() else 0]}
+            self._originals["/meta/authors"] = copy.deepcopy(self._base_meta.get("authors", _MISSING))
+            return 0
+        best = max(authors, key=lambda key: (authors[key][1] if isinstance(authors[key], list) else 0, -int(key)))
+        return int(best)
+
+    def _uses_epoch(self) -> bool:
+        epoch = self.data["meta"].get("epoch")
+        return isinstance(epoch, int) and epoch > 0
+
+    def _next_resource_id(self) -> int:
+        meta = self.data["meta"]
+        if self._uses_epoch():
+            # Time-based (snowflake) ID: 41 bits ms since epoch, 6 bits author, 16 bits sequence
+            now = int(time.time() * 1000)
+            millisecond, index = self._snow_sequence
+            if now > millisecond:
+                index = 0
+            elif index < 65535:
+                now, index = millisecond, index + 1
+            else:
+                now, index = millisecond + 1, 0
+            self._snow_sequence = (now, index)
+            return ((now - meta["epoch"]) << 22) | ((self._author % 64) << 16) | index
+        key = str(self._author)
+        info, seed = meta["authors"][key]
+        path = f"/meta/authors/{key}"
+        self._remember(path, self._base_meta.get("authors", {}).get(key, _MISSING))
+        meta["authors"][key] = [info, seed + 1]
+        return (meta.get("chapter", 0) << CHAPTER_SHIFT) | (self._author << AUTHOR_SHIFT) | seed
+
+    def _uid_is_used(self, uid: int) -> bool:
+        key = str(uid)
+        return any(key in self.document._resources(kind) for kind in RESOURCE_KINDS)
+
+    def create_new_resource_id(self) -> int:
+        uid = self._next_resource_id()
+        while uid > 0 and self._uid_is_used(uid):
+            uid = self._next_resource_id()
+        return uid
+
+    def _unique_name(self, kind: str, name: str) -> str:
+        resources = self.document._resources(kind)
+        while any(resources[rid].get("name") == name for rid in self.document.find_by_name(kind, name)):
+            name += REUSED_NAME_POSTFIX
+        return name
+
+    # ========== Lookups ==========
+
+    def _field_of(self, resource_id: Any) -> Optional[str]:
+        key = str(resource_id)
+        for kind in RESOURCE_KINDS:
+            if key in self.document._resources(kind):
+                return kind
+        return None
+
+    def _scene_for(self, scene_id: Any) -> str:
+        scene_id = _as_int(scene_id)
+        if scene_id is None or scene_id < 0:
+            scene_id = self.scene_id
+        if scene_id is None or self.document.get_scene(scene_id) is None:
+            raise ShadowError(f"Scene {scene_id} does not exist")
+        return str(scene_id)
+
+    def _is_macro(self, scene_id: str) -> bool:
+        return bool((self.document.get_scene(scene_id) or {}).get("macro"))
+
+    # ========== References (`ref` on users, `use` on used resources) ==========
+
+    def _node_references(self, node: Dict[str, Any]) -> Set[int]:
+        """Resources a node refers to through its data"""
+        data = node.get("data") or {}
+        refs = set()
+        for field in ("character", "variable", "target", "macro"):
+            value = _as_int(data.get(field))
+            if value is not None and value >= 0:
+                refs.add(value)
+        for field in ("with",):
+            param = data.get(field)
+            if isinstance(param, list) and len(param) == 2 and param[0] == 1:
+                value = _as_int(param[1])
+                if value is not None and value >= 0:
+                    refs.add(value)
+        return {ref for ref in refs if self._field_of(ref) is not None}
+
+    def _use(self, user_id: Any, drop: Set[int], refer: Set[int], user: Optional[Dict[str, Any]] = None):
+        """central_mind.handle_use_command_parameter: keep `use` and `ref` in step"""
+        for resource_id in drop:
+            kind = self._field_of(resource_id)
+            if kind is None:
+                continue
+            resource = self._copy(kind, resource_id)
+            use = [uid for uid in resource.get("use", []) if str(uid) != str(user_id)]
+            if use:
+                resource["use"] = use
+            else:
+                resource.pop("use", None)
+            self._write(kind, resource_id, resource)
+        for resource_id in refer:
+            kind = self._field_of(resource_id)
+            if kind is None:
+                continue
+            resource = self._copy(kind, resource_id)
+            use = resource.get("use") if isinstance(resource.get("use"), list) else []
+            if int(user_id) not in use:
+                resource["use"] = use + [int(user_id)]
+                self._write(kind, resource_id, resource)
+        if user is not None:
+            ref = [r for r in user.get("ref", []) if r not in drop]
+            ref += [r for r in sorted(refer) if r not in ref]
+            if ref:
+                user["ref"] = ref
+            else:
+                user.pop("ref", None)
+
+    # ========== Resource Update / Removal ==========
+
+    def update_resource(self, resource_id: Any, modification: Dict[str, Any], kind: str = ""):
+        """central_mind.update_resource (with `_use`, `_as_entry`, `_exposure_revision` commands)"""
+        kind = kind if kind and str(resource_id) in self.document._resources(kind) else self._field_of(resource_id)
+        if kind is None:
+            raise ShadowError(f"Resource {resource_id} does not exist")
+        resource = self._copy(kind, resource_id)
+        old_name = resource.get("name")
+        modification = copy.deepcopy(modification)
+        data = modification.get("data")
+        commands = {}
+        if isinstance(data, dict):
+            for command in ("_use", "_as_entry", "_exposure_revision"):
+                if command in data:
+                    commands[command] = data.pop(command)
+
+        old_refs = self._node_references(resource) if kind == "nodes" else set()
+        _update_dictionary(resource, modification)
+
+        if kind == "nodes":
+            new_refs = self._node_references(resource)
+            use = commands.get("_use") if isinstance(commands.get("_use"), dict) else {}
+            drop = (old_refs - new_refs) | {r for r in use.get("drop", []) if isinstance(r, int) and r >= 0}
+            refer = (new_refs - old_refs) | {r for r in use.get("refer", []) if isinstance(r, int) and r >= 0}
+            if drop or refer:
+                self._use(resource_id, drop, refer, resource)
+        self._write(kind, resource_id, resource)
+
+        as_entry = commands.get("_as_entry")
+        if isinstance(as_entry, dict) and as_entry.get("node_id") is not None:
+            if as_entry.get("for_scene"):
+                self.update_scene_entry(as_entry["node_id"])
+            if as_entry.get("for_project"):
+                self.update_project_entry(as_entry["node_id"])
+
+        users = resource.get("use") if isinstance(resource.get("use"), list) else []
+        for revision in commands.get("_exposure_revision") or []:
+            if isinstance(revision, list) and len(revision) == 4:
+                self._revise_name_exposure(users, *revision)
+        new_name = resource.get("name")
+        if old_name is not None and new_name != old_name:
+            if kind == "variables":
+                self._revise_name_exposure(users, old_name, new_name)
+            elif kind == "characters":
+                for tag in (resource.get("tags") or {}):
+                    self._revise_name_exposure(users, tag, tag, old_name, new_name)
+
+    def _revise_name_exposure(self, users: List[Any], old_name: str, new_name: str, old_parent: str = "", new_parent: str = ""):
+        """Rewrite `{name}` (or `{parent.name}`) exposures in the nodes using a renamed resource"""
+        old_exposure = "{" + (old_parent + "." if old_parent else "") + old_name + "}"
+        new_exposure = "{" + (new_parent + "." if new_parent else "") + new_name + "}"
+        for user_id in users:
+            node = self.document.get_node(user_id)
+            if not isinstance(node, dict) or not isinstance(node.get("data"), dict):
+                continue
+            data = _replace_strings(node["data"], old_exposure, new_exposure)
+            if node.get("type") in NODE_TYPES_WITH_DIRECT_EXPOSURES:
+                data = _replace_strings(data, old_name, new_name)
+            if data != node["data"]:
+                updated = copy.deepcopy(node)
+                updated["data"] = data
+                self._write("nodes", user_id, updated)
+
+    def _entries(self) -> Set[str]:
+        entries = {str(self.data.get("entry"))}
+        entries.update(str(scene.get("entry")) for scene in self.document.scenes.values())
+        return entries
+
+    def remove_resource(self, resource_id: Any, kind: str = "", forced: bool = False) -> bool:
+        """
+        central_mind.remove_resource: used resources (and scenes with used nodes)
+        are kept unless forced. Returns True if removed.
+        """
+        kind = kind if kind and str(resource_id) in self.document._resources(kind) else self._field_of(resource_id)
+        if kind is None:
+            raise ShadowError(f"Resource {resource_id} does not exist")
+        resource = self.document._resources(kind)[str(resource_id)]
+        removable = not resource.get("use")
+        if kind == "scenes":
+            removable = self._removable_nodes(list((resource.get("map") or {}).keys()))
+        if not (removable or forced):
+            return False
+
+        if resource.get("ref"):
+            self._use(resource_id, set(resource["ref"]), set())
+        if kind == "nodes":
+            self._detach_node(resource_id)
+        elif kind == "scenes":
+            self._remove_nodes(list((resource.get("map") or {}).keys()))
+        self._erase(kind, resource_id)
+        return True
+
+    def _removable_nodes(self, node_ids: List[str]) -> bool:
+        """central_mind.batch_remove_resources(check_only): no entries, no users outside the set"""
+        batch = {str(node_id) for node_id in node_ids}
+        entries = {str(self.data.get("entry"))}
+        for node_id in batch:
+            if node_id in entries:
+                return False
+            users = (self.document.get_node(node_id) or {}).get("use") or []
+            if any(str(user) not in batch for user in users):
+                return False
+        return True
+
+    def _remove_nodes(self, node_ids: List[str]):
+        # Users first, so nothing is left referring to a removed node
+        remaining = list(node_ids)
+        while remaining:
+            for node_id in list(remaining):
+                users = (self.document.get_node(node_id) or {}).get("use") or []
+                if not any(str(user) in remaining and str(user) != node_id for user in users):
+                    self.remove_resource(node_id, "nodes", True)
+                    remaining.remove(node_id)
+                    break
+            else:
+                for node_id in remaining:
+                    self.remove_resource(node_id, "nodes", True)
+                break
+
+    def _detach_node(self, node_id: Any):
+        """Drop a node's map entry and every connection leading to it"""
+        key = str(node_id)
+        scene_id = self.document.scene_of(key)
+        if scene_id is None:
+            return
+        scene = self._copy("scenes", scene_id)
+        scene["map"].pop(key, None)
+        for source, map_entry in scene["map"].items():
+            io = map_entry.get("io")
+            if isinstance(io, list):
+                kept = [conn for conn in io if not (len(conn) >= 3 and str(conn[2]) == key)]
+                if len(kept) != len(io):
+                    map_entry["io"] = kept
+        self._write("scenes", scene_id, scene)
+
+    # ========== Entries ==========
+
+    def update_scene_entry(self, node_id: Any) -> int:
+        scene_id = self.document.scene_of(node_id)
+        if scene_id is None:
+            return -1
+        scene = self._copy("scenes", scene_id)
+        previous = scene.get("entry")
+        if previous == int(node_id):
+            return -1
+        scene["entry"] = int(node_id)
+        self._write("scenes", scene_id, scene)
+        return previous if isinstance(previous, int) else -1
+
+    def update_project_entry(self, node_id: Any) -> int:
+        scene_id = self.document.scene_of(node_id)
+        if scene_id is None:
+            return -1
+        if self._is_macro(scene_id):
+            raise ShadowError("The project entry can not be inside a macro")
+        previous = self.data.get("entry")
+        if previous == int(node_id):
+            return -1
+        self._set_entry(int(node_id))
+        return previous if isinstance(previous, int) else -1
+
+    # ========== Creation ==========
+
+    def _new_node(self, node_type: str, node_id: int) -> Dict[str, Any]:
+        # NODE_INITIAL_NAME_TEMPLATE is "{node_id_base36}", so no scene prefix
+        name = self._unique_name("nodes", int_to_base36(node_id))
+        return {"type": node_type, "name": name, "data": copy.deepcopy(DEFAULT_NODE_DATA[node_type])}
+
+    def _auto_offset(self, scene_id: str) -> List[int]:
+        """Place a new node next to the most recently added one in the scene"""
+        scene_map = (self.document.get_scene(scene_id) or {}).get("map") or {}
+        if not scene_map:
+            return list(NEW_SCENE_ENTRY_NODE_OFFSET)
+        last = list(scene_map.values())[-1].get("offset") or [0, 0]
+        return [last[0] + AUTO_LAYOUT_STEP[0], last[1] + AUTO_LAYOUT_STEP[1]]
+
+    def create_insert_node(
+        self,
+        node_type: str,
+        offset: Optional[List[int]] = None,
+        scene_id: Any = None,
+        preset: Optional[Dict[str, Any]] = None
+    ) -> int:
+        if node_type not in DEFAULT_NODE_DATA:
+            raise ShadowError(f"Unknown node type: {node_type}")
+        scene_key = self._scene_for(scene_id)
+        node_id = self.create_new_resource_id()
+        node = self._new_node(node_type, node_id)
+        if not (isinstance(offset, list) and len(offset) == 2 and offset != [0, 0]):
+            offset = self._auto_offset(scene_key)
+        scene = self._copy("scenes", scene_key)
+        scene.setdefault("map", {})[str(node_id)] = {"offset": list(offset)}
+        self._write("nodes", node_id, node)
+        self._write("scenes", scene_key, scene)
+        if preset:
+            self.update_resource(node_id, preset, "nodes")
+        return node_id
+
+    def create_new_variable(self, var_type: str) -> int:
+        if var_type not in VARIABLE_DEFAULTS:
+            raise ShadowError(f"Unknown variable type: {var_type}")
+        variable_id = self.create_new_resource_id()
+        self._write("variables", variable_id, {
+            "name": self._unique_name("variables", VARIABLE_NAMES_PREFIX + int_to_base36(variable_id)),
+            "type": var_type,
+            "init": VARIABLE_DEFAULTS[var_type],
+        })
+        return variable_id
+
+    def create_new_character(self) -> int:
+        character_id = self.create_new_resource_id()
+        self._write("characters", character_id, {
+            "name": self._unique_name("characters", CHARACTER_NAMES_PREFIX + int_to_base36(character_id)),
+            "color": "%06x" % random.randrange(0x1000000),
+        })
+        return character_id
+
+    def create_new_scene(self, is_macro: bool = False) -> int:
+        scene_id = self.create_new_resource_id()
+        prefix = MACRO_NAME_PREFIX if is_macro else SCENE_NAME_PREFIX
+        scene = {
+            "name": self._unique_name("scenes", prefix + int_to_base36(scene_id)),
+            "entry": None,
+            "map": {},
+        }
+        if is_macro:
+            scene["macro"] = True
+        self._write("scenes", scene_id, scene)
+        node_id = self.create_new_resource_id()
+        self._write("nodes", node_id, self._new_node(NEW_SCENE_ENTRY_NODE_TYPE, node_id))
+        scene = self._copy("scenes", scene_id)
+        scene["map"][str(node_id)] = {"offset": list(NEW_SCENE_ENTRY_NODE_OFFSET)}
+        scene["entry"] = node_id
+        self._write("scenes", scene_id, scene)
+        return scene_id
+
+    # ========== Node Map ==========
+
+    def update_node_map(self, node_id: Any, modification: Dict[str, Any], scene_id: Any = None):
+        """central_mind.update_node_map: skip, io push/pop and offset"""
+        key = str(node_id)
+        scene_key = str(scene_id) if scene_id is not None and _as_int(scene_id) not in (None, -1) else (
+            str(self.scene_id) if self.scene_id is not None else None
+        )
+        if scene_key is None or key not in ((self.document.get_scene(scene_key) or {}).get("map") or {}):
+            scene_key = self.document.scene_of(key)
+        if scene_key is None:
+            raise ShadowError(f"Node {node_id} is not in any scene")
+        scene = self._copy("scenes", scene_key)
+        entry = scene["map"][key]
+        for field, value in modification.items():
+            if field == "skip" and isinstance(value, bool):
+                if value:
+                    entry["skip"] = True
+                else:
+                    entry.pop("skip", None)
+            elif field == "io" and isinstance(value, dict):
+                io = entry.get("io") if isinstance(entry.get("io"), list) else []
+                for connection in value.get("push") or []:
+                    if isinstance(connection, list):
+                        if len(connection) >= 3 and self.document.get_node(connection[2]) is None:
+                            raise ShadowError(f"Can not connect to node {connection[2]}: it does not exist")
+                        io.append(connection)
+                for connection in value.get("pop") or []:
+                    if connection in io:
+                        io.remove(connection)
+                if io or "io" in entry:
+                    entry["io"] = io
+            elif field == "offset":
+                if isinstance(value, list) and len(value) == 2:
+                    entry["offset"] = value
+                else:
+                    raise ShadowError(f"Invalid offset for node {node_id}: {value!r}")
+        self._write("scenes", scene_key, scene)
+
+    # ========== Dispatcher ==========
+
+    def execute(self, function_name: str, args: Dict[str, Any]) -> Any:
+        """
+        Run one editor function the way ai_command_dispatcher.gd does and
+        return the value the client would send back.
+        Raises ShadowError where the client would report an error.
+        """
+        handler = getattr(self, f"_call_{function_name}", None)
+        if handler is None:
+            raise ShadowError(f"Unknown function: {function_name}")
+        self.calls += 1
+        return handler(args)
+
+    def _require_id(self, args: Dict[str, Any], name: str) -> int:
+        value = _as_int(args.get(name))
+        if value is None or value < 0:
+            raise ShadowError(f"Missing or invalid required parameter: {name}")
+        return value
+
+    @staticmethod
+    def _notes(resource: Optional[Dict[str, Any]], notes: Any) -> Dict[str, Any]:
+        """resource_wrappers.gd: a blank `notes` argument clears existing notes"""
+        if notes:
+            return {"notes": notes}
+        if resource and "notes" in resource:
+            return {"notes": None}
+        return {}
+
+    def _call_create_insert_node(self, args: Dict[str, Any]) -> int:
+        if not args.get("type"):
+            raise ShadowError("Missing required parameter: type")
+        preset = copy.deepcopy(args.get("preset") or {})
+        # Like the editor, `name` is ignored: it is only passed on as a name prefix
+        # that NODE_INITIAL_NAME_TEMPLATE does not use, so the node is named by its ID
+        return self.create_insert_node(args["type"], args.get("offset"), args.get("scene_id"), preset)
+
+    def _call_update_node(self, args: Dict[str, Any]) -> str:
+        node_id = self._require_id(args, "node_id")
+        node = self.document.get_node(node_id)
+        if node is None:
+            raise ShadowError(f"Node {node_id} does not exist")
+        modification = {}
+        if args.get("name"):
+            modification["name"] = args["name"]
+        if args.get("data"):
+            modification["data"] = args["data"]
+        modification.update(self._notes(node, args.get("notes", "")))
+        if modification:
+            self.update_resource(node_id, modification, "nodes")
+        return "Node updated successfully"
+
+    def _call_delete_node(self, args: Dict[str, Any]) -> bool:
+        node_id = self._require_id(args, "node_id")
+        if str(node_id) in self._entries():
+            return False
+        return self.remove_resource(node_id, "nodes", bool(args.get("force", False)))
+
+    def _call_update_node_map(self, args: Dict[str, Any]) -> str:
+        node_id = self._require_id(args, "node_id")
+        if "modifications" not in args:
+            raise ShadowError("Missing required parameter: modifications")
+        self.update_node_map(node_id, args.get("modifications") or {}, args.get("scene_id"))
+        return "Node map updated successfully"
+
+    def _call_create_scene(self, args: Dict[str, Any]) -> Any:
+        scene_id = self.create_new_scene(bool(args.get("is_macro", False)))
+        if "name" in args or "notes" in args:
+            self._call_update_scene({"scene_id": scene_id, "name": args.get("name", ""), "notes": args.get("notes", "")})
+            return scene_id
+        return "Scene created successfully"
+
+    def _call_update_scene(self, args: Dict[str, Any]) -> str:
+        scene_id = self._require_id(args, "scene_id")
+        scene = self.document.get_scene(scene_id)
+        if scene is None:
+            raise ShadowError(f"Scene {scene_id} does not exist")
+        modification = {}
+        if args.get("name"):
+            modification["name"] = args["name"]
+        if _as_int(args.get("entry")) is not None and args["entry"] >= 0:
+            modification["entry"] = args["entry"]
+        if isinstance(args.get("macro"), bool):
+            modification["macro"] = args["macro"]
+        modification.update(self._notes(scene, args.get("notes", "")))
+        if modification:
+            self.update_resource(scene_id, modification, "scenes")
+        return "Scene updated successfully"
+
+    def _call_delete_scene(self, args: Dict[str, Any]) -> bool:
+        scene_id = self._require_id(args, "scene_id")
+        if self.document.get_scene(scene_id) is None:
+            raise ShadowError(f"Scene {scene_id} does not exist")
+        return self.remove_resource(scene_id, "scenes", bool(args.get("force", False)))
+
+    def _call_create_variable(self, args: Dict[str, Any]) -> Any:
+        if not args.get("type"):
+            raise ShadowError("Missing required parameter: type")
+        variable_id = self.create_new_variable(args["type"])
+        if "name" in args or "initial_value" in args or "notes" in args:
+            self._call_update_variable({
+                "variable_id": variable_id,
+                "name": args.get("name", ""),
+                "initial_value": args.get("initial_value"),
+                "notes": args.get("notes", ""),
+            })
+            return variable_id
+        return "Variable created successfully"
+
+    def _call_update_variable(self, args: Dict[str, Any]) -> str:
+        variable_id = self._require_id(args, "variable_id")
+        variable = self.document.get_variable(variable_id)
+        if variable is None:
+            raise ShadowError(f"Variable {variable_id} does not exist")
+        modification = {}
+        if args.get("name"):
+            modification["name"] = args["name"]
+        if args.get("type") in VARIABLE_DEFAULTS:
+            modification["type"] = args["type"]
+        if args.get("initial_value") is not None:
+            modification["init"] = args["initial_value"]
+        modification.update(self._notes(variable, args.get("notes", "")))
+        if modification:
+            self.update_resource(variable_id, modification, "variables")
+        return "Variable updated successfully"
+
+    def _call_delete_variable(self, args: Dict[str, Any]) -> bool:
+        variable_id = self._require_id(args, "variable_id")
+        if self.document.get_variable(variable_id) is None:
+            raise ShadowError(f"Variable {variable_id} does not exist")
+        return self.remove_resource(variable_id, "variables", bool(args.get("force", False)))
+
+    def _call_create_character(self, args: Dict[str, Any]) -> Any:
+        character_id = self.create_new_character()
+        if any(field in args for field in ("name", "color", "tags", "notes")):
+            self._call_update_character({
+                "character_id": character_id,
+                "name": args.get("name", ""),
+                "color": args.get("color", ""),
+                "tags": args.get("tags", {}),
+                "notes": args.get("notes", ""),
+            })
+            return character_id
+        return "Character created successfully"
+
+    def _call_update_character(self, args: Dict[str, Any]) -> str:
+        character_id = self._require_id(args, "character_id")
+        character = self.document.get_character(character_id)
+        if character is None:
+            raise ShadowError(f"Character {character_id} does not exist")
+        modification = {}
+        if args.get("name"):
+            modification["name"] = args["name"]
+        if args.get("color"):
+            modification["color"] = args["color"]
+        if args.get("tags"):
+            modification["tags"] = args["tags"]
+        modification.update(self._notes(character, args.get("notes", "")))
+        if modification:
+            self.update_resource(character_id, modification, "characters")
+        return "Character updated successfully"
+
+    def _call_delete_character(self, args: Dict[str, Any]) -> bool:
+        character_id = self._require_id(args, "character_id")
+        if self.document.get_character(character_id) is None:
+            raise ShadowError(f"Character {character_id} does not exist")
+        return self.remove_resource(character_id, "characters", bool(args.get("force", False)))
+
+    def _call_set_scene_entry(self, args: Dict[str, Any]) -> int:
+        return self.update_scene_entry(self._require_id(args, "node_id"))
+
+    def _call_set_project_entry(self, args: Dict[str, Any]) -> int:
+        return self.update_project_entry(self._require_id(args, "node_id"))
@@ -0,0 +1,129 @@
+"""
+Revisioned project synchronization
+Keeps one parsed copy of the client's .arrow document per session and moves it
+forward with JSON-Patch (RFC 6902) deltas instead of re-parsing full snapshots.
+
+Protocol summary:
+- The client sends a full snapshot once (`file_sync`, or `arrow_content` on a
+  `user_message`) together with an optional `revision` number.
+- Later `function_result` messages carry `base_revision`, `revision` and a `patch`
+  (list of JSON-Patch operations) instead of the whole file.
+- If `base_revision` does not match the server's revision, or a patch cannot be
+  applied, the server asks for a full resync with a `resync_request` message.
+- A snapshot identical to the one already loaded (clients resend the whole file
+  with every user_message) is recognised by its hash and not parsed again.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from Arrow_AI_Backend.lib import fast_json
+from Arrow_AI_Backend.lib.arrow_document import ArrowDocument
+from Arrow_AI_Backend.lib.json_patch import PatchError
+
+
+class SyncError(Exception):
+    """Raised when a delta can not be applied to the current document"""
+
+
+class RevisionMismatch(SyncError):
+    """Raised when a delta was computed against a different revision"""
+
+    def __init__(self, expected: Optional[int], received: Optional[int]):
+        self.expected = expected
+        self.received = received
+        super().__init__(f"Revision mismatch: server has {expected}, delta is based on {received}")
+
+
+# ========== Session Document ==========
+
+class ProjectSync:
+    """
+    Parsed .arrow document of one session, tagged with the client revision it
+    corresponds to.
+    """
+
+    def __init__(self):
+        self.document: Optional[ArrowDocument] = None
+        self.revision: Optional[int] = None
+        self.stale: bool = False
+        # Hash of the snapshot text the document was loaded from, while unpatched
+        self._snapshot_hash: Optional[bytes] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.document is not None and not self.stale
+
+    def load_snapshot(self, arrow_content: Any, revision: Optional[int] = None, snapshot_hash: Optional[bytes] = None) -> ArrowDocument:
+        """
+        Replace the document with a full snapshot (JSON string or parsed dict).
+        Without an explicit revision the current one is bumped by one.
+        """
+        if isinstance(arrow_content, str) and snapshot_hash is None:
+            snapshot_hash = fast_json.content_hash(arrow_content)
+        with fast_json.gc_paused():
+            if isinstance(arrow_content, str):
+                try:
+                    data = fast_json.loads(arrow_content)
+                except fast_json.JSONDecodeError as e:
+                    raise SyncError(f"Invalid arrow content: {e}")
+            else:
+                data = arrow_content
+            if not isinstance(data, dict):
+                raise SyncError("Arrow content must be a JSON object")
+            document = ArrowDocument(data)
+        self.document = document
+        self.revision = self._next_snapshot_revision(revision)
+        self.stale = False
+        # Only text snapshots are recognised again (a dict may be mutated by its owner)
+        self._snapshot_hash = snapshot_hash if isinstance(arrow_content, str) else None
+        return self.document
+
+    def _next_snapshot_revision(self, revision: Optional[int]) -> int:
+        return revision if revision is not None else (self.revision or 0) + 1
+
+    def apply_patch(
+        self,
+        patch: List[Dict[str, Any]],
+        base_revision: Optional[int],
+        revision: Optional[int] = None
+    ) -> ArrowDocument:
+        """
+        Move the document forward by one delta.
+        Raises RevisionMismatch if the delta was not computed against our revision,
+        and SyncError if it could not be applied (the document is then stale).
+        """
+        if self.document is None or self.stale or base_revision != self.revision:
+            raise RevisionMismatch(self.revision, base_revision)
+        self._snapshot_hash = None
+        try:
+            self.document.apply_patch(patch)
+        except PatchError as e:
+            self.stale = True
+            raise SyncError(str(e))
+        self.revision = revision if revision is not None else base_revision + 1
+        return self.document
+
+    def apply_message(
+        self,
+        arrow_content: Optional[str] = None,
+        patch: Optional[List[Dict[str, Any]]] = None,
+        base_revision: Optional[int] = None,
+        revision: Optional[int] = None
+    ) -> bool:
+        """
+        Update from whatever an inbound message carries: a full snapshot wins over
+        a patch, and a message with neither leaves the document untouched.
+        Returns True if the document changed (an identical snapshot only moves
+        the revision).
+        """
+        if arrow_content:
+            snapshot_hash = fast_json.content_hash(arrow_content)
+            if snapshot_hash == self._snapshot_hash and self.is_loaded:
+                self.revision = self._next_snapshot_revision(revision)
+                return False
+            self.load_snapshot(arrow_content, revision, snapshot_hash)
+            return True
+        if patch is not None:
+            self.apply_patch(patch, base_revision, revision)
+            return True
+        return False
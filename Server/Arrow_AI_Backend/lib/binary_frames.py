@@ -0,0 +1,107 @@
+"""
+Binary WebSocket frames carrying a compressed project
+Instead of a multi-MB project escaped into the `arrow_content` string of a JSON
+message, a client can send one binary message made of the message itself and
+the project as a separate compressed body:
+
+    [4 bytes: header length N, big-endian][N bytes: header, UTF-8 JSON][body]
+
+The header is the usual message (user_message, function_result,
+function_result_batch or file_sync) without its arrow_content, plus
+`"encoding"`: "gzip", "zstd" (if the server has the zstandard package, see
+ENCODINGS) or "identity". The body is the project JSON compressed that way; it
+becomes the message's arrow_content (data.arrow_content for file_sync).
+"""
+
+from typing import Any, Dict, Optional
+import gzip
+import io
+import json
+import os
+import struct
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # Optional: gzip frames only
+    zstandard = None
+
+
+# Largest decompressed body accepted (guards against decompression bombs)
+MAX_BODY_BYTES = int(os.getenv("ARROW_MAX_FRAME_BODY_MB", "64")) * 2**20
+
+# Body encodings this server can decode, best first
+ENCODINGS = (["zstd"] if zstandard is not None else []) + ["gzip", "identity"]
+
+_HEADER_SIZE = struct.Struct(">I")
+
+
+class FrameError(Exception):
+    """Raised when a binary frame can not be decoded"""
+
+
+def _decompress(body: bytes, encoding: str, limit: int) -> bytes:
+    if encoding == "identity":
+        data = body
+    elif encoding == "gzip":
+        # wbits 16+: gzip container; max_length stops inflating at the limit
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(body, limit + 1)
+        except zlib.error as e:
+            raise FrameError(f"Invalid gzip body: {e}")
+    elif encoding == "zstd" and zstandard is not None:
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                data = reader.read(limit + 1)
+        except zstandard.ZstdError as e:
+            raise FrameError(f"Invalid zstd body: {e}")
+    else:
+        raise FrameError(f"Unsupported encoding: {encoding} (supported: {', '.join(ENCODINGS)})")
+    if len(data) > limit:
+        raise FrameError(f"Body larger than {limit} bytes")
+    return data
+
+
+def decode_frame(frame: bytes, limit: int = MAX_BODY_BYTES) -> Dict[str, Any]:
+    """The message of a binary frame, with its body decompressed into arrow_content"""
+    if len(frame) < _HEADER_SIZE.size:
+        raise FrameError("Frame too short")
+    (header_size,) = _HEADER_SIZE.unpack_from(frame)
+    header_end = _HEADER_SIZE.size + header_size
+    if header_end > len(frame):
+        raise FrameError("Header length exceeds frame")
+    try:
+        message = json.loads(frame[_HEADER_SIZE.size:header_end])
+    except ValueError as e:
+        raise FrameError(f"Invalid header: {e}")
+    if not isinstance(message, dict):
+        raise FrameError("Header must be a JSON object")
+
+    body = frame[header_end:]
+    if body:
+        try:
+            content = _decompress(body, message.pop("encoding", "identity"), limit).decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise FrameError(f"Body is not UTF-8: {e}")
+        target = message.setdefault("data", {}) if message.get("type") == "file_sync" else message
+        target["arrow_content"] = content
+    return message
+
+
+def encode_frame(message: Dict[str, Any], content: Optional[str] = None, encoding: str = "gzip", level: Optional[int] = None) -> bytes:
+    """A binary frame of a message with content (the project JSON) as its body"""
+    body = b""
+    if content:
+        raw = content.encode("utf-8")
+        if encoding == "gzip":
+            body = gzip.compress(raw, compresslevel=6 if level is None else level, mtime=0)
+        elif encoding == "zstd" and zstandard is not None:
+            body = zstandard.ZstdCompressor(level=3 if level is None else level).compress(raw)
+        elif encoding == "identity":
+            body = raw
+        else:
+            raise FrameError(f"Unsupported encoding: {encoding}")
+        message = {**message, "encoding": encoding}
+    header = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return _HEADER_SIZE.pack(len(header)) + header + body
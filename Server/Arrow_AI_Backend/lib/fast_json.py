@@ -0,0 +1,62 @@
+"""
+JSON for inbound messages, projects and broker envelopes
+Uses orjson when it is installed (a dependency of langsmith, so usually present)
+and the standard library otherwise. Projects of several MB parse in roughly
+half the time with orjson and serialize about eight times faster; the results
+are the same plain dicts and lists (and the same compact JSON).
+
+Decoding and indexing a project allocate millions of containers, and every
+allocation burst triggers the cyclic garbage collector, which rescans the
+growing (acyclic) tree: gc_paused() keeps it off meanwhile.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Iterator, Union
+import gc
+import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional: standard library fallback
+    orjson = None
+
+
+# Raised by loads() on invalid input (orjson's error subclasses it)
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits: the standard library handles them
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def content_hash(content: Union[str, bytes]) -> bytes:
+    """Digest identifying a snapshot's exact text (to skip re-parsing the same one)"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha1(content, usedforsecurity=False).digest()
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """Cyclic garbage collection off for the block (reference counting still frees memory)"""
+    if not gc.isenabled():
+        yield
+        return
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
@@ -0,0 +1,127 @@
+"""
+Minimal JSON-Patch (RFC 6902) implementation
+Applies add, remove, replace, move, copy and test operations in place, so
+large documents are patched without being copied.
+"""
+
+import json
+from typing import Any, Dict, List
+
+
+class PatchError(Exception):
+    """Raised when a patch operation can not be applied"""
+
+
+def split_pointer(path: str) -> List[str]:
+    """Split a JSON pointer into its unescaped reference tokens"""
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {path!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _resolve_parent(document: Any, tokens: List[str]):
+    """Walk to the container holding the last token of a pointer"""
+    target = document
+    for token in tokens[:-1]:
+        try:
+            if isinstance(target, list):
+                target = target[int(token)]
+            else:
+                target = target[token]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+    return target
+
+
+def _get(document: Any, path: str) -> Any:
+    tokens = split_pointer(path)
+    if not tokens:
+        return document
+    parent = _resolve_parent(document, tokens)
+    try:
+        if isinstance(parent, list):
+            return parent[int(tokens[-1])]
+        return parent[tokens[-1]]
+    except (KeyError, IndexError, ValueError, TypeError):
+        raise PatchError(f"Path not found: {path}")
+
+
+def _add(document: Any, path: str, value: Any) -> Any:
+    tokens = split_pointer(path)
+    if not tokens:
+        return value
+    parent = _resolve_parent(document, tokens)
+    key = tokens[-1]
+    if isinstance(parent, list):
+        if key == "-":
+            parent.append(value)
+        else:
+            try:
+                index = int(key)
+            except ValueError:
+                raise PatchError(f"Invalid list index in path: {path}")
+            if index < 0 or index > len(parent):
+                raise PatchError(f"List index out of range: {path}")
+            parent.insert(index, value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise PatchError(f"Can not add to a scalar at: {path}")
+    return document
+
+
+def _remove(document: Any, path: str) -> Any:
+    tokens = split_pointer(path)
+    if not tokens:
+        raise PatchError("Can not remove the document root")
+    parent = _resolve_parent(document, tokens)
+    try:
+        if isinstance(parent, list):
+            del parent[int(tokens[-1])]
+        else:
+            del parent[tokens[-1]]
+    except (KeyError, IndexError, ValueError, TypeError):
+        raise PatchError(f"Path not found: {path}")
+    return document
+
+
+def apply_json_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """
+    Apply JSON-Patch operations to a document in place.
+    Supports add, remove, replace, move, copy and test.
+
+    Returns the patched document (a new object only when the root is replaced).
+    Raises PatchError if any operation fails; the document may then be partially
+    patched, so callers should treat it as stale and request a resync.
+    """
+    for operation in operations:
+        op = operation.get("op")
+        path = operation.get("path", "")
+        if op == "add":
+            document = _add(document, path, operation.get("value"))
+        elif op == "remove":
+            document = _remove(document, path)
+        elif op == "replace":
+            _get(document, path)
+            tokens = split_pointer(path)
+            if not tokens:
+                document = operation.get("value")
+            else:
+                parent = _resolve_parent(document, tokens)
+                key = int(tokens[-1]) if isinstance(parent, list) else tokens[-1]
+                parent[key] = operation.get("value")
+        elif op == "move":
+            value = _get(document, operation.get("from", ""))
+            document = _remove(document, operation.get("from", ""))
+            document = _add(document, path, value)
+        elif op == "copy":
+            value = json.loads(json.dumps(_get(document, operation.get("from", ""))))
+            document = _add(document, path, value)
+        elif op == "test":
+            if _get(document, path) != operation.get("value"):
+                raise PatchError(f"Test failed at: {path}")
+        else:
+            raise PatchError(f"Unsupported patch operation: {op!r}")
+    return document
@@ -0,0 +1,244 @@
+"""
+Structured, non-blocking logging
+Log calls on the event loop only put a record on a bounded queue; a background
+thread formats and writes them, so a slow stdout never stalls the server. When
+the queue is full, records are dropped (and counted) instead of blocking.
+
+    log = get_logger("tools")
+    log.info("Function result", request_id=request_id, success=True)
+
+Every record carries the session (and agent run) it belongs to, taken from a
+ContextVar bound per WebSocket connection with bind_log_context(), so the lines
+of concurrent sessions can be told apart. Field values are truncated to
+ARROW_LOG_MAX_FIELD characters; full message payloads are only logged with
+ARROW_LOG_PAYLOADS=1 (at debug level).
+
+Output is text (default) or one JSON object per line (ARROW_LOG_FORMAT=json).
+"""
+
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import reprlib
+import sys
+import time
+
+from Arrow_AI_Backend.metrics import counter
+
+
+# DEBUG, INFO, WARNING or ERROR
+LOG_LEVEL = os.getenv("ARROW_LOG_LEVEL", "INFO").upper()
+
+# "text" or "json"
+LOG_FORMAT = os.getenv("ARROW_LOG_FORMAT", "text")
+
+# Maximum characters of one field value
+MAX_FIELD_CHARS = int(os.getenv("ARROW_LOG_MAX_FIELD", "300"))
+
+# Set ARROW_LOG_PAYLOADS=1 to dump (truncated to ARROW_LOG_PAYLOAD_CHARS) inbound payloads at debug level
+LOG_PAYLOADS = os.getenv("ARROW_LOG_PAYLOADS", "0") == "1"
+MAX_PAYLOAD_CHARS = int(os.getenv("ARROW_LOG_PAYLOAD_CHARS", "20000"))
+
+# Records waiting to be written; beyond this they are dropped
+QUEUE_SIZE = int(os.getenv("ARROW_LOG_QUEUE_SIZE", "10000"))
+
+ROOT_LOGGER = "arrow"
+
+DROPPED = counter("arrow_log_dropped", "Log records dropped because the log queue was full")
+
+
+# ========== Correlation ==========
+
+# Session and agent run the current task works for
+_session: ContextVar[Optional[str]] = ContextVar("arrow_log_session", default=None)
+_run: ContextVar[Optional[str]] = ContextVar("arrow_log_run", default=None)
+
+
+def bind_log_context(session: Optional[str] = None, run: Optional[str] = None):
+    """Tag every record logged by the current task (and tasks it starts) with a session / run ID"""
+    if session is not None:
+        _session.set(session)
+    if run is not None:
+        _run.set(run)
+
+
+# ========== Field Truncation ==========
+
+_repr = reprlib.Repr()
+_repr.maxstring = MAX_FIELD_CHARS
+_repr.maxother = MAX_FIELD_CHARS
+_repr.maxlist = _repr.maxtuple = _repr.maxset = _repr.maxdict = 20
+_repr.maxlevel = 3
+
+
+def truncate(text: str, limit: int = MAX_FIELD_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(+{len(text) - limit} chars)"
+
+
+def compact(value: Any, limit: int = MAX_FIELD_CHARS) -> Any:
+    """
+    A bounded-size, immutable version of a field value, cheap to compute on the
+    event loop: numbers pass, strings are cut, containers get a bounded repr.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return truncate(value, limit)
+    if isinstance(value, (dict, list, tuple, set)):
+        return truncate(_repr.repr(value), limit)
+    return truncate(str(value), limit)
+
+
+# ========== Formatting ==========
+
+class StructuredFormatter(logging.Formatter):
+    """Text or JSON lines with time, level, logger, session/run and fields"""
+
+    def __init__(self, fmt: str = LOG_FORMAT):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields: Dict[str, Any] = getattr(record, "fields", None) or {}
+        name = record.name[len(ROOT_LOGGER) + 1:] if record.name.startswith(ROOT_LOGGER + ".") else record.name
+        session, run = getattr(record, "session", None), getattr(record, "run", None)
+        trace = record.exc_text or (self.formatException(record.exc_info) if record.exc_info else "")
+        if self.json:
+            entry = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": name,
+                "session": session,
+                "run": run,
+                "event": record.getMessage(),
+                **fields,
+            }
+            if trace:
+                entry["traceback"] = trace
+            return json.dumps({key: value for key, value in entry.items() if value is not None}, default=str)
+
+        parts = [
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            f"{record.levelname:<7}",
+            f"[{name}]",
+        ]
+        if session:
+            parts.append(f"session={session}")
+        if run:
+            parts.append(f"run={run}")
+        parts.append(record.getMessage())
+        parts.extend(f"{key}={value}" for key, value in fields.items())
+        line = " ".join(parts)
+        return f"{line}\n{trace}" if trace else line
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: a full queue drops the record"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only freeze what is cheap (message, traceback text); the listener
+        # thread does the actual formatting
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "session"):
+            record.session = _session.get()
+        if not hasattr(record, "run"):
+            record.run = _run.get()
+        return True
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = LOG_LEVEL, stream=None) -> logging.Logger:
+    """Route the "arrow" loggers through the queue to stdout (idempotent)"""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    if _listener is not None:
+        return root
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(StructuredFormatter())
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=QUEUE_SIZE)
+    handler = _DroppingQueueHandler(log_queue)
+    handler.addFilter(_ContextFilter())
+    root.addHandler(handler)
+    root.propagate = False
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """Write out what is queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ========== Loggers ==========
+
+class StructuredLogger:
+    """Logger taking an event message plus keyword fields: log.info("Event", key=value)"""
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def _log(self, level: int, event: str, exc_info: bool, fields: Dict[str, Any]):
+        # Nothing is formatted (or truncated) for disabled levels
+        if not self.logger.isEnabledFor(level):
+            return
+        extra = {"fields": {key: compact(value) for key, value in fields.items()}}
+        self.logger.log(level, event, exc_info=exc_info, extra=extra)
+
+    def debug(self, event: str, exc_info: bool = False, **fields: Any):
+        self._log(logging.DEBUG, event, exc_info, fields)
+
+    def info(self, event: str, exc_info: bool = False, **fields: Any):
+        self._log(logging.INFO, event, exc_info, fields)
+
+    def warning(self, event: str, exc_info: bool = False, **fields: Any):
+        self._log(logging.WARNING, event, exc_info, fields)
+
+    def error(self, event: str, exc_info: bool = False, **fields: Any):
+        self._log(logging.ERROR, event, exc_info, fields)
+
+    def payload(self, event: str, payload: Any, **fields: Any):
+        """Debug dump of a full message payload, only with ARROW_LOG_PAYLOADS=1"""
+        if not LOG_PAYLOADS or not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        if isinstance(payload, dict):
+            # Cut big values (e.g. arrow_content) before serializing the rest
+            payload = {key: truncate(value, MAX_PAYLOAD_CHARS) if isinstance(value, str) else value for key, value in payload.items()}
+        text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+        extra = {"fields": {**{key: compact(value) for key, value in fields.items()}, "payload": truncate(text, MAX_PAYLOAD_CHARS)}}
+        self.logger.debug(event, extra=extra)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    setup_logging()
+    return StructuredLogger(name)
@@ -1,16 +1,53 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+from fastapi.responses import Response
+from contextlib import asynccontextmanager
 from uuid import uuid4
 import asyncio
-from typing import Dict, Any
+import os
+import time
+from typing import Dict, Any, Optional
 from Arrow_AI_Backend.schemas import (
     UserMessage,
     FunctionResultMessage,
+    FunctionResultBatchMessage,
+    FileSyncMessage,
     StopMessage,
 )
-from Arrow_AI_Backend.manager import manager
-from Arrow_AI_Backend.agent.agents.supervisor import supervisor_agent
+from Arrow_AI_Backend.broker import RemoteConnection, broker
+from Arrow_AI_Backend.manager import manager, RESUME_GRACE_SECONDS
+from Arrow_AI_Backend.lib import fast_json
+from Arrow_AI_Backend.lib.arrow_sync import ProjectSync, SyncError, RevisionMismatch
+from Arrow_AI_Backend.lib.binary_frames import ENCODINGS, FrameError, decode_frame
+from Arrow_AI_Backend.agent.agents.supervisor import get_supervisor_agent, load_supervisor_agent
+from Arrow_AI_Backend.agent.tools.context import clear_context, session_contexts
+from Arrow_AI_Backend.logs import bind_log_context, get_logger
+from Arrow_AI_Backend.metrics import CONTENT_TYPE, counter, gauge, histogram, render_metrics
 
-app = FastAPI()
+log = get_logger("ws")
+
+# Build the agent graph in the background right after startup (set 0 to build
+# it on the first user message instead)
+WARM_UP = os.getenv("ARROW_WARM_UP", "1") != "0"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The server accepts connections immediately; models, agents and the graph
+    # are built off the event loop meanwhile
+    warm_up = asyncio.create_task(asyncio.to_thread(get_supervisor_agent)) if WARM_UP else None
+    # Receive the messages other workers route to this one's sessions
+    await broker.start(handle_envelope)
+    yield
+    await broker.stop()
+    # Persist the response caches' last changes (their saves are debounced)
+    from Arrow_AI_Backend.agent.response_cache import flush_caches
+    flush_caches()
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Store project state per session
 session_state: Dict[str, Dict[str, Any]] = {}
@@ -19,200 +56,498 @@ session_state: Dict[str, Dict[str, Any]] = {}
 # Maps session_id -> asyncio.Task
 running_agents: Dict[str, asyncio.Task] = {}
 
+# ========== Metrics ==========
 
-@app.websocket("/ws/chat")
-async def websocket_endpoint(websocket: WebSocket):
+gauge("arrow_sessions", "Connected WebSocket sessions", function=lambda: len(manager.active_connections))
+gauge("arrow_running_agents", "Agent runs in progress", function=lambda: len(running_agents))
+MESSAGES_RECEIVED = counter("arrow_ws_messages_received", "Inbound WebSocket messages, by type", ["type"])
+RECEIVED_BYTES = counter("arrow_ws_received_bytes", "Payload bytes of inbound messages (after permessage-deflate), by frame type", ["frame"])
+DECODED_BYTES = counter("arrow_ws_decoded_bytes", "Decompressed bytes of binary frame bodies")
+SNAPSHOTS = counter("arrow_project_snapshots", "Full project snapshots received, by outcome (loaded, or unchanged and not parsed again)", ["outcome"])
+AGENT_RUN_SECONDS = histogram("arrow_agent_run_seconds", "Duration of a whole agent run, from user_message to end", ["outcome"])
+gauge("arrow_detached_sessions", "Sessions whose socket dropped, kept for a reconnect", function=lambda: len(manager.detached))
+SESSION_RESUMES = counter("arrow_session_resumes", "Reconnects with a resume token, by outcome (resumed, relayed to another worker, or unknown)", ["outcome"])
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+async def sync_project(session_id: str, **delta) -> bool:
     """
-    WebSocket endpoint for Arrow AI Agent protocol.
-    Handles file sync, user messages, function results, and stop signals.
+    Apply a snapshot or patch from an inbound message to the session's project.
+    Asks the client for a full resync if the delta does not fit our revision.
+    Returns False if the server copy is now out of date.
     """
-    session_id = str(uuid4())
-    await manager.connect(session_id, websocket)
-    
-    # Initialize session state
-    session_state[session_id] = {
-        "arrow_content": "",
-        "project_id": None,
-        "current_scene_id": None,
-    }
-
-    # Send connected message
+    project: ProjectSync = session_state[session_id]["project"]
+    try:
+        changed = project.apply_message(**delta)
+        if delta.get("arrow_content"):
+            SNAPSHOTS.inc(outcome="loaded" if changed else "unchanged")
+        return True
+    except RevisionMismatch as e:
+        reason = str(e)
+    except SyncError as e:
+        reason = f"Could not apply delta: {e}"
+    log.info("Requesting resync", revision=project.revision, reason=reason)
+    await manager.send(session_id, {
+        "type": "resync_request",
+        "revision": project.revision,
+        "reason": reason
+    })
+    return False
+
+
+def end_session(session_id: str):
+    """Cancel the session's agent and drop its project, context and pending calls"""
+    if session_id in running_agents:
+        running_agents[session_id].cancel()
+        running_agents.pop(session_id, None)
+    manager.forget(session_id)
+    if session_id in session_contexts:
+        # The session made tool calls, so the tools are loaded
+        from Arrow_AI_Backend.agent.tools.arrow_tools import drop_pending_calls
+        drop_pending_calls(session_id)
+    session_state.pop(session_id, None)
+    clear_context(session_id)
+
+
+KNOWN_MESSAGE_TYPES = {"user_message", "function_result", "function_result_batch", "file_sync", "stop"}
+
+
+async def receive_message(websocket: WebSocket) -> Optional[Dict[str, Any]]:
+    """
+    The next inbound message: a JSON text frame, or a binary frame with the
+    project as a compressed body (lib/binary_frames.py). None if a binary frame
+    could not be decoded (it is skipped).
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    if message.get("text") is not None:
+        RECEIVED_BYTES.inc(len(message["text"]), frame="text")
+        return fast_json.loads(message["text"])
+    frame = message.get("bytes") or b""
+    RECEIVED_BYTES.inc(len(frame), frame="binary")
+    try:
+        raw = decode_frame(frame)
+    except FrameError as e:
+        log.warning("Error decoding binary frame", error=e, size=len(frame))
+        return None
+    content = raw.get("arrow_content") or (raw.get("data") or {}).get("arrow_content") or ""
+    DECODED_BYTES.inc(len(content))
+    return raw
+
+
+async def handle_message(session_id: str, raw: Dict[str, Any]):
+    """
+    Handle one inbound message of a session owned by this worker, from its own
+    socket or relayed by the worker the client is connected to.
+    """
+    message_type = raw.get("type")
+    MESSAGES_RECEIVED.inc(type=message_type if message_type in KNOWN_MESSAGE_TYPES else "unknown")
+
+    # ========== Handle User Message ==========
+    if message_type == "user_message":
+        try:
+            msg = UserMessage(**raw)
+        except Exception as e:
+            log.warning("Error parsing user_message", error=e)
+            await manager.send(session_id, {
+                "type": "chat_response",
+                "message": f"Error parsing message: {str(e)}"
+            })
+            return
+
+        # Update session context with arrow content and metadata
+        log.payload("user_message payload", raw)
+        synced = await sync_project(session_id, arrow_content=msg.arrow_content, revision=msg.revision)
+        project = session_state[session_id]["project"]
+        if synced and not project.is_loaded:
+            await manager.send(session_id, {
+                "type": "resync_request",
+                "revision": project.revision,
+                "reason": "No project snapshot on the server"
+            })
+        if msg.current_scene_id is not None:
+            session_state[session_id]["current_scene_id"] = msg.current_scene_id
+        if msg.current_project_id:
+            session_state[session_id]["project_id"] = msg.current_project_id
+
+        # Update tools context with scene_id and arrow_file
+        from Arrow_AI_Backend.agent.tools.context import set_context
+        set_context(
+            session_id=session_id,
+            scene_id=session_state[session_id].get("current_scene_id"),
+            arrow_file=project.document,
+            capabilities=msg.capabilities,
+            revision=project.revision
+        )
+
+        log.info("User message", message=msg.message, selected_nodes=len(msg.selected_node_ids), snapshot_chars=len(msg.arrow_content))
+
+        # Cancel any running agent for this session
+        if session_id in running_agents:
+            running_agents[session_id].cancel()
+            running_agents.pop(session_id, None)
+
+        # Create and run agent in background task
+        async def run_agent():
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                # Create initial state
+                initial_state = {
+                    "session_id": session_id,
+                    "message_id": str(uuid4()),
+                    "input": msg.message,
+                    "complexity": "",  # Will be set by analyzer
+                    "plan": [],
+                    "past_steps": [],
+                    "response": "",
+                    "replan_reason": "",
+                    "pending_request_id": None,
+                    "function_result": None,
+                    "current_scene_id": msg.current_scene_id,
+                    "arrow_file": project.document,
+                    "selected_node_ids": msg.selected_node_ids
+                }
+                bind_log_context(run=initial_state["message_id"])
+
+                # Invoke supervisor agent
+                supervisor_agent = await load_supervisor_agent()
+                await supervisor_agent.ainvoke(initial_state)
+
+                await manager.send(session_id, {
+                    "type": "end"
+                })
+                outcome = "ok"
+
+            except asyncio.CancelledError:
+                log.info("Agent task cancelled")
+                outcome = "cancelled"
+                raise
+            except Exception as e:
+                log.error("Error processing message", exc_info=True, error=e)
+                await manager.send(session_id, {
+                    "type": "chat_response",
+                    "message": f"Error: {str(e)}"
+                })
+                await manager.send(session_id, {
+                    "type": "end"
+                })
+            finally:
+                AGENT_RUN_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+                # Clean up task reference
+                running_agents.pop(session_id, None)
+
+        # Start agent task in background
+        task = asyncio.create_task(run_agent())
+        running_agents[session_id] = task
+
+    # ========== Handle Function Result ==========
+    elif message_type == "function_result":
+        try:
+            msg = FunctionResultMessage(**raw)
+        except Exception as e:
+            log.warning("Error parsing function_result", error=e)
+            return
+
+        log.debug("Function result", request_id=msg.request_id, success=msg.success)
+
+        # Move the project forward with the snapshot or patch in the result
+        await sync_project(
+            session_id,
+            arrow_content=msg.arrow_content,
+            patch=msg.patch,
+            base_revision=msg.base_revision,
+            revision=msg.revision
+        )
+
+        # Update the arrow file context for tools
+        from Arrow_AI_Backend.agent.tools.arrow_tools import set_function_result, set_context
+
+        # Update context with the parsed project (no re-parse)
+        # Note: Preserve scene_id from session_state (set by user message), 
+        # don't replace it with data from function result
+        set_context(
+            session_id=session_id,
+            scene_id=session_state[session_id].get("current_scene_id"),
+            arrow_file=session_state[session_id]["project"].document,
+            revision=session_state[session_id]["project"].revision
+        )
+
+        # Resolve the pending Future for this function call
+        # This allows the tool to continue execution
+        set_function_result(
+            request_id=msg.request_id,
+            success=msg.success,
+            result=msg.result,
+            error=msg.error
+        )
+
+        if msg.success:
+            log.debug("Function succeeded", request_id=msg.request_id, result=msg.result)
+        else:
+            log.info("Function failed", request_id=msg.request_id, error=msg.error)
+
+    # ========== Handle Function Result Batch ==========
+    elif message_type == "function_result_batch":
+        try:
+            msg = FunctionResultBatchMessage(**raw)
+        except Exception as e:
+            log.warning("Error parsing function_result_batch", error=e)
+            return
+
+        failed = sum(1 for item in msg.results if not item.success)
+        log.debug("Batch result", request_id=msg.request_id, results=len(msg.results), failed=failed)
+
+        # Move the project forward once for the whole batch
+        await sync_project(
+            session_id,
+            arrow_content=msg.arrow_content,
+            patch=msg.patch,
+            base_revision=msg.base_revision,
+            revision=msg.revision
+        )
+
+        from Arrow_AI_Backend.agent.tools.arrow_tools import set_batch_result, set_context
+        set_context(
+            session_id=session_id,
+            scene_id=session_state[session_id].get("current_scene_id"),
+            arrow_file=session_state[session_id]["project"].document,
+            revision=session_state[session_id]["project"].revision
+        )
+        set_batch_result(
+            request_id=msg.request_id,
+            results=[item.model_dump() for item in msg.results]
+        )
+
+    # ========== Handle File Sync ==========
+    elif message_type == "file_sync":
+        try:
+            msg = FileSyncMessage(**raw)
+        except Exception as e:
+            log.warning("Error parsing file_sync", error=e)
+            return
+
+        if msg.data.project_id is not None:
+            session_state[session_id]["project_id"] = msg.data.project_id
+        if await sync_project(session_id, arrow_content=msg.data.arrow_content, revision=msg.data.revision):
+            from Arrow_AI_Backend.agent.tools.context import set_context
+            set_context(
+                session_id=session_id,
+                scene_id=session_state[session_id].get("current_scene_id"),
+                arrow_file=session_state[session_id]["project"].document,
+                revision=session_state[session_id]["project"].revision
+            )
+            log.info("Project synced", revision=session_state[session_id]["project"].revision)
+
+    # ========== Handle Stop Signal ==========
+    elif message_type == "stop":
+        try:
+            msg = StopMessage(**raw)
+        except Exception as e:
+            log.warning("Error parsing stop message", error=e)
+            return
+
+        log.info("Stop signal received")
+
+        # Cancel running agent if any
+        if session_id in running_agents:
+            running_agents[session_id].cancel()
+            running_agents.pop(session_id, None)
+
+    # ========== Unknown Message Type ==========
+    else:
+        log.warning("Unknown message type", type=message_type)
+
+
+async def start_session(session_id: str, resumed: bool):
+    """
+    Send the connected message of a session that just got a socket (local, or a
+    RemoteConnection); on resume, follow it with what the client missed.
+    """
+    # With resumed, the client can go on with patches against revision
+    # instead of uploading the project again
     await manager.send(session_id, {
         "type": "connected",
         "data": {
             "sessionId": session_id,
-            "serverTime": int(asyncio.get_event_loop().time() * 1000)
+            "serverTime": int(asyncio.get_event_loop().time() * 1000),
+            "resumeToken": manager.issue_resume_token(session_id),
+            "resumeGraceSeconds": RESUME_GRACE_SECONDS,
+            "resumed": resumed,
+            "revision": session_state[session_id]["project"].revision,
+            "agentRunning": session_id in running_agents,
+            "worker": broker.worker_id,
+            # Encodings of binary frames with a compressed project body
+            "binaryEncodings": ENCODINGS
         }
     })
+    if resumed:
+        from Arrow_AI_Backend.agent.tools.arrow_tools import replay_pending_calls
+        flushed = await manager.flush(session_id)
+        replayed = await replay_pending_calls(session_id)
+        log.info("Session resumed", flushed=flushed, replayed=replayed)
+
+
+def close_session(session_id: str, websocket: Any, code: Optional[int]):
+    """
+    A session's socket closed: end the session on a deliberate close (1000),
+    otherwise keep it for a reconnect. Nothing happens if the socket was
+    already replaced by a resumed one.
+    """
+    if code == 1000:
+        if manager.active_connections.get(session_id) in (websocket, None):
+            manager.disconnect(session_id)
+            end_session(session_id)
+    else:
+        # Keep the project, the agent run and its pending calls for a reconnect
+        manager.detach(session_id, websocket, expire=end_session)
+
+
+@app.websocket("/ws/chat")
+async def websocket_endpoint(websocket: WebSocket):
+    """
+    WebSocket endpoint for Arrow AI Agent protocol.
+    Handles file sync, user messages, function results, and stop signals.
+    
+    A client that lost its socket reconnects with /ws/chat?resume=<resumeToken>
+    (from its last connected message) within ARROW_RESUME_GRACE_SECONDS: it gets
+    the same session back, with the server's copy of the project and the agent
+    run still going, followed by the messages it missed and every call still
+    waiting for its result (marked "replay": true). If the session lives on
+    another worker, this worker relays the socket to it (see broker.py).
+    """
+    resume_token = websocket.query_params.get("resume")
+    found = manager.resumable(resume_token)
+    if found and found[1] != broker.worker_id:
+        SESSION_RESUMES.inc(outcome="relayed")
+        await relay_connection(websocket, *found)
+        return
+    
+    session_id = found[0] if found else None
+    resumed = session_id is not None and session_id in session_state
+    if resume_token:
+        SESSION_RESUMES.inc(outcome="resumed" if resumed else "unknown")
+    if not resumed:
+        session_id = str(uuid4())
+    # Every line logged for this connection (and its agent runs) carries the session
+    bind_log_context(session=session_id)
+    
+    if resumed:
+        await manager.resume(session_id, websocket)
+    else:
+        if resume_token:
+            log.info("Unknown or expired resume token, starting a new session")
+        await manager.connect(session_id, websocket)
+        
+        # Initialize session state
+        session_state[session_id] = {
+            "project": ProjectSync(),
+            "project_id": None,
+            "current_scene_id": None,
+        }
+
+    await start_session(session_id, resumed)
 
     try:
         while True:
-            raw = await websocket.receive_json()
-            message_type = raw.get("type")
-
-            # ========== Handle User Message ==========
-            if message_type == "user_message":
-                try:
-                    msg = UserMessage(**raw)
-                except Exception as e:
-                    print(f"[{session_id}] Error parsing user_message: {e}")
-                    await manager.send(session_id, {
-                        "type": "chat_response",
-                        "message": f"Error parsing message: {str(e)}"
-                    })
-                    continue
-                
-                # Update session context with arrow content and metadata
-                print(">>>> msg: ", msg)
-                session_state[session_id]["arrow_content"] = msg.arrow_content
-                if msg.current_scene_id is not None:
-                    session_state[session_id]["current_scene_id"] = msg.current_scene_id
-                if msg.current_project_id:
-                    session_state[session_id]["project_id"] = msg.current_project_id
-
-                # Update tools context with scene_id and arrow_file
-                from Arrow_AI_Backend.agent.tools.arrow_tools import set_context
-                set_context(
-                    session_id=session_id,
-                    scene_id=session_state[session_id].get("current_scene_id"),
-                    arrow_file=msg.arrow_content
-                )
-
-                print(f"[{session_id}] User message: {msg.message}")
-                
-                # Cancel any running agent for this session
-                if session_id in running_agents:
-                    running_agents[session_id].cancel()
-                    running_agents.pop(session_id, None)
-                
-                # Create and run agent in background task
-                async def run_agent():
-                    try:
-                        # Create initial state
-                        initial_state = {
-                            "session_id": session_id,
-                            "message_id": str(uuid4()),
-                            "input": msg.message,
-                            "complexity": "",  # Will be set by analyzer
-                            "plan": [],
-                            "past_steps": [],
-                            "response": "",
-                            "replan_reason": "",
-                            "pending_request_id": None,
-                            "function_result": None,
-                            "current_scene_id": msg.current_scene_id,
-                            "arrow_file": session_state[session_id].get("arrow_content"),
-                            "selected_node_ids": msg.selected_node_ids
-                        }
-                        
-                        # Invoke supervisor agent
-                        await supervisor_agent.ainvoke(initial_state)
-                        
-                        await manager.send(session_id, {
-                            "type": "end"
-                        })
-                        
-                    except asyncio.CancelledError:
-                        print(f"[{session_id}] Agent task cancelled")
-                        raise
-                    except Exception as e:
-                        print(f"[{session_id}] Error processing message: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        await manager.send(session_id, {
-                            "type": "chat_response",
-                            "message": f"Error: {str(e)}"
-                        })
-                        await manager.send(session_id, {
-                            "type": "end"
-                        })
-                    finally:
-                        # Clean up task reference
-                        running_agents.pop(session_id, None)
-                
-                # Start agent task in background
-                task = asyncio.create_task(run_agent())
-                running_agents[session_id] = task
-
-            # ========== Handle Function Result ==========
-            elif message_type == "function_result":
-                try:
-                    msg = FunctionResultMessage(**raw)
-                except Exception as e:
-                    print(f"[{session_id}] Error parsing function_result: {e}")
-                    continue
-                
-                print(f"[{session_id}] Function result for {msg.request_id}: success={msg.success}")
-                
-                # Update session state with the latest arrow content
-                session_state[session_id]["arrow_content"] = msg.arrow_content
-                
-                # Update the arrow file context for tools
-                from Arrow_AI_Backend.agent.tools.arrow_tools import set_function_result, set_context
-                
-                # Update context with new arrow file content
-                # Note: Preserve scene_id from session_state (set by user message), 
-                # don't replace it with data from function result
-                set_context(
-                    session_id=session_id,
-                    scene_id=session_state[session_id].get("current_scene_id"),
-                    arrow_file=msg.arrow_content
-                )
-                
-                # Resolve the pending Future for this function call
-                # This allows the tool to continue execution
-                set_function_result(
-                    request_id=msg.request_id,
-                    success=msg.success,
-                    result=msg.result,
-                    error=msg.error
-                )
-                
-                if msg.success:
-                    print(f"[{session_id}] Function succeeded: {msg.result}")
-                else:
-                    print(f"[{session_id}] Function failed: {msg.error}")
-
-            # ========== Handle Stop Signal ==========
-            elif message_type == "stop":
-                try:
-                    msg = StopMessage(**raw)
-                except Exception as e:
-                    print(f"[{session_id}] Error parsing stop message: {e}")
-                    continue
-                
-                print(f"[{session_id}] Stop signal received")
-                
-                # Cancel running agent if any
-                if session_id in running_agents:
-                    running_agents[session_id].cancel()
-                    running_agents.pop(session_id, None)
-
-            # ========== Unknown Message Type ==========
-            else:
-                print(f"[{session_id}] Unknown message type: {message_type}")
+            raw = await receive_message(websocket)
+            if raw is not None:
+                await handle_message(session_id, raw)
 
     except (WebSocketDisconnect, RuntimeError) as e:
         # Handle both clean disconnects and connection errors
-        print(f"[{session_id}] WebSocket disconnected: {e}")
-        
-        # Cancel running agent if any
-        if session_id in running_agents:
-            running_agents[session_id].cancel()
-            running_agents.pop(session_id, None)
-        
-        manager.disconnect(session_id)
-        session_state.pop(session_id, None)
+        log.info("WebSocket disconnected", reason=e)
+        close_session(session_id, websocket, e.code if isinstance(e, WebSocketDisconnect) else None)
     except Exception as e:
         # Handle all other errors (including Pydantic validation errors)
-        print(f"[{session_id}] Error in websocket handler: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
-        
-        # Cancel running agent if any
-        if session_id in running_agents:
-            running_agents[session_id].cancel()
-            running_agents.pop(session_id, None)
-        
+        log.error("Error in websocket handler", exc_info=True, error=f"{type(e).__name__}: {e}")
+        close_session(session_id, websocket, 1000)
+
+
+# ========== Multi-Worker Routing ==========
+
+async def relay_connection(websocket: WebSocket, session_id: str, owner: str):
+    """
+    Serve a client whose session is owned by another worker: its messages are
+    forwarded to the owner, which answers through "deliver" envelopes.
+    """
+    bind_log_context(session=session_id)
+    previous = manager.active_connections.get(session_id)
+    await manager.connect(session_id, websocket)
+    if previous is not None:
+        # An earlier relayed socket of the same client
+        try:
+            await previous.close(code=4000, reason="Session resumed on another connection")
+        except RuntimeError:
+            pass
+    if not await broker.send(owner, {"op": "attach", "session": session_id, "worker": broker.worker_id}):
+        manager.disconnect(session_id)
+        await websocket.close(code=1011, reason="Session owner is unreachable")
+        return
+    log.info("Relaying session", owner=owner)
+    code: Optional[int] = None
+    try:
+        while True:
+            raw = await receive_message(websocket)
+            if raw is None:
+                continue
+            if not await broker.send(owner, {"op": "inbound", "session": session_id, "message": raw}):
+                await websocket.close(code=1011, reason="Session owner is unreachable")
+                break
+    except (WebSocketDisconnect, RuntimeError) as e:
+        log.info("WebSocket disconnected", reason=e)
+        code = e.code if isinstance(e, WebSocketDisconnect) else None
+    if manager.active_connections.get(session_id) in (websocket, None):
+        # Not replaced by a newer socket: the owner keeps the session for a reconnect
         manager.disconnect(session_id)
-        session_state.pop(session_id, None)
+        manager.forget(session_id)
+        await broker.send(owner, {"op": "detach", "session": session_id, "worker": broker.worker_id, "code": code})
+
+
+def _remote_lost(connection: RemoteConnection):
+    """The worker relaying a session went away: keep the session for a reconnect"""
+    manager.detach(connection.session_id, connection, expire=end_session)
+
+
+async def handle_envelope(envelope: Dict[str, Any]):
+    """Envelopes from other workers (see broker.py)"""
+    op, session_id = envelope.get("op"), envelope.get("session")
+    bind_log_context(session=session_id)
+    connection = manager.active_connections.get(session_id)
+
+    # ----- On the owner of the session -----
+    if op == "attach":
+        if session_id not in session_state:
+            await broker.send(envelope["worker"], {"op": "close", "session": session_id, "code": 4001, "reason": "Session expired"})
+            return
+        if isinstance(connection, RemoteConnection) and connection.worker_id == envelope["worker"]:
+            # That worker replaced its own socket; nothing to close here
+            connection.client_state = WebSocketState.DISCONNECTED
+        remote = RemoteConnection(broker, envelope["worker"], session_id, on_lost=_remote_lost)
+        await manager.resume(session_id, remote)
+        await start_session(session_id, resumed=True)
+    elif op == "inbound":
+        if isinstance(connection, RemoteConnection) and session_id in session_state:
+            await handle_message(session_id, envelope["message"])
+    elif op == "detach":
+        if isinstance(connection, RemoteConnection) and connection.worker_id == envelope["worker"]:
+            close_session(session_id, connection, envelope.get("code"))
+
+    # ----- On the worker holding the client's socket -----
+    elif op == "deliver":
+        await manager.send(session_id, envelope["message"])
+    elif op == "close":
+        if connection is not None and not isinstance(connection, RemoteConnection):
+            manager.disconnect(session_id)
+            try:
+                await connection.close(code=envelope.get("code", 1000), reason=envelope.get("reason", ""))
+            except RuntimeError:
+                pass
+    else:
+        log.warning("Unknown envelope", op=op)
@@ -1,33 +1,274 @@
-from typing import Dict
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import os
+import secrets
+import time
 from fastapi import WebSocket
-from starlette.websockets import WebSocketDisconnect, WebSocketState
+from starlette.websockets import WebSocketState
+from Arrow_AI_Backend.broker import broker
+from Arrow_AI_Backend.logs import get_logger
+from Arrow_AI_Backend.metrics import counter, gauge, histogram
+
+log = get_logger("connection")
+
+# Seconds a dropped session (project, agent run, pending calls) is kept for the
+# client to reconnect with its resume token (0 ends sessions on disconnect)
+RESUME_GRACE_SECONDS = float(os.getenv("ARROW_RESUME_GRACE_SECONDS", "60"))
+
+# Outbound messages kept for a dropped session until it resumes (oldest are dropped)
+RESUME_BUFFER = int(os.getenv("ARROW_RESUME_BUFFER", "500"))
+
+# Messages waiting to be written to one client; a client that falls further
+# behind is disconnected (it can resume and get them then)
+SEND_QUEUE_SIZE = int(os.getenv("ARROW_SEND_QUEUE_SIZE", "256"))
+
+# Sent ahead of chat output: the agent waits for their answers
+PRIORITY_TYPES = {"connected", "resync_request", "function_call", "function_call_batch", "project_commit"}
+
+# WebSocket close code for a client that does not keep up ("try again later")
+SLOW_CONSUMER_CODE = 1013
+
+SEND_QUEUE_WAIT_SECONDS = histogram("arrow_send_queue_wait_seconds", "Time outbound messages wait in the send queue, by lane", ["lane"])
+SEND_COALESCED = counter("arrow_send_coalesced", "Queued outbound messages merged into (or replaced by) a later one, by type", ["type"])
+SEND_OVERFLOWS = counter("arrow_send_overflows", "Clients disconnected because their send queue was full")
+
+
+class _Outbox:
+    """
+    Outbound messages of one socket, written by a writer task so senders never
+    wait for the client. Priority messages (calls, control) go before chat
+    output; chat output keeps its order, and queued deltas of one stream merge.
+    """
+
+    def __init__(self, websocket: WebSocket, on_error: Callable[["_Outbox", dict], None], size: int = SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.on_error = on_error
+        self.size = size
+        # (enqueued at, message) per lane: priority, chat
+        self.lanes: Tuple[Deque[Tuple[float, dict]], Deque[Tuple[float, dict]]] = (deque(), deque())
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._drain())
+
+    def __len__(self) -> int:
+        return len(self.lanes[0]) + len(self.lanes[1])
+
+    def put(self, message: dict, force: bool = False) -> bool:
+        """Queue a message; False if the queue is full"""
+        if message.get("type") in PRIORITY_TYPES:
+            lane = self.lanes[0]
+        else:
+            lane = self.lanes[1]
+            if self._coalesce(lane, message):
+                return True
+        if len(self) >= self.size and not force:
+            return False
+        lane.append((time.perf_counter(), message))
+        self._ready.set()
+        return True
+
+    def _coalesce(self, lane: Deque[Tuple[float, dict]], message: dict) -> bool:
+        """Merge a chat message into what is still queued; True if nothing is left to add"""
+        stream_id = message.get("stream_id")
+        if stream_id is None:
+            return False
+        if message["type"] == "chat_response_delta":
+            if lane and lane[-1][1].get("type") == "chat_response_delta" and lane[-1][1].get("stream_id") == stream_id:
+                queued_at, last = lane[-1]
+                lane[-1] = (queued_at, {**last, "delta": last["delta"] + message["delta"]})
+                SEND_COALESCED.inc(type="chat_response_delta")
+                return True
+        elif message["type"] == "chat_response":
+            # The complete message replaces the deltas of its stream the client has not got yet
+            kept = [item for item in lane if not (item[1].get("type") == "chat_response_delta" and item[1].get("stream_id") == stream_id)]
+            if len(kept) < len(lane):
+                SEND_COALESCED.inc(len(lane) - len(kept), type="chat_response_delta")
+                lane.clear()
+                lane.extend(kept)
+        return False
+
+    async def _drain(self):
+        while True:
+            await self._ready.wait()
+            lane = self.lanes[0] if self.lanes[0] else self.lanes[1]
+            if not lane:
+                self._ready.clear()
+                continue
+            queued_at, message = lane.popleft()
+            SEND_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at, lane="priority" if lane is self.lanes[0] else "chat")
+            try:
+                if self.websocket.client_state != WebSocketState.CONNECTED:
+                    raise RuntimeError(f"WebSocket is not connected ({self.websocket.client_state.name})")
+                await self.websocket.send_json(message)
+            except Exception as e:
+                # Any failure (disconnect, closed socket, unreachable worker) ends this writer
+                log.warning("Error sending", error=f"{type(e).__name__}: {e}")
+                self.on_error(self, message)
+                return
+
+    def close(self) -> List[dict]:
+        """Stop writing; returns the messages not written yet, in send order"""
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        remaining = [message for lane in self.lanes for _, message in lane]
+        for lane in self.lanes:
+            lane.clear()
+        return remaining
+
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        self._outboxes: Dict[str, _Outbox] = {}
+        # Current resume token of each session (registered with the broker)
+        self._session_tokens: Dict[str, str] = {}
+        # Dropped sessions waiting for a reconnect: session_id -> expiry timer
+        self.detached: Dict[str, asyncio.TimerHandle] = {}
+        self._buffers: Dict[str, Deque[dict]] = {}
 
     async def connect(self, session_id: str, websocket: WebSocket):
         await websocket.accept()
+        self._attach(session_id, websocket)
+        log.info("Connected")
+
+    def _attach(self, session_id: str, websocket: WebSocket):
         self.active_connections[session_id] = websocket
-        print(f"[+] Connected: {session_id}")
+        self._outboxes[session_id] = _Outbox(websocket, on_error=lambda outbox, message: self._send_failed(session_id, outbox, message))
 
     def disconnect(self, session_id: str):
-        self.active_connections.pop(session_id, None)
-        print(f"[-] Disconnected: {session_id}")
+        """Forget the session's socket; what it had not written yet is kept for a resume"""
+        if self.active_connections.pop(session_id, None) is None:
+            return
+        outbox = self._outboxes.pop(session_id, None)
+        if outbox is not None:
+            self._stash(session_id, outbox.close())
+        log.info("Disconnected")
 
-    async def send(self, session_id: str, message: dict):
-        """Send message to websocket, handling disconnection gracefully"""
-        ws = self.active_connections.get(session_id)
-        if ws:
+    def queue_depths(self) -> Dict[str, int]:
+        """Messages waiting in each session's send queue"""
+        return {session_id: len(outbox) for session_id, outbox in self._outboxes.items()}
+
+    # ========== Resume ==========
+
+    def issue_resume_token(self, session_id: str) -> str:
+        """A new resume token for the session (the previous one stops working)"""
+        old = self._session_tokens.pop(session_id, None)
+        if old:
+            broker.forget_token(old)
+        token = secrets.token_urlsafe(32)
+        broker.register_token(token, session_id)
+        self._session_tokens[session_id] = token
+        return token
+
+    def resumable(self, token: Optional[str]) -> Optional[Tuple[str, str]]:
+        """(session_id, owner worker) of a resume token, if the session is still alive"""
+        return broker.lookup_token(token) if token else None
+
+    def is_detached(self, session_id: str) -> bool:
+        """Whether the session lost its socket and waits for a reconnect"""
+        return session_id in self.detached
+
+    def detach(self, session_id: str, websocket: WebSocket, expire: Callable[[str], None]) -> bool:
+        """
+        Keep a session whose socket dropped for RESUME_GRACE_SECONDS, then call
+        expire(session_id). Returns False if the socket is no longer the
+        session's (it was taken over by a resumed connection).
+        """
+        if self.active_connections.get(session_id) not in (websocket, None):
+            return False
+        self.disconnect(session_id)
+        if RESUME_GRACE_SECONDS <= 0:
+            expire(session_id)
+            return True
+        self._buffers.setdefault(session_id, deque(maxlen=RESUME_BUFFER))
+        self.detached[session_id] = asyncio.get_event_loop().call_later(RESUME_GRACE_SECONDS, self._expire, session_id, expire)
+        log.info("Session detached", grace_seconds=RESUME_GRACE_SECONDS)
+        return True
+
+    def _expire(self, session_id: str, expire: Callable[[str], None]):
+        self.detached.pop(session_id, None)
+        log.info("Session expired")
+        expire(session_id)
+
+    async def resume(self, session_id: str, websocket: WebSocket):
+        """Attach a new socket to a session, replacing (and closing) any current one"""
+        timer = self.detached.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+        await websocket.accept()
+        previous = self.active_connections.get(session_id)
+        # What the previous socket had not written yet is sent after connected (see flush)
+        self.disconnect(session_id)
+        self._attach(session_id, websocket)
+        if previous is not None and previous.client_state == WebSocketState.CONNECTED:
             try:
-                # Check if websocket is still connected
-                if ws.client_state == WebSocketState.CONNECTED:
-                    await ws.send_json(message)
-                else:
-                    print(f"[!] WebSocket {session_id} is not connected (state: {ws.client_state})")
-                    self.disconnect(session_id)
-            except (WebSocketDisconnect, RuntimeError, Exception) as e:
-                print(f"[!] Error sending to {session_id}: {type(e).__name__}: {e}")
-                self.disconnect(session_id)
+                await previous.close(code=4000, reason="Session resumed on another connection")
+            except RuntimeError:
+                pass
+        log.info("Resumed")
+
+    async def flush(self, session_id: str) -> int:
+        """Send the messages buffered while the session was detached"""
+        buffered = self._buffers.pop(session_id, None) or ()
+        outbox = self._outboxes.get(session_id)
+        if outbox is not None:
+            for message in buffered:
+                outbox.put(message, force=True)
+        return len(buffered)
+
+    def forget(self, session_id: str):
+        """Drop everything kept for a session (it ended or expired)"""
+        timer = self.detached.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+        token = self._session_tokens.pop(session_id, None)
+        if token:
+            broker.forget_token(token)
+        self._buffers.pop(session_id, None)
+
+    # ========== Sending ==========
+
+    async def send(self, session_id: str, message: dict):
+        """
+        Queue a message for the session's client and return at once.
+        A client whose queue is full is disconnected (code 1013); it can resume.
+        """
+        outbox = self._outboxes.get(session_id)
+        if outbox is None:
+            # Dropped session: keep the message for the resumed connection
+            if session_id in self._buffers:
+                self._stash(session_id, [message])
+            return
+        if outbox.put(message):
+            return
+        log.warning("Send queue full, disconnecting slow client", queued=len(outbox))
+        SEND_OVERFLOWS.inc()
+        websocket = self.active_connections.get(session_id)
+        self.disconnect(session_id)
+        self._stash(session_id, [message])
+        try:
+            await websocket.close(code=SLOW_CONSUMER_CODE, reason="Client is not keeping up")
+        except RuntimeError:
+            pass
+
+    def _send_failed(self, session_id: str, outbox: _Outbox, message: dict):
+        """The writer of a socket failed: keep its unsent messages, drop the socket"""
+        if self._outboxes.get(session_id) is not outbox:
+            return
+        self._stash(session_id, [message])
+        self.disconnect(session_id)
+
+    def _stash(self, session_id: str, messages: List[dict]):
+        """
+        Keep unsent messages until the session resumes (or ends).
+        Calls awaiting a result are not kept; the tools replay them on resume.
+        """
+        kept = [message for message in messages if "request_id" not in message]
+        if kept:
+            self._buffers.setdefault(session_id, deque(maxlen=RESUME_BUFFER)).extend(kept)
+
 
 manager = ConnectionManager()
+
+gauge("arrow_send_queue_messages", "Outbound messages waiting in send queues", function=lambda: sum(manager.queue_depths().values()))
+gauge("arrow_send_queue_max_depth", "Messages waiting in the deepest send queue", function=lambda: max(manager.queue_depths().values(), default=0))
@@ -0,0 +1,220 @@
+"""
+Prometheus metrics
+Counters, gauges and histograms (with labels) kept in a module-level registry
+and served by main.py at /metrics in the Prometheus text exposition format
+(version 0.0.4). Small enough to not need prometheus_client.
+
+Modules register their metrics at import time:
+
+    FUNCTION_CALL_SECONDS = histogram("arrow_function_call_seconds", "...", ["function", "outcome"])
+    FUNCTION_CALL_SECONDS.observe(0.12, function="create_dialog_node", outcome="ok")
+
+Gauges (and counters) can also be computed at scrape time from existing state:
+
+    gauge("arrow_sessions", "...", function=lambda: len(manager.active_connections))
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import bisect
+import math
+import threading
+import time
+
+
+# Seconds: from a fast tool call to a long agent run
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Tokens per LLM call
+TOKEN_BUCKETS = (16, 64, 256, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+
+LabelValues = Tuple[str, ...]
+
+# A scrape-time value: one number, or one number per label-value tuple
+Collector = Callable[[], Union[float, Dict[LabelValues, float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A named metric family with fixed label names"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), function: Optional[Collector] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def _collected(self) -> Dict[LabelValues, float]:
+        try:
+            values = self.function()
+        except Exception as e:
+            from Arrow_AI_Backend.logs import get_logger
+            get_logger("metrics").warning("Could not collect metric", metric=self.name, error=e)
+            return {}
+        return values if isinstance(values, dict) else {(): values}
+
+    @property
+    def family(self) -> str:
+        """Name on the HELP/TYPE lines"""
+        return self.name
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.family} {_escape(self.documentation)}", f"# TYPE {self.family} {self.type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count (exposed with the _total suffix)"""
+
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    @property
+    def family(self) -> str:
+        return f"{self.name}_total"
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        values = self._collected() if self.function else dict(self._values)
+        return [f"{self.name}_total{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in sorted(values.items())]
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        values = self._collected() if self.function else dict(self._values)
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> (count per bucket, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the duration of a block in seconds (also when it raises)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            values = {key: (list(counts), total[0]) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+# ========== Registry ==========
+
+# Every metric family by name, in registration order
+registry: Dict[str, Metric] = {}
+
+
+def _register(cls, name: str, *args, **kwargs) -> Metric:
+    metric = registry.get(name)
+    if metric is None:
+        metric = registry[name] = cls(name, *args, **kwargs)
+    elif not isinstance(metric, cls):
+        raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+    return metric
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = (), function: Optional[Collector] = None) -> Counter:
+    return _register(Counter, name, documentation, labelnames, function=function)
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = (), function: Optional[Collector] = None) -> Gauge:
+    return _register(Gauge, name, documentation, labelnames, function=function)
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render_metrics() -> str:
+    """Every registered metric in the Prometheus text format"""
+    return "\n".join(metric.render() for metric in registry.values()) + "\n"
+
+
+# Content type of render_metrics() for the HTTP response
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -9,20 +9,49 @@ class HistoryItem(BaseModel):
 class UserMessage(BaseModel):
     type: str  # "user_message"
     message: str
-    arrow_content: str
+    arrow_content: str = ""  # Full snapshot (or the body of a binary frame); may be empty once the server holds the project
+    revision: Optional[int] = None  # Revision of the snapshot in arrow_content
     history: List[HistoryItem] = []
     selected_node_ids: List[int] = []
     current_scene_id: Optional[int] = None
     current_project_id: Optional[int] = None
+    capabilities: List[str] = []  # Protocol extensions the client supports, e.g. "function_call_batch"
 
 class FunctionResultMessage(BaseModel):
     type: str  # "function_result"
     request_id: str
     success: bool
-    arrow_content: str
+    arrow_content: str = ""  # Full snapshot (legacy clients send it on every result)
+    base_revision: Optional[int] = None  # Revision the patch was computed against
+    revision: Optional[int] = None  # Revision after applying the patch
+    patch: Optional[List[Dict[str, Any]]] = None  # JSON-Patch operations
+    result: Any = ""
+    error: str = ""
+
+class BatchItemResult(BaseModel):
+    success: bool
     result: Any = ""
     error: str = ""
 
+class FunctionResultBatchMessage(BaseModel):
+    type: str  # "function_result_batch"
+    request_id: str
+    results: List[BatchItemResult]  # One entry per call, in call order
+    arrow_content: str = ""
+    base_revision: Optional[int] = None
+    revision: Optional[int] = None
+    patch: Optional[List[Dict[str, Any]]] = None
+
+class FileSyncData(BaseModel):
+    project_id: Optional[int] = None
+    arrow_content: str
+    revision: Optional[int] = None
+    timestamp: Optional[int] = None
+
+class FileSyncMessage(BaseModel):
+    type: str  # "file_sync"
+    data: FileSyncData
+
 class StopMessage(BaseModel):
     type: str  # "stop"
 
@@ -34,6 +63,12 @@ class ConnectedMessage(BaseModel):
 class ChatResponseMessage(BaseModel):
     type: str = "chat_response"
     message: str
+    stream_id: Optional[str] = None  # Set when it completes (and replaces) streamed deltas
+
+class ChatResponseDeltaMessage(BaseModel):
+    type: str = "chat_response_delta"
+    stream_id: str  # Same for every delta of one message
+    delta: str  # Text to append to the message so far
 
 class FunctionCallMessage(BaseModel):
     type: str = "function_call"
@@ -41,5 +76,27 @@ class FunctionCallMessage(BaseModel):
     function: str
     arguments: Dict[str, Any]
 
+class FunctionCall(BaseModel):
+    function: str
+    arguments: Dict[str, Any]
+
+class FunctionCallBatchMessage(BaseModel):
+    type: str = "function_call_batch"
+    request_id: str
+    calls: List[FunctionCall]  # Executed in order, saved once
+    stop_on_error: bool = False
+
+class ProjectCommitMessage(BaseModel):
+    type: str = "project_commit"
+    request_id: str  # Answered with a function_result carrying the client's delta
+    base_revision: Optional[int] = None  # Revision the patch was computed against
+    patch: List[Dict[str, Any]]  # JSON-Patch with every change of the run
+    calls: int = 0  # Number of function calls folded into the patch
+
 class EndMessage(BaseModel):
     type: str = "end"
+
+class ResyncRequestMessage(BaseModel):
+    type: str = "resync_request"
+    revision: Optional[int] = None  # Last revision the server holds
+    reason: str = ""
@@ -0,0 +1,88 @@
+"""
+Check of the rule-based complexity classifier
+Runs agent/agents/complexity_rules.py on labelled requests and reports how
+many it answers without the LLM. Fails (exit code 1) if a rule answers where
+it should not: a SIMPLE answer skips the planner and runs on the small model,
+so requests with several objects, resources of several kinds, or open-ended
+writing must be left to the LLM analyzer (None) or be COMPLEX.
+
+Usage (from Server/):
+    python benchmarks/bench_complexity.py [--verbose]
+"""
+
+import argparse
+import os
+import sys
+from typing import List, Optional, Tuple
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+os.environ.setdefault("ARROW_LLM_PROVIDER", "fake")
+os.environ["ARROW_COMPLEXITY_FAST_PATH"] = "1"
+
+from Arrow_AI_Backend.agent.agents.complexity_rules import classify_complexity, fast_path_stats
+
+# (request, expected answer of the rules: "SIMPLE", "COMPLEX" or None for the LLM)
+CASES: List[Tuple[str, Optional[str]]] = [
+    # One operation on one object
+    ("Delete node 12", "SIMPLE"),
+    ("Rename Marcus to Elena", "SIMPLE"),
+    ("Create a content node about the old lighthouse", "SIMPLE"),
+    ("Change the color of character 3 to red", "SIMPLE"),
+    ("Set variable hp to 10", "SIMPLE"),
+    ("Remove the jump node in the tavern", "SIMPLE"),
+    # Questions
+    ("What scenes are there?", "SIMPLE"),
+    ("Which nodes mention the artifact?", "SIMPLE"),
+    ("How many characters are in the project", "SIMPLE"),
+    # Several operations or a multi-node structure
+    ("Create a branching conversation with 3 choices", "COMPLEX"),
+    ("Add five dialog nodes for the merchant", "COMPLEX"),
+    ("Create a merchant character, then add a dialog where the hero buys a potion, then connect it to a condition on hero_stamina", "COMPLEX"),
+    ("Create a quest and then add a branching dialog for it", "COMPLEX"),
+    # Several objects of one verb
+    ("Create a character Bob, a variable hp, and a scene Town", None),
+    ("Create a variable gold and a character Elena", None),
+    ("Create a hub node that links to the tavern, the forest and the castle", None),
+    ("Delete nodes 12 and 13", None),
+    ("Add a dialog for Bob & Elena", None),
+    # Resources of several kinds
+    ("Create a dialog node for character Elena", None),
+    ("Add a condition node on variable gold", None),
+    ("Move node 7 to scene 2", None),
+    # Open-ended writing
+    ("Write an intro for the game", None),
+    ("Write the opening", None),
+    ("Add a backstory", None),
+    ("Create a prologue", None),
+    ("Improve the story", None),
+    ("Add a dialog where the hero greets the merchant", None),
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="Print every case")
+    args = parser.parse_args()
+
+    failures = []
+    for request, expected in CASES:
+        result = classify_complexity(request)
+        answer = result.complexity if result is not None else None
+        if answer != expected:
+            failures.append(f"{request!r}: expected {expected}, rules answered {answer}")
+        if args.verbose:
+            print(f"[Bench] {str(answer):8} {request}")
+
+    stats = fast_path_stats()
+    print(f"[Bench] {len(CASES)} cases: {stats['simple']} SIMPLE, {stats['complex']} COMPLEX, "
+          f"{stats['fallback']} left to the LLM (hit rate {stats['hit_rate']})")
+    for failure in failures:
+        print(f"[Bench] FAIL: {failure}")
+    if not failures:
+        print("[Bench] OK: every rule answer matches its label")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
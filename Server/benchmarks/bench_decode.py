@@ -0,0 +1,111 @@
+"""
+Inbound message decoding benchmark
+Times what the server does with a user_message carrying a large project, from
+the received frame to an indexed ArrowDocument:
+
+- stdlib: json.loads of the frame and of arrow_content, then indexing (every
+  message pays the whole cost, as before lib/fast_json.py)
+- first: fast_json decoding and ProjectSync loading a new snapshot
+- repeated: the same snapshot again (recognised by its hash, not parsed)
+- binary: a gzip binary frame (lib/binary_frames.py) loading a new snapshot
+
+The project is example2-intro.arrow scaled up to at least --min-mb.
+
+Usage (from Server/):
+    python benchmarks/bench_decode.py [--min-mb 10] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from Arrow_AI_Backend.lib import fast_json
+from Arrow_AI_Backend.lib.arrow_document import ArrowDocument
+from Arrow_AI_Backend.lib.arrow_sync import ProjectSync
+from Arrow_AI_Backend.lib.binary_frames import decode_frame, encode_frame
+from Arrow_AI_Backend.schemas import UserMessage
+from benchmarks.projects import DEFAULT_PROJECT, load_project, project_size, scale_project
+
+
+def measure(function: Callable[[], Any], runs: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return {"median_ms": round(statistics.median(samples) * 1000, 1), "min_ms": round(min(samples) * 1000, 1)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--project", default=DEFAULT_PROJECT)
+    parser.add_argument("--min-mb", type=float, default=10)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    base = load_project(args.project)
+    factor = 1
+    while project_size(scale_project(base, factor)) < args.min_mb * 2**20:
+        factor *= 2
+    content = json.dumps(scale_project(base, factor))
+    message = {"type": "user_message", "message": "Summarize the project", "revision": 1}
+    text_frame = json.dumps({**message, "arrow_content": content})
+    binary_frame = encode_frame(message, content, encoding="gzip")
+
+    def stdlib():
+        msg = UserMessage(**json.loads(text_frame))
+        ArrowDocument(json.loads(msg.arrow_content))
+
+    def first():
+        msg = UserMessage(**fast_json.loads(text_frame))
+        ProjectSync().apply_message(arrow_content=msg.arrow_content, revision=msg.revision)
+
+    loaded = ProjectSync()
+    loaded.apply_message(arrow_content=content, revision=0)
+
+    def repeated():
+        msg = UserMessage(**fast_json.loads(text_frame))
+        assert not loaded.apply_message(arrow_content=msg.arrow_content, revision=msg.revision)
+
+    def binary():
+        msg = UserMessage(**decode_frame(binary_frame))
+        ProjectSync().apply_message(arrow_content=msg.arrow_content, revision=msg.revision)
+
+    raw = fast_json.loads(text_frame)
+    data = fast_json.loads(content)
+    report: Dict[str, Any] = {
+        "project": os.path.basename(args.project),
+        "scale": factor,
+        "content_mb": round(len(content) / 2**20, 1),
+        "binary_frame_mb": round(len(binary_frame) / 2**20, 2),
+        "json_backend": "orjson" if fast_json.orjson is not None else "json",
+        "stages": {
+            "frame_stdlib": measure(lambda: json.loads(text_frame), args.runs),
+            "frame_fast": measure(lambda: fast_json.loads(text_frame), args.runs),
+            "envelope": measure(lambda: UserMessage(**raw), args.runs),
+            "content_stdlib": measure(lambda: json.loads(content), args.runs),
+            "content_fast": measure(lambda: fast_json.loads(content), args.runs),
+            "content_hash": measure(lambda: fast_json.content_hash(content), args.runs),
+            "index": measure(lambda: ArrowDocument(data), args.runs),
+        },
+        "pipelines": {name: measure(function, args.runs) for name, function in
+                      (("stdlib", stdlib), ("first", first), ("repeated", repeated), ("binary", binary))},
+    }
+    pipelines = report["pipelines"]
+    report["speedup"] = {
+        name: round(pipelines["stdlib"]["median_ms"] / max(pipelines[name]["median_ms"], 0.1), 1)
+        for name in ("first", "repeated", "binary")
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
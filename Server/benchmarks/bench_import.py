@@ -0,0 +1,79 @@
+"""
+Import-time benchmark of the server
+Importing Arrow_AI_Backend.main must stay cheap so workers boot (and scale out)
+quickly: LangChain, LangGraph and the provider SDKs are only loaded when the
+agent graph is built, after startup.
+
+Fails (exit code 1) if the median import time exceeds the budget or if any of
+the heavy packages is imported eagerly again.
+
+Usage (from Server/):
+    python benchmarks/bench_import.py [--runs 7] [--budget-ms 1000]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that must not be loaded by `import Arrow_AI_Backend.main`
+HEAVY_PACKAGES = ("langchain", "langchain_core", "langchain_openai", "langgraph", "openai", "tiktoken")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import Arrow_AI_Backend.main
+elapsed = time.perf_counter() - started
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(json.loads(sys.argv[1])))
+print(json.dumps({"ms": elapsed * 1000, "heavy": heavy}))
+"""
+
+
+def measure(runs: int) -> dict:
+    env = {**os.environ, "PYTHONPATH": SERVER_DIR, "ARROW_LLM_PROVIDER": "fake"}
+    env.pop("OPENAI_API_KEY", None)  # Importing must not need one
+    samples, heavy = [], set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE, json.dumps(HEAVY_PACKAGES)],
+            cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        samples.append(result["ms"])
+        heavy.update(result["heavy"])
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+        "heavy_imports": sorted(heavy),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("ARROW_IMPORT_BUDGET_MS", "1000")))
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(json.dumps(result, indent=2))
+
+    failures = []
+    if result["heavy_imports"]:
+        failures.append(f"heavy packages imported at startup: {', '.join(result['heavy_imports'])}")
+    if result["median_ms"] > args.budget_ms:
+        failures.append(f"median import time {result['median_ms']} ms exceeds budget of {args.budget_ms} ms")
+    for failure in failures:
+        print(f"[Bench] FAIL: {failure}")
+    if not failures:
+        print(f"[Bench] OK: import within {args.budget_ms} ms budget, no heavy packages")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
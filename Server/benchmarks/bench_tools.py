@@ -0,0 +1,236 @@
+"""
+Microbenchmarks of the tool layer
+Times set_context (parsing and indexing a project snapshot) and every query
+tool of agent/tools/arrow_tools.py on synthetic projects of 1k-100k nodes
+(benchmarks/projects.py), and compares the results with stored baselines.
+
+Timings are normalized by a calibration loop measured on the same machine, so a
+baseline recorded on one machine can be checked on another.
+
+Usage (from Server/):
+    python benchmarks/bench_tools.py                      # run and print
+    python benchmarks/bench_tools.py --save-baseline      # record baselines/tools.json
+    python benchmarks/bench_tools.py --check              # exit 1 on a slowdown beyond --tolerance
+    python benchmarks/bench_tools.py --nodes 1000 --only search_nodes
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+os.environ.setdefault("ARROW_LLM_PROVIDER", "fake")
+
+from Arrow_AI_Backend.agent.tools import arrow_tools
+from Arrow_AI_Backend.agent.tools.context import clear_context, set_context
+from benchmarks.projects import generate_project, project_size
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "tools.json")
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+SESSION_ID = "bench"
+
+
+def calibrate() -> float:
+    """Seconds of a fixed pure-Python workload (dict/str/JSON work, like the tools do)"""
+    payload = {str(i): {"name": f"node{i}", "data": {"lines": ["some text"] * 3}} for i in range(2000)}
+    samples = []
+    for _ in range(5):
+        started = time.perf_counter()
+        json.loads(json.dumps(payload))
+        sorted(payload, key=lambda key: payload[key]["name"])
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def measure(function: Callable[[], Any], min_time: float, min_runs: int = 3, max_runs: int = 1000) -> Dict[str, float]:
+    """Median and p95 of a callable, run until min_time has passed (at least min_runs times)"""
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_runs or (time.perf_counter() < deadline and len(samples) < max_runs):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "median_us": round(statistics.median(samples) * 1e6, 1),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 1),
+        "runs": len(samples),
+    }
+
+
+def _tool(name: str) -> Callable[..., Any]:
+    """The coroutine behind a query tool, without LangChain's invocation overhead"""
+    return getattr(arrow_tools, name).coroutine
+
+
+def query_cases(project: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    """Query tool calls on a project, named "<tool>:<variant>" """
+    resources = project["resources"]
+    scene_ids = list(resources["scenes"])
+    scene_id = int(scene_ids[len(scene_ids) // 2])
+    scene = resources["scenes"][str(scene_id)]
+    node_ids = list(scene["map"])
+    middle_node = int(node_ids[len(node_ids) // 2])
+    character_id = int(next(iter(resources["characters"])))
+    character_name = resources["characters"][str(character_id)]["name"]
+    variable_id = int(next(iter(resources["variables"])))
+    variable_name = resources["variables"][str(variable_id)]["name"]
+    rare_word = max(
+        (word for node in list(resources["nodes"].values())[:200] for line in node["data"].get("lines", []) for word in line.split()),
+        key=len, default="hero"
+    )
+
+    calls = {
+        "get_nodes:all": ("get_nodes", {}),
+        "get_nodes:type": ("get_nodes", {"node_type": "dialog"}),
+        "get_nodes:character": ("get_nodes", {"character_id": character_id}),
+        "get_nodes:scene": ("get_nodes", {"scene_id": scene_id}),
+        "get_nodes:scene_type_fields": ("get_nodes", {"scene_id": scene_id, "node_type": "dialog", "fields": ["name"]}),
+        "search_nodes:common": ("search_nodes", {"query": "hero merchant"}),
+        "search_nodes:rare": ("search_nodes", {"query": rare_word}),
+        "search_nodes:prefix": ("search_nodes", {"query": "cast"}),
+        "search_nodes:scene": ("search_nodes", {"query": "hero", "scene_id": scene_id}),
+        "get_character:id": ("get_character", {"character_id": character_id}),
+        "get_character:name": ("get_character", {"character_name": character_name}),
+        "get_character:all": ("get_character", {}),
+        "get_variable:id": ("get_variable", {"variable_id": variable_id}),
+        "get_variable:name": ("get_variable", {"variable_name": variable_name}),
+        "get_variable:all": ("get_variable", {}),
+        "get_scene:id": ("get_scene", {"scene_id": scene_id}),
+        "get_scene:name": ("get_scene", {"scene_name": scene["name"]}),
+        "get_scene:map": ("get_scene", {"scene_id": scene_id, "fields": ["map"]}),
+        "get_scene:all": ("get_scene", {}),
+        "get_node_connections": ("get_node_connections", {"node_id": middle_node}),
+    }
+    loop = asyncio.new_event_loop()
+
+    def case(tool: str, arguments: Dict[str, Any]) -> Callable[[], Any]:
+        coroutine = _tool(tool)
+        return lambda: loop.run_until_complete(coroutine(**arguments))
+
+    return {name: case(tool, arguments) for name, (tool, arguments) in calls.items()}
+
+
+def run(sizes: List[int], args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for nodes in sizes:
+        scenes = max(1, nodes // args.nodes_per_scene)
+        project = generate_project(
+            scenes=scenes,
+            nodes_per_scene=args.nodes_per_scene,
+            branch_factor=args.branch_factor,
+            characters=args.characters,
+            variables=args.variables,
+            text_length=args.text_length,
+        )
+        content = json.dumps(project)
+        print(f"[Bench] {nodes} nodes ({scenes} scenes, {project_size(project) / 2**20:.1f} MB)", file=sys.stderr)
+
+        cases: Dict[str, Callable[[], Any]] = {
+            "set_context": lambda: set_context(session_id=SESSION_ID, arrow_file=content),
+        }
+        set_context(session_id=SESSION_ID, scene_id=None, arrow_file=content)
+        cases.update(query_cases(project))
+
+        for name, function in cases.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            key = f"{name}@{nodes}"
+            results[key] = measure(function, args.min_time)
+            print(f"[Bench] {key:<40} {results[key]['median_us']:>12.1f} us", file=sys.stderr)
+        clear_context(SESSION_ID)
+
+    return {
+        "calibration_us": round(calibrate() * 1e6, 1),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "shape": {
+            "nodes_per_scene": args.nodes_per_scene,
+            "branch_factor": args.branch_factor,
+            "characters": args.characters,
+            "variables": args.variables,
+            "text_length": args.text_length,
+        },
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, floor_us: float) -> List[str]:
+    """Cases slower than their baseline by more than tolerance (after calibration)"""
+    if baseline.get("shape") != report["shape"]:
+        return [f"baseline was recorded with shape {baseline.get('shape')}, not {report['shape']}"]
+    speed = report["calibration_us"] / baseline["calibration_us"]
+    regressions = []
+    for key, result in report["results"].items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            continue
+        expected = previous["median_us"] * speed
+        # Sub-floor timings are mostly noise
+        if result["median_us"] > max(expected, floor_us) * (1 + tolerance):
+            regressions.append(f"{key}: {result['median_us']} us vs {expected:.1f} us expected ({result['median_us'] / expected - 1:+.0%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="*", default=DEFAULT_SIZES, help="Project sizes to run")
+    parser.add_argument("--nodes-per-scene", type=int, default=200)
+    parser.add_argument("--branch-factor", type=int, default=2)
+    parser.add_argument("--characters", type=int, default=8)
+    parser.add_argument("--variables", type=int, default=12)
+    parser.add_argument("--text-length", type=int, default=80)
+    parser.add_argument("--only", nargs="*", help="Only cases starting with these names, e.g. search_nodes set_context")
+    parser.add_argument("--min-time", type=float, default=0.3, help="Seconds to spend per case")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Fail if a case got slower than its baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown, e.g. 0.5 = +50%%")
+    parser.add_argument("--floor-us", type=float, default=50, help="Timings below this are compared against it")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args.nodes, args)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        baseline: Dict[str, Any] = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        if baseline.get("shape") == report["shape"]:
+            # Keep the baselines of cases that were not run this time
+            report = {**report, "results": {**baseline.get("results", {}), **report["results"]}}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"[Bench] Baseline saved to {args.baseline}", file=sys.stderr)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"[Bench] FAIL: no baseline at {args.baseline}", file=sys.stderr)
+            return 1
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.floor_us)
+        for regression in regressions:
+            print(f"[Bench] REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("[Bench] OK: no case slower than its baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,437 @@
+"""
+End-to-end load test of the WebSocket server with simulated Godot clients
+Each client speaks the /ws/chat protocol the way the editor does: it sends
+user_message, executes every function_call (function_call_batch, project_commit)
+on its own copy of the project with the editor's mutation semantics
+(lib/arrow_shadow.py), waits a configurable client latency and answers with
+function_result, until the server sends `end`.
+
+By default a server is started with the fake LLM provider (no network or API
+key needed) and its memory is sampled during the run; use --url to target a
+running server instead (and --server-pid to still sample its memory).
+
+Reports p50/p95/p99 of the end-to-end latency (user_message -> end), the time to
+the first response, the tool round-trip (function_call received -> the
+server's next message after our result), throughput and server memory.
+
+Usage (from Server/):
+    python benchmarks/load_test.py --clients 20 --messages 5 --client-latency-ms 30
+    python benchmarks/load_test.py --clients 50 --scale 20 --sync patch --capabilities function_call_batch
+    python benchmarks/load_test.py --scale 20 --binary gzip
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import websockets
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from Arrow_AI_Backend.lib.arrow_document import ArrowDocument
+from Arrow_AI_Backend.lib.arrow_shadow import ShadowError, ShadowProject
+from Arrow_AI_Backend.lib.binary_frames import ENCODINGS, encode_frame
+from benchmarks.projects import DEFAULT_PROJECT, load_project, project_size, scale_project
+
+# Requests the clients cycle through: SIMPLE ones and multi-step COMPLEX ones
+DEFAULT_PROMPTS = [
+    "Create a content node about the old lighthouse",
+    "Add a dialog where the hero greets the merchant",
+    "Create a merchant character, then add a dialog where the hero buys a potion, then connect it to a condition on hero_stamina",
+    "Rename the campfire scene",
+    "Build a short branching conversation between the hero and the wanderer with two choices and a jump back to the start",
+]
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Percentiles of a list of seconds, in milliseconds"""
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 1),
+        "p95_ms": round(percentile(samples, 95) * 1000, 1),
+        "p99_ms": round(percentile(samples, 99) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1) if samples else 0.0,
+    }
+
+
+# ========== Simulated Client ==========
+
+class Metrics:
+    def __init__(self):
+        self.end_to_end: List[float] = []
+        self.first_response: List[float] = []
+        self.tool_round_trip: List[float] = []
+        self.function_calls = 0
+        self.commits = 0
+        self.resyncs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+
+class SimulatedClient:
+    """One editor: its own project copy, revision counter and WebSocket"""
+
+    def __init__(self, index: int, args: argparse.Namespace, project: Dict[str, Any], metrics: Metrics):
+        self.index = index
+        self.args = args
+        self.metrics = metrics
+        self.content = json.dumps(project)
+        self.document = ArrowDocument(json.loads(self.content))
+        self.revision = 1
+        self.scene_id = self._entry_scene(project)
+        self.padding = "x" * (args.payload_kb * 1024)
+        self.websocket = None
+        self._tool_started: Optional[float] = None
+
+    @staticmethod
+    def _entry_scene(project: Dict[str, Any]) -> Optional[int]:
+        entry = str(project.get("entry"))
+        for scene_id, scene in project["resources"]["scenes"].items():
+            if entry in scene.get("map", {}):
+                return int(scene_id)
+        return int(next(iter(project["resources"]["scenes"]), 0)) or None
+
+    async def send(self, message: Dict[str, Any]):
+        holder = message.get("data", message) if message.get("type") == "file_sync" else message
+        if self.args.binary and holder.get("arrow_content"):
+            # The project goes as the compressed body of a binary frame
+            content = holder["arrow_content"]
+            if holder is message:
+                header = {key: value for key, value in message.items() if key != "arrow_content"}
+            else:
+                header = {**message, "data": {key: value for key, value in holder.items() if key != "arrow_content"}}
+            raw = encode_frame(header, content, encoding=self.args.binary)
+        else:
+            raw = json.dumps(message)
+        self.metrics.bytes_sent += len(raw)
+        await self.websocket.send(raw)
+
+    async def receive(self) -> Dict[str, Any]:
+        raw = await self.websocket.recv()
+        self.metrics.bytes_received += len(raw)
+        if self._tool_started is not None:
+            self.metrics.tool_round_trip.append(time.perf_counter() - self._tool_started)
+            self._tool_started = None
+        return json.loads(raw)
+
+    def _snapshot(self) -> str:
+        return json.dumps(self.document.data)
+
+    def _delta(self, patch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """How the client reports its changes: a full snapshot, or a patch"""
+        base_revision = self.revision
+        if patch:
+            self.document.apply_patch(patch)
+            self.revision += 1
+        if self.args.sync == "snapshot":
+            return {"arrow_content": self._snapshot(), "revision": self.revision}
+        return {"patch": patch, "base_revision": base_revision, "revision": self.revision}
+
+    def _execute(self, calls: List[Dict[str, Any]]):
+        """Run calls like the editor's dispatcher; returns (results, patch)"""
+        shadow = ShadowProject(self.document, scene_id=self.scene_id)
+        results = []
+        for call in calls:
+            try:
+                results.append({"success": True, "result": shadow.execute(call["function"], call["arguments"]), "error": ""})
+            except ShadowError as e:
+                results.append({"success": False, "result": None, "error": str(e)})
+        return results, shadow.diff()
+
+    async def _client_latency(self):
+        if self.args.client_latency_ms:
+            await asyncio.sleep(self.args.client_latency_ms / 1000)
+
+    async def handle(self, message: Dict[str, Any]):
+        message_type = message.get("type")
+        if message_type == "function_call":
+            started = time.perf_counter()
+            (item,), patch = self._execute([message])
+            self.metrics.function_calls += 1
+            await self._client_latency()
+            await self.send({
+                "type": "function_result", "request_id": message["request_id"], **item,
+                **self._delta(patch), "padding": self.padding
+            })
+            self._tool_started = started
+        elif message_type == "function_call_batch":
+            started = time.perf_counter()
+            results, patch = self._execute(message["calls"])
+            self.metrics.function_calls += len(results)
+            await self._client_latency()
+            await self.send({
+                "type": "function_result_batch", "request_id": message["request_id"], "results": results,
+                **self._delta(patch), "padding": self.padding
+            })
+            self._tool_started = started
+        elif message_type == "project_commit":
+            started = time.perf_counter()
+            self.metrics.commits += 1
+            success = message.get("base_revision") == self.revision
+            await self._client_latency()
+            await self.send({
+                "type": "function_result", "request_id": message["request_id"], "success": success,
+                "error": "" if success else "Project changed since the commit was computed",
+                **self._delta(message["patch"] if success else []), "padding": self.padding
+            })
+            self._tool_started = started
+        elif message_type == "resync_request":
+            self.metrics.resyncs += 1
+            await self.send({"type": "file_sync", "data": {"arrow_content": self._snapshot(), "revision": self.revision}})
+        elif message_type == "chat_response" and message.get("message", "").startswith("Error"):
+            self.metrics.errors += 1
+
+    async def ask(self, prompt: str, first: bool) -> Optional[float]:
+        """Send one user message and serve the server until `end`; returns the latency"""
+        started = time.perf_counter()
+        first_response = None
+        await self.send({
+            "type": "user_message",
+            "message": prompt,
+            # The editor sends a snapshot with the first message; in patch mode the
+            # server keeps the project afterwards
+            "arrow_content": self._snapshot() if first or self.args.sync == "snapshot" else "",
+            "revision": self.revision,
+            "current_scene_id": self.scene_id,
+            "current_project_id": 1,
+            "capabilities": self.args.capabilities,
+        })
+        while True:
+            message = await self.receive()
+            if first_response is None and message.get("type") in ("chat_response", "chat_response_delta"):
+                first_response = time.perf_counter() - started
+            if message.get("type") == "end":
+                break
+            await self.handle(message)
+        if first_response is not None:
+            self.metrics.first_response.append(first_response)
+        return time.perf_counter() - started
+
+    async def run(self, url: str, prompts: List[str], messages: int, record: bool = True):
+        compression = None if self.args.no_deflate else "deflate"
+        async with websockets.connect(url, max_size=None, compression=compression) as websocket:
+            self.websocket = websocket
+            await self.receive()  # connected
+            for number in range(messages):
+                prompt = prompts[(self.index + number) % len(prompts)]
+                try:
+                    latency = await asyncio.wait_for(self.ask(prompt, number == 0), timeout=self.args.timeout)
+                except asyncio.TimeoutError:
+                    self.metrics.timeouts += 1
+                    return
+                if record:
+                    self.metrics.end_to_end.append(latency)
+                if self.args.think_ms:
+                    await asyncio.sleep(self.args.think_ms / 1000)
+
+
+# ========== Server ==========
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, log_path: Optional[str]) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": SERVER_DIR}
+    env.setdefault("ARROW_LLM_PROVIDER", "fake")
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "Arrow_AI_Backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+async def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"Server did not start listening on port {port}")
+
+
+def rss_mb(pid: int) -> Dict[str, float]:
+    """Resident and peak resident memory of a process (Linux /proc)"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":")
+                    values[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+class MemorySampler:
+    def __init__(self, pid: Optional[int], interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    def sample(self) -> Optional[float]:
+        if self.pid is None:
+            return None
+        value = rss_mb(self.pid).get("VmRSS")
+        if value is not None:
+            self.samples.append(value)
+        return value
+
+    async def _loop(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    def stop(self) -> Dict[str, Any]:
+        if self._task:
+            self._task.cancel()
+        self.sample()
+        if not self.samples:
+            return {}
+        return {
+            "rss_start_mb": round(self.samples[0], 1),
+            "rss_peak_mb": round(max(self.samples), 1),
+            "rss_end_mb": round(self.samples[-1], 1),
+            "rss_hwm_mb": round(rss_mb(self.pid).get("VmHWM", 0.0), 1),
+        }
+
+
+# ========== Run ==========
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    project = scale_project(load_project(args.project), args.scale)
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, "r", encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    server = None
+    pid = args.server_pid
+    url = args.url
+    if url is None:
+        port = free_port()
+        server = start_server(port, args.server_log)
+        pid = server.pid
+        url = f"ws://127.0.0.1:{port}/ws/chat"
+    try:
+        if server is not None:
+            await wait_for_port(int(url.rsplit(":", 1)[1].split("/")[0]))
+
+        # Warm-up: the first request waits for the agent graph to be built
+        await SimulatedClient(-1, args, project, Metrics()).run(url, prompts, args.warmup, record=False)
+
+        metrics = Metrics()
+        memory = MemorySampler(pid)
+        memory.start()
+        clients = [SimulatedClient(i, args, project, metrics) for i in range(args.clients)]
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(client.run(url, prompts, args.messages) for client in clients), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        memory_stats = memory.stop()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    failed = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    return {
+        "config": {
+            "clients": args.clients,
+            "messages_per_client": args.messages,
+            "client_latency_ms": args.client_latency_ms,
+            "payload_kb": args.payload_kb,
+            "sync": args.sync,
+            "binary": args.binary,
+            "deflate": not args.no_deflate,
+            "capabilities": args.capabilities,
+            "project": os.path.basename(args.project),
+            "scale": args.scale,
+            "project_bytes": project_size(project),
+            "nodes": len(project["resources"]["nodes"]),
+        },
+        "end_to_end": summarize(metrics.end_to_end),
+        "first_response": summarize(metrics.first_response),
+        "tool_round_trip": summarize(metrics.tool_round_trip),
+        "throughput": {
+            "duration_s": round(elapsed, 2),
+            "messages_per_s": round(len(metrics.end_to_end) / elapsed, 2) if elapsed else 0.0,
+            "function_calls_per_s": round(metrics.function_calls / elapsed, 2) if elapsed else 0.0,
+            "function_calls": metrics.function_calls,
+            "commits": metrics.commits,
+            "mb_sent": round(metrics.bytes_sent / 2**20, 2),
+            "mb_received": round(metrics.bytes_received / 2**20, 2),
+        },
+        "errors": {
+            "agent_errors": metrics.errors,
+            "timeouts": metrics.timeouts,
+            "resyncs": metrics.resyncs,
+            "failed_clients": len(failed),
+            "first_failure": repr(failed[0]) if failed else None,
+        },
+        "server_memory": memory_stats,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent editors")
+    parser.add_argument("--messages", type=int, default=3, help="User messages per client")
+    parser.add_argument("--client-latency-ms", type=float, default=20, help="Time the editor takes per function call")
+    parser.add_argument("--payload-kb", type=int, default=0, help="Extra bytes added to every function result")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pause between two messages of a client")
+    parser.add_argument("--sync", choices=("snapshot", "patch"), default="snapshot",
+                        help="Send full snapshots (the editor today) or revisioned patches")
+    parser.add_argument("--capabilities", nargs="*", default=[],
+                        help="e.g. function_call_batch project_commit chat_response_delta")
+    parser.add_argument("--binary", choices=ENCODINGS,
+                        help="Send project snapshots as the compressed body of binary frames")
+    parser.add_argument("--no-deflate", action="store_true", help="Do not negotiate permessage-deflate")
+    parser.add_argument("--project", default=DEFAULT_PROJECT, help=".arrow project the clients start from")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the project's scenes and nodes N times")
+    parser.add_argument("--prompts", help="File with one user message per line")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured messages before the run")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds per message before giving up")
+    parser.add_argument("--url", help="Target a running server, e.g. ws://127.0.0.1:8000/ws/chat")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, to sample its memory")
+    parser.add_argument("--server-log", help="Write the started server's output to this file")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["errors"]["failed_clients"] or report["errors"]["timeouts"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Project fixtures for the benchmarks
+- load_project / scale_project: the example projects shipped with the editor,
+  scaled up into larger variants with the same shape. Every copy duplicates all
+  scenes and their nodes under fresh native IDs (allocated like the editor does,
+  from the author's seed), keeps characters and variables shared and updates
+  their `use` lists.
+- generate_project: synthetic projects of controlled size and shape (scenes,
+  nodes per scene, branch factor, characters, variables, text length), built
+  deterministically from a seed.
+
+Both produce valid projects the shadow and the tools accept.
+"""
+
+import copy
+import itertools
+import json
+import os
+import random
+from typing import Any, Dict, List
+
+from Arrow_AI_Backend.lib.arrow_shadow import AUTHOR_SHIFT, CHAPTER_SHIFT, int_to_base36
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECTS_DIR = os.path.join(os.path.dirname(SERVER_DIR), "Arrow", "projects")
+
+DEFAULT_PROJECT = os.path.join(PROJECTS_DIR, "example2-intro.arrow")
+
+
+def load_project(path: str = DEFAULT_PROJECT) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _remap(value: Any, ids: Dict[int, int]) -> Any:
+    """Replace every scene/node ID in a copied structure (map keys included)"""
+    if isinstance(value, dict):
+        return {
+            str(ids.get(int(key), key)) if key.isdigit() else key: _remap(item, ids)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_remap(item, ids) for item in value]
+    if isinstance(value, int) and not isinstance(value, bool):
+        return ids.get(value, value)
+    return value
+
+
+def scale_project(data: Dict[str, Any], factor: int) -> Dict[str, Any]:
+    """
+    The project with its scenes and nodes repeated `factor` times in total
+    (factor 1 returns an unchanged copy).
+    """
+    project = copy.deepcopy(data)
+    resources = project["resources"]
+    meta = project.setdefault("meta", {})
+    authors = meta.setdefault("authors", {"0": ["Anonymous", 0]})
+    author = max(authors, key=lambda key: authors[key][1])
+    chapter = meta.get("chapter", 0)
+    scenes, nodes = dict(resources["scenes"]), dict(resources["nodes"])
+
+    for copy_index in range(1, factor):
+        # Fresh IDs from the author's seed, the way the editor allocates them
+        ids = {}
+        for resource_id in list(scenes) + list(nodes):
+            seed = authors[author][1]
+            authors[author][1] = seed + 1
+            ids[int(resource_id)] = (chapter << CHAPTER_SHIFT) | (int(author) << AUTHOR_SHIFT) | seed
+
+        for scene_id, scene in scenes.items():
+            scene = _remap(scene, ids)
+            scene["name"] = f"{scene['name']} #{copy_index + 1}"
+            resources["scenes"][str(ids[int(scene_id)])] = scene
+        for node_id, node in nodes.items():
+            new_id = ids[int(node_id)]
+            node = _remap(node, ids)
+            node["name"] = int_to_base36(new_id)
+            resources["nodes"][str(new_id)] = node
+
+        for kind in ("characters", "variables"):
+            for resource in resources.get(kind, {}).values():
+                if "use" in resource:
+                    resource["use"] += [ids[user] for user in resource["use"] if user in ids]
+
+    return project
+
+
+# ========== Synthetic Projects ==========
+
+_SYLLABLES = ["ka", "lo", "mi", "ra", "en", "tor", "vel", "un", "sha", "dor", "is", "qua", "bel", "ith", "mar", "os"]
+_STORY_WORDS = [
+    "hero", "merchant", "potion", "sword", "tavern", "forest", "castle", "dragon", "village", "king",
+    "artifact", "temple", "stamina", "gold", "night", "river", "ruins", "campfire", "wanderer", "seal",
+]
+
+# Node types of single-output nodes, in rotation
+_LINEAR_TYPES = ("dialog", "content", "monolog", "dialog", "variable_update", "content")
+
+
+def _vocabulary(rng: random.Random, size: int = 2000) -> List[str]:
+    words = list(_STORY_WORDS)
+    while len(words) < size:
+        word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in words:
+            words.append(word)
+    return words
+
+
+def generate_project(
+    scenes: int = 10,
+    nodes_per_scene: int = 100,
+    branch_factor: int = 2,
+    characters: int = 5,
+    variables: int = 5,
+    text_length: int = 80,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    A synthetic project: each scene is an entry followed by a tree of nodes in
+    which every branching node (interaction, or condition for two branches) has
+    `branch_factor` children, and a share of the leaves jump back to the scene's
+    entry. Texts are about `text_length` characters of words drawn with a
+    Zipf-like distribution, so full-text search sees common and rare terms.
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    branch_factor = max(1, branch_factor)
+    chapter, author = 1, 1
+    next_seed = [1]
+
+    def new_id() -> int:
+        next_seed[0] += 1
+        return (chapter << CHAPTER_SHIFT) | (author << AUTHOR_SHIFT) | (next_seed[0] - 1)
+
+    def text(length: int = text_length) -> str:
+        words: List[str] = []
+        while sum(len(word) + 1 for word in words) < length:
+            words.extend(rng.choices(vocabulary, cum_weights=cum_weights, k=8))
+        return " ".join(words)[:length].rsplit(" ", 1)[0] or words[0]
+
+    resources: Dict[str, Dict[str, Any]] = {"scenes": {}, "nodes": {}, "variables": {}, "characters": {}}
+    character_ids = [new_id() for _ in range(characters)]
+    for index, character_id in enumerate(character_ids):
+        resources["characters"][str(character_id)] = {"name": f"{rng.choice(_STORY_WORDS).title()}{index}", "color": f"{rng.randrange(1 << 24):06x}"}
+    variable_ids = [new_id() for _ in range(variables)]
+    for index, variable_id in enumerate(variable_ids):
+        resources["variables"][str(variable_id)] = {"name": f"var_{vocabulary[index + 20]}_{index}", "type": "num", "init": 0}
+
+    def use(kind: str, resource_id: int, user_id: int, node: Dict[str, Any]):
+        resource = resources[kind][str(resource_id)]
+        resource.setdefault("use", []).append(user_id)
+        node.setdefault("ref", []).append(resource_id)
+
+    entry = None
+    for scene_index in range(scenes):
+        scene_id = new_id()
+        ids = [new_id() for _ in range(max(1, nodes_per_scene))]
+        # Tree below ids[1]: node i (i >= 2) hangs off slot (i - 2) % b of node 1 + (i - 2) // b
+        parents = {i: (1 + (i - 2) // branch_factor, (i - 2) % branch_factor) for i in range(2, len(ids))}
+        parents[1] = (0, 0) if len(ids) > 1 else None
+        children: Dict[int, int] = {}
+        for child, link in parents.items():
+            if link:
+                children[link[0]] = children.get(link[0], 0) + 1
+
+        scene_map: Dict[str, Any] = {}
+        for i, node_id in enumerate(ids):
+            if i == 0:
+                node = {"type": "entry", "data": {"plaque": text(24)}}
+            elif branch_factor > 1 and children.get(i, 0) > 0:
+                if branch_factor == 2 and variable_ids and i % 2:
+                    node = {"type": "condition", "data": {"variable": rng.choice(variable_ids), "operator": "gt", "with": [0, rng.randint(0, 5)]}}
+                else:
+                    node = {"type": "interaction", "data": {"actions": [text(text_length // 3) for _ in range(branch_factor)]}}
+            elif children.get(i, 0) == 0 and i % 7 == 0:
+                node = {"type": "jump", "data": {"target": ids[0], "reason": text(24)}, "ref": [ids[0]]}
+            else:
+                node_type = _LINEAR_TYPES[i % len(_LINEAR_TYPES)]
+                if node_type == "dialog" and character_ids:
+                    node = {"type": "dialog", "data": {"character": rng.choice(character_ids), "lines": [text(), text()], "playable": False}}
+                elif node_type == "monolog" and character_ids:
+                    node = {"type": "monolog", "data": {"character": rng.choice(character_ids), "monolog": text(), "brief": 0, "auto": False, "clear": False}}
+                elif node_type == "variable_update" and variable_ids:
+                    node = {"type": "variable_update", "data": {"variable": rng.choice(variable_ids), "operator": "add", "with": [0, 1]}}
+                else:
+                    node = {"type": "content", "data": {"title": text(24), "content": text(), "brief": 0, "auto": False, "clear": False}}
+            node["name"] = int_to_base36(node_id)
+            if rng.random() < 0.1:
+                node["notes"] = text(text_length // 2)
+            data = node["data"]
+            if "character" in data:
+                use("characters", data["character"], node_id, node)
+            if "variable" in data:
+                use("variables", data["variable"], node_id, node)
+            resources["nodes"][str(node_id)] = node
+            scene_map[str(node_id)] = {"offset": [300 * (i % 20), 200 * (i // 20)]}
+            if node["type"] == "jump":
+                resources["nodes"][str(ids[0])].setdefault("use", []).append(node_id)
+
+        for child, link in parents.items():
+            if link:
+                parent, slot = link
+                scene_map[str(ids[parent])].setdefault("io", []).append([ids[parent], slot, ids[child], 0])
+
+        resources["scenes"][str(scene_id)] = {"name": f"{scene_index:02d}. {text(24).title()}", "entry": ids[0], "map": scene_map}
+        if entry is None:
+            entry = ids[0]
+
+    return {
+        "title": f"Synthetic {scenes}x{nodes_per_scene}",
+        "entry": entry,
+        "meta": {
+            "chapter": chapter,
+            "authors": {"0": ["Root Contributor", 0], str(author): ["Benchmark", next_seed[0]]},
+            "editor": "3.1.0",
+            "offline": True,
+            "remote": {},
+        },
+        "resources": resources,
+    }
+
+
+def project_size(data: Dict[str, Any]) -> int:
+    """Bytes of the project as the client sends it (compact JSON)"""
+    return len(json.dumps(data, separators=(",", ":")))